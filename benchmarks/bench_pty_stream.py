@@ -0,0 +1,172 @@
+"""
+Throughput and latency benchmark of the PTY output forwarding of `CommandChannel`.
+
+A local `FakeSSHServer` streams a fixed amount of UTF-8 text (including multi-byte
+characters) through an interactive shell channel. The benchmark measures how fast the
+output reaches the socket.io callback and checks that it arrives unaltered, once for
+a fast client and once for a slow one that takes 50 ms per frame.
+
+It then types a number of keystrokes, one input event each, into a session reading
+them, and reports how many channel writes they were coalesced into, once without and
+once with a limit of the input rate.
+
+Usage: python -m benchmarks.bench_pty_stream [--megabytes 20] [--keystrokes 20000]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any
+
+import paramiko
+from orchestrator.rate_limit import TokenBucket
+from orchestrator.web_server.command_channel_manager import (
+    CommandChannel,
+    CommandChannelEvent,
+)
+
+from benchmarks.fake_ssh_server import FakeSSHServer
+
+LINE = "Ünïcödé lög line with some € and 日本語 characters, padded to a typical width\n"
+
+
+class StreamingSSHServer(FakeSSHServer):
+    def handle_command(self, channel: paramiko.Channel, command: str) -> int:
+        if command.startswith("stream"):
+            n_lines = int(command.split()[1])
+            block = (LINE * 64).encode()
+            for _ in range(n_lines // 64):
+                channel.sendall(block)
+            return 0
+        if command == "echo":
+            # a single short line, as produced by an echoed keystroke
+            channel.sendall(b"x")
+            return 0
+        if command.startswith("read"):
+            # reads the given number of bytes of input, as typed into a shell
+            n_bytes = int(command.split()[1])
+            while n_bytes > 0:
+                data = channel.recv(65536)
+                if not data:
+                    return 1
+                n_bytes -= len(data)
+            channel.sendall(b"done\n")
+            return 0
+        return super().handle_command(channel, command)
+
+
+async def run_command(
+    client: paramiko.SSHClient, command: str, emit_delay: float = 0.0
+) -> tuple[str, float, dict[str, Any]]:
+    """Returns the forwarded output, the time to its first byte after the command was
+    sent and the output pipeline statistics. `emit_delay` simulates a slow client."""
+
+    finished = asyncio.Event()
+    output: list[str] = []
+    first_output_time = 0.0
+    stats: dict[str, Any] = {}
+
+    async def callback(event: CommandChannelEvent, payload: dict[str, Any]) -> None:
+        nonlocal first_output_time
+        if event == CommandChannelEvent.PTY_OUTPUT:
+            if not output:
+                first_output_time = time.perf_counter()
+            output.append(payload["output"])
+            await asyncio.sleep(emit_delay)
+        elif event == CommandChannelEvent.COMMAND_FINISHED:
+            stats.update(payload["stats"])
+            finished.set()
+
+    channel = CommandChannel(
+        ssh_client=client,
+        command=command,
+        command_args="",
+        callback=callback,
+        terminal_rows=24,
+        terminal_cols=80,
+    )
+    # CommandChannel waits 100 ms for the shell to start before sending the command
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    await finished.wait()
+    await channel.close()
+    return "".join(output), first_output_time - start, stats
+
+
+async def type_keystrokes(
+    client: paramiko.SSHClient, n_keystrokes: int, rate_limit: TokenBucket | None
+) -> tuple[float, dict[str, Any]]:
+    """Returns the time until the remote read all keystrokes and the input pipeline
+    statistics."""
+
+    finished = asyncio.Event()
+
+    async def callback(event: CommandChannelEvent, payload: dict[str, Any]) -> None:
+        if event == CommandChannelEvent.PTY_OUTPUT and "done" in payload["output"]:
+            finished.set()
+
+    channel = CommandChannel(
+        ssh_client=client,
+        command=f"read {n_keystrokes}",
+        command_args="",
+        callback=callback,
+        terminal_rows=24,
+        terminal_cols=80,
+        input_rate_limit=rate_limit,
+    )
+    # wait for the command to be sent, such that the keystrokes are read by it
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    for _ in range(n_keystrokes):
+        await channel.send_input_to_channel({"input": "x"})
+    await finished.wait()
+    duration = time.perf_counter() - start
+    stats = channel._input_pipeline.stats
+    await channel.close()
+    return duration, dict(stats)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=float, default=20)
+    parser.add_argument("--keystrokes", type=int, default=20000)
+    args = parser.parse_args()
+
+    n_lines = int(args.megabytes * 1e6 / len(LINE.encode())) // 64 * 64
+    with StreamingSSHServer() as server:
+        client = server.connect_client()
+
+        for name, emit_delay in [("fast client", 0.0), ("slow client", 0.05)]:
+            start = time.perf_counter()
+            output, _, stats = await run_command(
+                client, f"stream {n_lines}", emit_delay
+            )
+            duration = time.perf_counter() - start
+            assert output == LINE * n_lines, "output was altered"
+
+            n_bytes = len(output.encode())
+            print(
+                f"{name}: streamed {n_bytes / 1e6:.1f} MB in {duration:.2f} s "
+                f"({n_bytes / 1e6 / duration:.1f} MB/s), {stats['frames_out']} "
+                f"frames, buffer high-water mark "
+                f"{stats['buffer_high_water_mark'] / 1e3:.0f} k characters"
+            )
+
+        latencies = [(await run_command(client, "echo"))[1] for _ in range(20)]
+        print(f"median latency of short output: {sorted(latencies)[10] * 1e3:.1f} ms")
+
+        for name, rate_limit in [
+            ("unlimited input", None),
+            ("input limited to 64 kB/s", TokenBucket(64 * 1024)),
+        ]:
+            duration, stats = await type_keystrokes(client, args.keystrokes, rate_limit)
+            print(
+                f"{name}: {args.keystrokes} keystrokes in {duration:.2f} s, "
+                f"{stats['writes_out']} channel writes, "
+                f"{stats['dropped_bytes']} bytes dropped"
+            )
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,446 @@
+"""
+Load scenarios of the orchestrator against local `FakeSystemdHost`s.
+
+- `polling`: refreshes many hosts with many units each, while a few units change
+  their state between the refreshes
+- `push`: changes the state of many units on hosts with `push_updates`, which
+  report them through `busctl monitor` instead of being polled
+- `pty`: follows the logs of many units in concurrent terminal sessions
+- `bulk`: restarts all units of many hosts with a single bulk action
+- `rollout`: restarts all units of many hosts in dependency order, each unit depending
+  on a unit of the previous group on its host, and the first unit of each host on the
+  first unit of the first host
+
+Each scenario reports its wall time, the longest and the summed stall of the event
+loop, the peak RSS of the process (including the fake hosts, which run in threads of
+the same process) and the number of bytes sent to socket.io clients (state
+notifications and terminal output).
+
+The fake hosts listen on distinct loopback addresses (`127.1.x.y`), which requires
+Linux.
+
+Usage: python -m benchmarks.bench_scenarios [--scenario polling|push|pty|bulk|rollout]
+    [--hosts 100] [--units 500] [--latency 0.02] [--streams 50] [--poll-workers 0]
+    [--max-parallel 16]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import resource
+import tempfile
+import time
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+from typing import Any
+
+import confz
+from orchestrator.config import SystemdServiceOrchestratorConfig
+from orchestrator.orchestrator import SystemdServiceOrchestrator
+from orchestrator.rollouts import RolloutBudget, RolloutStepResult
+from orchestrator.service_host import HostReadiness
+from orchestrator.systemd_service_proxy import ManagerAction
+from orchestrator.unit_store import UnitStore
+from orchestrator.web_server.command_channel_manager import (
+    CommandChannelEvent,
+    CommandChannelManager,
+)
+from pydase.data_service.data_service_observer import DataServiceObserver
+from pydase.data_service.state_manager import StateManager
+
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+
+
+class LoopStallMonitor:
+    """Measures how late the event loop wakes up a task sleeping `interval` seconds,
+    i.e. how long it was blocked by other work."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self._interval = interval
+        self.max_stall = 0.0
+        self.total_stall = 0.0
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            stall = time.perf_counter() - start - self._interval
+            self.max_stall = max(self.max_stall, stall)
+            self.total_stall += stall
+
+    @contextlib.asynccontextmanager
+    async def watch(self) -> AsyncIterator["LoopStallMonitor"]:
+        task = asyncio.create_task(self._run())
+        try:
+            yield self
+        finally:
+            task.cancel()
+
+
+class ScenarioReport:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.socketio_bytes = 0
+        self.details: list[str] = []
+        self._stall_monitor = LoopStallMonitor()
+        self._start = 0.0
+        self._wall_time = 0.0
+
+    @contextlib.asynccontextmanager
+    async def measure(self) -> AsyncIterator[None]:
+        async with self._stall_monitor.watch():
+            self._start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._wall_time = time.perf_counter() - self._start
+
+    def count_notifications(self, service: SystemdServiceOrchestrator) -> None:
+        """Counts the bytes of the `notify` events pydase would emit for `service`."""
+
+        observer = DataServiceObserver(StateManager(service))
+
+        def callback(full_access_path: str, value: Any, cached_value: Any) -> None:
+            message = {"data": {"full_access_path": full_access_path, "value": value}}
+            self.socketio_bytes += len(json.dumps(message, default=str))
+
+        observer.add_notification_callback(callback)
+
+    def print(self) -> None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+        print(
+            f"{self.name}: wall time {self._wall_time:.2f} s, loop stall max "
+            f"{self._stall_monitor.max_stall * 1e3:.1f} ms / total "
+            f"{self._stall_monitor.total_stall:.2f} s, peak RSS {peak_rss:.0f} MB, "
+            f"socket.io {self.socketio_bytes / 1e6:.2f} MB"
+        )
+        for detail in self.details:
+            print(f"    {detail}")
+
+
+@contextlib.contextmanager
+def fake_hosts(n_hosts: int, **kwargs: Any) -> Iterator[list[FakeSystemdHost]]:
+    hosts = [
+        FakeSystemdHost(host=f"127.1.{i // 250}.{i % 250 + 1}", **kwargs)
+        for i in range(n_hosts)
+    ]
+    with contextlib.ExitStack() as stack:
+        for host in hosts:
+            stack.enter_context(host)
+        yield hosts
+
+
+def create_orchestrator(
+    hosts: list[FakeSystemdHost], push_updates: bool = False, **config: Any
+) -> SystemdServiceOrchestrator:
+    service_hosts = [
+        {
+            "hostname": host.host,
+            "port": host.port,
+            "username": "bench",
+            "password": "-",
+            "push_updates": push_updates,
+        }
+        for host in hosts
+    ]
+    config.setdefault("unit_state_file", None)
+    with SystemdServiceOrchestratorConfig.change_config_sources(
+        confz.DataSource(data={"service_hosts": service_hosts, **config})
+    ):
+        return SystemdServiceOrchestrator()
+
+
+@contextlib.asynccontextmanager
+async def connected(service: SystemdServiceOrchestrator) -> AsyncIterator[None]:
+    """Starts the background tasks of the orchestrator like `pydase.Server` does and
+    waits until every host has been connected and scanned once.
+
+    The scenarios poll the hosts themselves, thus the poll loop is stopped right away.
+    """
+
+    service._task_manager.start_autostart_tasks()
+    service.stop_update_hosts()  # type: ignore[attr-defined]
+    try:
+        while any(
+            host.readiness == HostReadiness.CONNECTING
+            for host in service.service_hosts.values()
+        ):
+            await asyncio.sleep(0.01)
+        yield
+    finally:
+        tasks = [
+            task
+            for component in (service, service.metrics, *service.service_hosts.values())
+            for task in list(component._task_manager.tasks.values())
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def polling_scenario(args: argparse.Namespace) -> None:
+    report = ScenarioReport(
+        f"polling {args.hosts} hosts x {args.units} units, {args.refreshes} refreshes, "
+        f"{args.poll_workers} poll workers"
+    )
+    with (
+        fake_hosts(args.hosts, n_units=args.units, latency=args.latency) as hosts,
+        tempfile.TemporaryDirectory() as state_dir,
+    ):
+        unit_state_file = Path(state_dir) / "unit_states.json"
+        start = time.perf_counter()
+        service = create_orchestrator(
+            hosts,
+            snapshot_ttl=0.0,
+            min_poll_interval=0.0,
+            unit_state_file=unit_state_file,
+            poll_worker_processes=args.poll_workers,
+        )
+        report.details.append(f"registering hosts: {time.perf_counter() - start:.2f} s")
+        async with connected(service):
+            report.details.append(
+                f"connecting and first scan: {time.perf_counter() - start:.2f} s"
+            )
+            report.count_notifications(service)
+
+            refresh_times: list[float] = []
+            async with report.measure():
+                for _ in range(args.refreshes):
+                    for host in hosts:
+                        for unit in random.sample(
+                            host.units, max(args.units // 100, 1)
+                        ):
+                            host.set_state(unit, "failed", "failed")
+                    start = time.perf_counter()
+                    await service._update_all_hosts()
+                    refresh_times.append(time.perf_counter() - start)
+
+        report.details.append(
+            "refresh wall time: "
+            + ", ".join(f"{refresh_time:.2f} s" for refresh_time in refresh_times)
+        )
+
+        assert service._unit_store is not None
+        start = time.perf_counter()
+        service._unit_store.save()
+        report.details.append(
+            f"saving unit states: {time.perf_counter() - start:.2f} s "
+            f"({unit_state_file.stat().st_size / 1e6:.2f} MB)"
+        )
+        start = time.perf_counter()
+        restarted_service = create_orchestrator(hosts, unit_state_file=unit_state_file)
+        await restarted_service._restore_units(UnitStore(unit_state_file))
+        report.details.append(
+            f"restoring unit states: {time.perf_counter() - start:.2f} s"
+        )
+    report.print()
+
+
+async def push_scenario(args: argparse.Namespace) -> None:
+    report = ScenarioReport(
+        f"push {args.hosts} hosts x {args.units} units, {args.refreshes} rounds"
+    )
+    with fake_hosts(args.hosts, n_units=args.units, latency=args.latency) as hosts:
+        service = create_orchestrator(hosts, push_updates=True)
+        async with connected(service):
+            # the first poll starts the unit state watchers
+            await service._update_all_hosts()
+            while any(host.monitor_count == 0 for host in hosts):
+                await asyncio.sleep(0.01)
+            report.count_notifications(service)
+            scan_count = sum(host.command_count for host in hosts)
+
+            latencies: list[float] = []
+            async with report.measure():
+                for round_index in range(args.refreshes):
+                    active_state, sub_state = (
+                        ("failed", "failed")
+                        if round_index % 2 == 0
+                        else ("active", "running")
+                    )
+                    changed = [
+                        (host, unit)
+                        for host in hosts
+                        for unit in random.sample(host.units, max(args.units // 100, 1))
+                    ]
+                    start = time.perf_counter()
+                    for host, unit in changed:
+                        host.set_state(unit, active_state, sub_state)
+                    while any(
+                        service.service_hosts[host.host]
+                        .service_proxies[unit]
+                        .state.value
+                        != active_state
+                        for host, unit in changed
+                    ):
+                        await asyncio.sleep(0.001)
+                    latencies.append(time.perf_counter() - start)
+
+        report.details.append(
+            "time until all changes were applied: "
+            + ", ".join(f"{latency * 1e3:.0f} ms" for latency in latencies)
+        )
+        report.details.append(
+            "remote commands during the rounds: "
+            f"{sum(host.command_count for host in hosts) - scan_count}"
+        )
+    report.print()
+
+
+async def pty_scenario(args: argparse.Namespace) -> None:
+    report = ScenarioReport(f"pty {args.streams} streams x {args.follow_lines} lines")
+    with fake_hosts(
+        1, follow_lines=args.follow_lines, follow_rate=args.follow_rate
+    ) as (host,):
+        client = host.connect_client()
+        finished = asyncio.Event()
+        line_counts = [0] * args.streams
+
+        def create_callback(index: int) -> Any:
+            async def callback(
+                event: CommandChannelEvent, payload: dict[str, Any]
+            ) -> None:
+                if event == CommandChannelEvent.PTY_OUTPUT:
+                    report.socketio_bytes += len(json.dumps(payload))
+                    line_counts[index] += payload["output"].count("\n")
+                    if all(count >= args.follow_lines for count in line_counts):
+                        finished.set()
+
+            return callback
+
+        managers = [
+            CommandChannelManager(create_callback(i), max_total_channels=args.streams)
+            for i in range(args.streams)
+        ]
+        async with report.measure():
+            for i, manager in enumerate(managers):
+                await manager.open_channel_with_command(
+                    client,
+                    "journalctl",
+                    f"--user -f -u {host.units[i % len(host.units)]}",
+                )
+            await finished.wait()
+
+        for manager in managers:
+            await manager.close()
+        client.close()
+    report.print()
+
+
+async def bulk_scenario(args: argparse.Namespace) -> None:
+    n_units = min(args.units, 100)
+    report = ScenarioReport(f"bulk restart of {args.hosts} hosts x {n_units} units")
+    with fake_hosts(
+        args.hosts, n_units=n_units, latency=args.latency, job_duration=0.5
+    ) as hosts:
+        service = create_orchestrator(hosts)
+        async with connected(service):
+            report.count_notifications(service)
+            async with report.measure():
+                results = await service._bulk_action(ManagerAction.RESTART, tag="bench")
+
+        n_succeeded = sum(result["success"] for result in results)
+        report.details.append(f"{n_succeeded} of {len(results)} restarts succeeded")
+    report.print()
+
+
+async def rollout_scenario(args: argparse.Namespace) -> None:
+    n_units = min(args.units, 100)
+    n_groups = 10
+    report = ScenarioReport(
+        f"rollout restart of {args.hosts} hosts x {n_units} units, "
+        f"max {args.max_parallel} in parallel"
+    )
+    dependencies = {
+        unit_name(i): [unit_name(i - n_groups)] for i in range(n_groups, n_units)
+    }
+    with fake_hosts(
+        args.hosts,
+        n_units=n_units,
+        latency=args.latency,
+        job_duration=0.1,
+        dependencies=dependencies,
+    ) as hosts:
+        first_unit = f"{hosts[0].host}/{unit_name(0)}"
+        service = create_orchestrator(
+            hosts,
+            rollout_dependencies={
+                f"{host.host}/{unit_name(0)}": [first_unit] for host in hosts[1:]
+            },
+        )
+        async with connected(service):
+            report.count_notifications(service)
+            async with report.measure():
+                results = await service._rollout(
+                    ManagerAction.RESTART,
+                    [(host.host, unit) for host in hosts for unit in host.units],
+                    RolloutBudget(args.max_parallel, max_unavailable=1),
+                    readiness_timeout=30.0,
+                )
+
+    waves: dict[int, list[RolloutStepResult]] = {}
+    for result in results:
+        waves.setdefault(result["wave"], []).append(result)
+    for wave, wave_results in sorted(waves.items()):
+        started = [result for result in wave_results if result["started_at"]]
+        span = max(
+            (result["started_at"] or 0.0) + result["duration"] for result in started
+        ) - min(result["started_at"] or 0.0 for result in started)
+        report.details.append(
+            f"wave {wave}: {len(wave_results)} units in {span:.2f} s, "
+            f"longest step {max(result['duration'] for result in started):.2f} s"
+        )
+    n_done = sum(result["status"] == "done" for result in results)
+    report.details.append(f"{n_done} of {len(results)} units restarted and ready")
+    report.print()
+
+
+SCENARIOS = {
+    "polling": polling_scenario,
+    "push": push_scenario,
+    "pty": pty_scenario,
+    "bulk": bulk_scenario,
+    "rollout": rollout_scenario,
+}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        dest="scenarios",
+        help="scenario to run (can be repeated, all scenarios by default)",
+    )
+    parser.add_argument("--hosts", type=int, default=100)
+    parser.add_argument("--units", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--refreshes", type=int, default=3)
+    parser.add_argument(
+        "--poll-workers",
+        type=int,
+        default=0,
+        help="number of poll worker processes of the polling scenario",
+    )
+    parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=16,
+        help="units restarted at the same time in the rollout scenario",
+    )
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--follow-lines", type=int, default=2000)
+    parser.add_argument("--follow-rate", type=float, default=1000.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for scenario in args.scenarios or SCENARIOS:
+        await SCENARIOS[scenario](args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
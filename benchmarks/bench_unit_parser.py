@@ -0,0 +1,126 @@
+"""
+Micro-benchmark of the systemd unit listing parser.
+
+Compares `orchestrator.unit_records.parse_systemd_records` on synthetic
+`systemctl show` output with the previous regex based parsing of
+`systemctl list-units` output. The new parser extracts more properties per unit
+(including the resource counters), thus it takes about twice as long per record.
+
+Usage: python -m benchmarks.bench_unit_parser [--units 10000] [--repeat 5]
+"""
+
+import argparse
+import re
+import timeit
+
+from orchestrator.unit_records import parse_systemd_records
+
+STATES = [
+    ("active", "running"),
+    ("inactive", "dead"),
+    ("failed", "failed"),
+    ("activating", "start"),
+]
+
+LEGACY_PATTERN = (
+    r"[^\w]+([\w-]+\.service)\s+(\w+)\s+(\w+)\s+(\w+)\s+(.+?)\s+Tags \[(.+?)\]"
+)
+
+
+def generate_show_output(n_units: int) -> list[str]:
+    lines: list[str] = []
+    for i in range(n_units):
+        active_state, sub_state = STATES[i % len(STATES)]
+        tags = f" Tags [lab{i % 7}, group{i % 13}]" if i % 5 else ""
+        lines.extend(
+            [
+                f"Id=container-service-{i}.service\n",
+                "LoadState=loaded\n",
+                f"ActiveState={active_state}\n",
+                f"SubState={sub_state}\n",
+                f"Description=Synthetic service number {i}{tags}\n",
+                f"MainPID={1000 + i}\n",
+                "NRestarts=0\n",
+                f"MemoryCurrent={i * 4096}\n",
+                f"CPUUsageNSec={i * 1000000}\n",
+                "ActiveEnterTimestamp=Mon 2024-01-01 12:00:00 UTC\n",
+                "\n",
+            ]
+        )
+    return lines
+
+
+def generate_list_units_output(n_units: int) -> list[str]:
+    lines: list[str] = []
+    for i in range(n_units):
+        active_state, sub_state = STATES[i % len(STATES)]
+        if i % 5:
+            lines.append(
+                f"  container-service-{i}.service loaded {active_state} {sub_state} "
+                f"Synthetic service number {i} Tags [lab{i % 7}, group{i % 13}]\n"
+            )
+    return lines
+
+
+def legacy_parse(lines: list[str]) -> list[dict[str, object]]:
+    records: list[dict[str, object]] = []
+    for line in lines:
+        match = re.match(LEGACY_PATTERN, line)
+        if match is not None:
+            (
+                unit,
+                load_state,
+                active_state,
+                sub_state,
+                description,
+                tags,
+            ) = match.groups()
+            records.append(
+                {
+                    "hostname": "bench",
+                    "unit": unit[:-8],
+                    "load_state": load_state,
+                    "active_state": active_state,
+                    "sub_state": sub_state,
+                    "description": description,
+                    "tags": tags.split(", "),
+                }
+            )
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--units", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    show_output = generate_show_output(args.units)
+    list_units_output = generate_list_units_output(args.units)
+
+    records = list(parse_systemd_records(show_output, "bench"))
+    legacy_records = legacy_parse(list_units_output)
+    # the legacy output has no resource properties
+    assert [
+        {key: record[key] for key in legacy_record}  # type: ignore[literal-required]
+        for record, legacy_record in zip(records, legacy_records, strict=True)
+    ] == legacy_records
+    n_records = len(records)
+
+    benchmarks = {
+        "systemctl show parser": lambda: list(
+            parse_systemd_records(show_output, "bench")
+        ),
+        "legacy list-units regex": lambda: legacy_parse(list_units_output),
+    }
+    print(f"{args.units} units, {n_records} tagged, best of {args.repeat}:")
+    for name, func in benchmarks.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(
+            f"  {name:<25} {best * 1e3:8.2f} ms  "
+            f"({best / n_records * 1e6:.2f} us/record)"
+        )
+
+
+if __name__ == "__main__":
+    main()
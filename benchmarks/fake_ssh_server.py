@@ -0,0 +1,144 @@
+"""
+An in-process SSH server standing in for a remote host in benchmarks.
+
+Commands run through `exec_command` or typed into an interactive shell (as done by
+`CommandChannel`) are passed to `FakeSSHServer.handle_command`, which subclasses
+override to emulate the remote programs.
+"""
+
+import contextlib
+import socket
+import threading
+import time
+from typing import Any
+
+import paramiko
+
+_HOST_KEY = paramiko.RSAKey.generate(2048)
+_CLOSE_DELAY = 0.5
+"""Time in seconds after which channels of finished commands are closed."""
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: "FakeSSHServer") -> None:
+        self._server = server
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_exec_request(
+        self, channel: paramiko.Channel, command: bytes
+    ) -> bool:
+        self._server._run_in_thread(channel, command.decode())
+        return True
+
+    def check_channel_pty_request(self, *args: Any) -> bool:
+        return True
+
+    def check_channel_window_change_request(self, *args: Any) -> bool:
+        return True
+
+    def check_channel_shell_request(self, channel: paramiko.Channel) -> bool:
+        def run_shell() -> None:
+            # CommandChannel sends "trap 'exit' INT; <command> <args>; exit"
+            line = channel.makefile("r").readline().strip()
+            command = line.removeprefix("trap 'exit' INT; ").removesuffix("; exit")
+            self._server._handle_channel(channel, command.strip())
+
+        threading.Thread(target=run_shell, daemon=True).start()
+        return True
+
+
+class FakeSSHServer:
+    """Accepts any password on `host` at a free port.
+
+    Each server of a benchmark with several hosts can be bound to its own loopback
+    address (e.g. `127.0.1.1`, `127.0.1.2`, ...), such that the hosts have distinct
+    hostnames. On Linux, the whole `127.0.0.0/8` range is routed to the loopback
+    interface.
+    """
+
+    def __init__(self, host: str = "127.0.0.1") -> None:
+        self.host = host
+        self._socket = socket.socket()
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, 0))
+        self._transports: list[paramiko.Transport] = []
+        self.port: int = self._socket.getsockname()[1]
+
+    def __enter__(self) -> "FakeSSHServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._socket.listen(128)
+        self._accept_thread = threading.Thread(
+            target=self._accept_connections, daemon=True
+        )
+        self._accept_thread.start()
+
+    def stop(self) -> None:
+        for transport in self._transports:
+            transport.close()
+        # Closing the socket alone does not wake up the accepting thread, which would
+        # then accept the connections of a later server that reuses the descriptor.
+        with contextlib.suppress(OSError):
+            self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+        self._accept_thread.join()
+
+    def connect_client(self) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(self.host, port=self.port, username="bench", password="-")
+        return client
+
+    def handle_command(self, channel: paramiko.Channel, command: str) -> int:
+        """Emulates `command`, writing its output to `channel`. Returns the exit
+        status."""
+
+        channel.sendall(f"{command}: command not found\n".encode())
+        return 127
+
+    def _accept_connections(self) -> None:
+        while True:
+            try:
+                client_socket, _ = self._socket.accept()
+            except OSError:
+                return
+            # like sshd, which disables Nagle's algorithm on its connections
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(client_socket)
+            transport.add_server_key(_HOST_KEY)
+            transport.start_server(server=_ServerInterface(self))
+            self._transports.append(transport)
+
+    def _run_in_thread(self, channel: paramiko.Channel, command: str) -> None:
+        threading.Thread(
+            target=self._handle_channel, args=(channel, command), daemon=True
+        ).start()
+
+    def _handle_channel(self, channel: paramiko.Channel, command: str) -> None:
+        try:
+            exit_status = self.handle_command(channel, command)
+        except OSError:
+            # the client closed the channel
+            return
+        channel.send_exit_status(exit_status)
+        channel.shutdown_write()
+        # The reply to the exec request is sent after `check_channel_exec_request`
+        # returned, closing the channel before would make the request fail. Thus the
+        # client gets some time to close the channel itself.
+        deadline = time.monotonic() + _CLOSE_DELAY
+        while not channel.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        channel.close()
@@ -0,0 +1,326 @@
+"""
+A `FakeSSHServer` emulating the systemd user manager of a host.
+
+It answers the remote commands of the orchestrator:
+
+- `systemctl show` of all or the given units, including the `After=` and `Requires=`
+  units given in `dependencies`
+- `systemctl [--no-block] start|stop|restart <units>`, which take `job_duration`
+  seconds and fail for the units in `failing_units`
+- `systemctl list-jobs <unit>` while a job runs in the background
+- `journalctl --output=json` (with cursors, `--lines` and `--reverse`) and
+  `journalctl -f`, which prints `follow_lines` lines at `follow_rate` lines per second
+- `busctl monitor`, which reports the state changes of the units
+
+Every command but the followed ones is answered after `latency` seconds.
+"""
+
+import contextlib
+import json
+import random
+import shlex
+import threading
+import time
+
+import paramiko
+
+from benchmarks.fake_ssh_server import FakeSSHServer
+
+_JOURNAL_START = 1_700_000_000_000_000
+"""Timestamp in microseconds of the first journal entry of each unit."""
+
+
+def unit_name(index: int) -> str:
+    return f"bench-unit-{index:04d}"
+
+
+def unit_tags(index: int) -> list[str]:
+    return ["bench", f"group{index % 10}"]
+
+
+def _escape_unit_name(unit: str) -> str:
+    return "".join(
+        character if character.isalnum() else f"_{ord(character):02x}"
+        for character in unit
+    )
+
+
+class FakeSystemdHost(FakeSSHServer):
+    def __init__(  # noqa: PLR0913
+        self,
+        n_units: int = 100,
+        latency: float = 0.0,
+        job_duration: float = 0.0,
+        failing_units: set[str] | None = None,
+        dependencies: dict[str, list[str]] | None = None,
+        journal_entries: int = 1000,
+        follow_lines: int = 1000,
+        follow_rate: float = 1000.0,
+        host: str = "127.0.0.1",
+    ) -> None:
+        super().__init__(host)
+        self.latency = latency
+        self.job_duration = job_duration
+        self.failing_units = failing_units or set()
+        self.dependencies = dependencies or {}
+        self.journal_entries = journal_entries
+        self.follow_lines = follow_lines
+        self.follow_rate = follow_rate
+        self.command_count = 0
+        self._lock = threading.Lock()
+        self._states = {unit_name(i): ("active", "running") for i in range(n_units)}
+        self._tags = {unit_name(i): unit_tags(i) for i in range(n_units)}
+        self._jobs: dict[str, tuple[int, str]] = {}
+        self._next_job_id = 1
+        self._monitors: list[paramiko.Channel] = []
+        self._pids = {unit_name(i): 1000 + i for i in range(n_units)}
+        self._started = time.monotonic()
+        self._cpu_usage: dict[str, int] = {}
+
+    @property
+    def units(self) -> list[str]:
+        return list(self._states)
+
+    @property
+    def monitor_count(self) -> int:
+        """Number of running `busctl monitor` commands."""
+
+        with self._lock:
+            return len(self._monitors)
+
+    def state(self, unit: str) -> tuple[str, str]:
+        with self._lock:
+            return self._states[unit]
+
+    def set_state(self, unit: str, active_state: str, sub_state: str) -> None:
+        with self._lock:
+            self._states[unit] = (active_state, sub_state)
+            monitors = list(self._monitors)
+
+        message = json.dumps(
+            {
+                "type": "signal",
+                "path": f"/org/freedesktop/systemd1/unit/{_escape_unit_name(unit)}"
+                "_2eservice",
+                "member": "PropertiesChanged",
+                "payload": {
+                    "type": "sa{sv}as",
+                    "data": [
+                        "org.freedesktop.systemd1.Unit",
+                        {
+                            "ActiveState": {"type": "s", "data": active_state},
+                            "SubState": {"type": "s", "data": sub_state},
+                        },
+                        [],
+                    ],
+                },
+            }
+        )
+        for channel in monitors:
+            with contextlib.suppress(OSError):
+                channel.sendall(f"{message}\n".encode())
+
+    def handle_command(self, channel: paramiko.Channel, command: str) -> int:
+        args = shlex.split(command)
+        self.command_count += 1
+        if args[:1] == ["busctl"]:
+            return self._monitor(channel)
+        if args[:1] == ["journalctl"] and ("-f" in args or "--follow" in args):
+            return self._follow_journal(channel, args)
+
+        time.sleep(self.latency)
+        if args[:1] == ["journalctl"]:
+            return self._show_journal(channel, args)
+        if args[:1] == ["systemctl"]:
+            return self._systemctl(channel, args)
+        return super().handle_command(channel, command)
+
+    def _systemctl(self, channel: paramiko.Channel, args: list[str]) -> int:
+        subcommand, *units = (arg for arg in args[1:] if not arg.startswith("-"))
+        if subcommand == "show":
+            return self._show(channel, units)
+        if subcommand == "list-jobs":
+            return self._list_jobs(channel, units)
+        if subcommand in ("start", "stop", "restart"):
+            return self._run_action(
+                channel, subcommand, units, no_block="--no-block" in args
+            )
+        return super().handle_command(channel, shlex.join(args))
+
+    def _show(self, channel: paramiko.Channel, patterns: list[str]) -> int:
+        with self._lock:
+            if patterns == ["*.service"]:
+                units = list(self._states)
+            else:
+                units = [pattern.removesuffix(".service") for pattern in patterns]
+            blocks = []
+            for unit in units:
+                if unit in self._states:
+                    active_state, sub_state = self._states[unit]
+                    tags = ", ".join(self._tags[unit])
+                    dependencies = " ".join(
+                        f"{dependency}.service"
+                        for dependency in self.dependencies.get(unit, [])
+                    )
+                    blocks.append(
+                        f"Id={unit}.service\nLoadState=loaded\n"
+                        f"ActiveState={active_state}\nSubState={sub_state}\n"
+                        f"Description=Benchmark unit {unit} Tags [{tags}]\n"
+                        f"{self._resource_properties(unit, active_state)}"
+                        f"After=basic.target {dependencies}\nRequires={dependencies}\n"
+                    )
+                else:
+                    blocks.append(
+                        f"Id={unit}.service\nLoadState=not-found\n"
+                        "ActiveState=inactive\nSubState=dead\n"
+                        f"Description={unit}.service\n"
+                    )
+        channel.sendall("\n".join(blocks).encode())
+        return 0
+
+    def _resource_properties(self, unit: str, active_state: str) -> str:
+        """Returns the resource properties of a unit, which consumes a random share of
+        a CPU and a slowly growing amount of memory while it is active."""
+
+        if active_state != "active":
+            return (
+                "MainPID=0\nNRestarts=0\nMemoryCurrent=[not set]\n"
+                "CPUUsageNSec=[not set]\nActiveEnterTimestamp=\n"
+            )
+        uptime = time.monotonic() - self._started
+        self._cpu_usage[unit] = self._cpu_usage.get(unit, 0) + random.randrange(10**8)
+        return (
+            f"MainPID={self._pids[unit]}\nNRestarts=0\n"
+            f"MemoryCurrent={int(50e6 + 1e4 * uptime)}\n"
+            f"CPUUsageNSec={self._cpu_usage[unit]}\n"
+            "ActiveEnterTimestamp=Mon 2024-01-01 12:00:00 UTC\n"
+        )
+
+    def _list_jobs(self, channel: paramiko.Channel, units: list[str]) -> int:
+        with self._lock:
+            lines = [
+                f"{job_id} {unit}.service {action} running\n"
+                for unit, (job_id, action) in self._jobs.items()
+                if f"{unit}.service" in units
+            ]
+        channel.sendall("".join(lines).encode())
+        return 0
+
+    def _run_action(
+        self, channel: paramiko.Channel, action: str, units: list[str], no_block: bool
+    ) -> int:
+        unknown_units = [unit for unit in units if unit not in self._states]
+        for unit in unknown_units:
+            channel.sendall_stderr(
+                f"Failed to {action} {unit}.service: Unit {unit}.service not "
+                "found.\n".encode()
+            )
+        units = [unit for unit in units if unit not in unknown_units]
+
+        for unit in units:
+            if action == "stop":
+                self.set_state(unit, "deactivating", "stop")
+            else:
+                self.set_state(unit, "activating", "start")
+            with self._lock:
+                self._jobs[unit] = (self._next_job_id, action)
+                self._next_job_id += 1
+
+        if no_block:
+            timer = threading.Timer(
+                self.job_duration, self._finish_jobs, (action, units)
+            )
+            timer.daemon = True
+            timer.start()
+            return 5 if unknown_units else 0
+
+        time.sleep(self.job_duration)
+        self._finish_jobs(action, units)
+        failed_units = [unit for unit in units if unit in self.failing_units]
+        for unit in failed_units:
+            channel.sendall_stderr(
+                f"Job for {unit}.service failed because the control process exited "
+                "with error code.\n".encode()
+            )
+        return 1 if failed_units else (5 if unknown_units else 0)
+
+    def _finish_jobs(self, action: str, units: list[str]) -> None:
+        for unit in units:
+            with self._lock:
+                self._jobs.pop(unit, None)
+            if action == "stop":
+                self.set_state(unit, "inactive", "dead")
+            elif unit in self.failing_units:
+                self.set_state(unit, "failed", "failed")
+            else:
+                self.set_state(unit, "active", "running")
+
+    def _journal_entry(self, unit: str, index: int) -> str:
+        return json.dumps(
+            {
+                "__CURSOR": f"s=bench;u={unit};i={index:x}",
+                "__REALTIME_TIMESTAMP": str(_JOURNAL_START + index * 1_000_000),
+                "PRIORITY": "6" if index % 50 else "3",
+                "SYSLOG_IDENTIFIER": unit,
+                "_PID": "1234",
+                "MESSAGE": f"Log message number {index} of {unit}",
+            }
+        )
+
+    def _show_journal(self, channel: paramiko.Channel, args: list[str]) -> int:
+        options = dict(arg.partition("=")[::2] for arg in args if arg.startswith("--"))
+        unit = options["--unit"]
+        indices = range(self.journal_entries)
+        if "--after-cursor" in options:
+            cursor_index = int(options["--after-cursor"].rpartition("=")[2], 16)
+            if "--reverse" in options:
+                indices = range(cursor_index)
+            else:
+                indices = range(cursor_index + 1, self.journal_entries)
+        if "--lines" in options:
+            indices = indices[-int(options["--lines"]) :]
+        if "--reverse" in options:
+            indices = indices[::-1]
+
+        for start in range(0, len(indices), 100):
+            lines = "".join(
+                self._journal_entry(unit, index) + "\n"
+                for index in indices[start : start + 100]
+            )
+            channel.sendall(lines.encode())
+        return 0
+
+    def _follow_journal(self, channel: paramiko.Channel, args: list[str]) -> int:
+        """Prints `follow_lines` lines and waits until the channel is closed, like
+        `journalctl -f` without new entries."""
+
+        start = time.perf_counter()
+        batch_size = max(int(self.follow_rate / 100), 1)
+        for index in range(0, self.follow_lines, batch_size):
+            lines = "".join(
+                f"Jan 01 00:00:00 bench app[1234]: Followed message number {i}\r\n"
+                for i in range(index, min(index + batch_size, self.follow_lines))
+            )
+            channel.sendall(lines.encode())
+            delay = (
+                start + (index + batch_size) / self.follow_rate - time.perf_counter()
+            )
+            if delay > 0:
+                time.sleep(delay)
+        while not channel.closed:
+            time.sleep(0.1)
+        return 0
+
+    def _monitor(self, channel: paramiko.Channel) -> int:
+        with self._lock:
+            self._monitors.append(channel)
+        try:
+            while not channel.closed:
+                time.sleep(0.1)
+        finally:
+            with self._lock:
+                self._monitors.remove(channel)
+        return 0
+
+    def __repr__(self) -> str:
+        return f"FakeSystemdHost({self.host}:{self.port}, {len(self._states)} units)"
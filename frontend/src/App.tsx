@@ -1,4 +1,4 @@
-import { useEffect, useReducer, useState } from "react";
+import { useCallback, useEffect, useReducer, useRef, useState } from "react";
 import "./App.css";
 import { socket, hostname, port } from "./utils/socket";
 import ServicesTable, { SystemdUnitState } from "./components/ServicesTableComponent";
@@ -23,19 +23,22 @@ type UpdateMessage = {
   data: { full_access_path: string; value: SerializedValue };
 };
 
+type HostReadiness = "CONNECTING" | "STALE" | "READY" | "UNREACHABLE";
+
 type ServiceHost = {
   value: {
     connected: { value: boolean };
+    readiness: { value: HostReadiness };
     hostname: { value: string };
     username: { value: string };
-    service_proxy_list: { value: ServiceProxy[] };
+    service_proxies: { value: Record<string, ServiceProxy> };
   };
 };
 export type State = {
   type: string;
   value: {
     service_hosts: {
-      value: ServiceHost[];
+      value: Record<string, ServiceHost>;
       readonly: false;
       type: "DataService";
     };
@@ -49,13 +52,20 @@ export type State = {
   doc: string | null;
 };
 
+export type UnitSubscription = {
+  hostnames: string[];
+  tags: string[];
+  units: [string, string][];
+};
+
 export type Action =
   | { type: "SET_DATA"; data: State }
   | {
       type: "UPDATE_ATTRIBUTE";
       fullAccessPath: string;
       newValue: SerializedValue;
-    };
+    }
+  | { type: "UPDATE_ATTRIBUTES"; newValues: SerializedValue[] };
 
 const reducer = (state: State | null, action: Action): State | null => {
   switch (action.type) {
@@ -76,6 +86,16 @@ const reducer = (state: State | null, action: Action): State | null => {
         ),
       };
     }
+    case "UPDATE_ATTRIBUTES": {
+      if (state === null) {
+        return null;
+      }
+      let value = state.value as unknown as Record<string, SerializedValue>;
+      for (const newValue of action.newValues) {
+        value = setNestedValueByPath(value, newValue.full_access_path, newValue);
+      }
+      return { ...state, value: value as unknown as State["value"] };
+    }
     default:
       throw new Error();
   }
@@ -85,6 +105,20 @@ const App = () => {
   const [state, dispatch] = useReducer(reducer, null);
   const [connectionStatus, setConnectionStatus] = useState("connecting");
   const { selectedService, setSelectedService } = useURLService();
+  const subscriptionRef = useRef<UnitSubscription>({
+    hostnames: [],
+    tags: [],
+    units: [],
+  });
+
+  // Restricts the notifications to the units the client is viewing. The subscribed
+  // units are sent back, as their state is stale if they were filtered out before.
+  const subscribe = useCallback((subscription: UnitSubscription) => {
+    subscriptionRef.current = subscription;
+    socket.emit("subscribe", subscription, (newValues: SerializedValue[]) =>
+      dispatch({ type: "UPDATE_ATTRIBUTES", newValues }),
+    );
+  }, []);
 
   function onNotify(value: UpdateMessage) {
     // Extracting data from the notification
@@ -104,6 +138,8 @@ const App = () => {
       fetch(`http://${hostname}:${port}/service-properties`)
         .then((response) => response.json())
         .then((data: State) => dispatch({ type: "SET_DATA", data }));
+      // The subscription is bound to the socket.io session
+      subscribe(subscriptionRef.current);
       setConnectionStatus("connected");
     });
     socket.on("disconnect", () => {
@@ -139,6 +175,7 @@ const App = () => {
           state={state}
           selectedService={selectedService}
           onSelectService={(service: string | null) => setSelectedService(service)}
+          onSubscribe={subscribe}
         />
       )}
       <ConnectionSnackbar connectionStatus={connectionStatus} />
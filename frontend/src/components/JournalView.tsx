@@ -0,0 +1,136 @@
+import { useEffect, useRef, useState } from "react";
+import { Box, Button } from "@mui/material";
+import { socket } from "../utils/socket";
+
+type JournalRecord = {
+  cursor: string;
+  timestamp: number;
+  priority: number;
+  identifier: string;
+  pid: number | null;
+  message: string;
+};
+
+type JournalPage = {
+  records: JournalRecord[];
+  has_more: boolean;
+};
+
+type JournalQuery = {
+  after_cursor?: string;
+  before_cursor?: string;
+};
+
+interface JournalViewProps {
+  hostname: string;
+  unit: string;
+}
+
+const PAGE_SIZE = 200;
+const POLL_INTERVAL = 5000;
+
+// Syslog priorities up to "error" are highlighted
+const priorityColor = (priority: number) =>
+  priority <= 3 ? "error.main" : priority === 4 ? "warning.main" : "inherit";
+
+const formatTimestamp = (timestamp: number) =>
+  new Date(timestamp * 1000).toLocaleString(undefined, { hour12: false });
+
+const JournalView = (props: JournalViewProps) => {
+  const { hostname, unit } = props;
+  const [records, setRecords] = useState<JournalRecord[]>([]);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+  const recordsRef = useRef<JournalRecord[]>([]);
+  const bottomRef = useRef<HTMLDivElement>(null);
+
+  const query = (options: JournalQuery): Promise<JournalPage> =>
+    new Promise((resolve, reject) => {
+      socket.emit(
+        "journal_query",
+        { hostname: hostname, unit: unit, limit: PAGE_SIZE, ...options },
+        (response: JournalPage | { error: string }) => {
+          if ("error" in response) {
+            reject(response.error);
+          } else {
+            resolve(response);
+          }
+        },
+      );
+    });
+
+  const updateRecords = (newRecords: JournalRecord[]) => {
+    recordsRef.current = newRecords;
+    setRecords(newRecords);
+  };
+
+  const loadOlder = () => {
+    const oldest = recordsRef.current[0];
+    query({ before_cursor: oldest.cursor })
+      .then((page) => {
+        updateRecords([...page.records, ...recordsRef.current]);
+        setHasOlder(page.has_more);
+      })
+      .catch(setError);
+  };
+
+  useEffect(() => {
+    let active = true;
+
+    // Only the entries following the newest shown one are fetched while polling
+    const loadNewer = () => {
+      const newest = recordsRef.current[recordsRef.current.length - 1];
+      query(newest ? { after_cursor: newest.cursor } : {})
+        .then((page) => {
+          if (active && page.records.length > 0) {
+            updateRecords([...recordsRef.current, ...page.records]);
+            bottomRef.current?.scrollIntoView();
+          }
+        })
+        .catch((e) => active && setError(e));
+    };
+
+    query({})
+      .then((page) => {
+        if (active) {
+          updateRecords(page.records);
+          setHasOlder(page.has_more);
+          bottomRef.current?.scrollIntoView();
+        }
+      })
+      .catch((e) => active && setError(e));
+    const interval = setInterval(loadNewer, POLL_INTERVAL);
+
+    return () => {
+      active = false;
+      clearInterval(interval);
+    };
+  }, [hostname, unit]);
+
+  return (
+    <Box
+      sx={{
+        fontFamily: "monospace",
+        fontSize: "0.8rem",
+        maxHeight: "60vh",
+        overflowY: "auto",
+        whiteSpace: "pre-wrap",
+      }}>
+      {hasOlder && (
+        <Button size="small" onClick={loadOlder}>
+          Load older entries
+        </Button>
+      )}
+      {records.map((record) => (
+        <Box key={record.cursor} sx={{ color: priorityColor(record.priority) }}>
+          {formatTimestamp(record.timestamp)} {record.identifier}
+          {record.pid !== null && `[${record.pid}]`}: {record.message}
+        </Box>
+      ))}
+      {error && <Box sx={{ color: "error.main" }}>{error}</Box>}
+      <div ref={bottomRef} />
+    </Box>
+  );
+};
+
+export default JournalView;
@@ -14,7 +14,11 @@ interface PtyTerminalProps {
   scrollback: number;
 }
 
+// Each terminal is a separate session on the server, addressed by its channel id
+const newChannelId = () => Math.random().toString(36).slice(2);
+
 const PtyTerminal = (props: PtyTerminalProps) => {
+  const channelId = useRef(newChannelId());
   const terminalDiv = useRef<HTMLDivElement>(null); // Reference to div where xterm is rendered
   const term = useRef<Terminal | null>(null);
   const fitAddon = useRef(new FitAddon()); // Reference to the fit addon
@@ -53,44 +57,70 @@ const PtyTerminal = (props: PtyTerminalProps) => {
       terminalDiv.current.addEventListener("wheel", handleWheel);
     }
     term.current.onData((data) => {
-      socket.emit("pty_input", { input: data });
+      socket.emit("pty_input", { input: data, channel_id: channelId.current });
     });
 
-    socket.off("pty-output");
-    socket.on("pty-output", (data) => {
-      // console.log('new output received from server:', data.output);
-      if (term.current) {
-        term.current.write(data.output);
+    // Large frames might be deflated by the server. Decompressing is asynchronous, so
+    // the writes are chained to keep the output in order.
+    let pendingWrite = Promise.resolve();
+    const handleOutput = (data: {
+      output: string | ArrayBuffer;
+      compressed?: boolean;
+      channel_id: string;
+    }) => {
+      if (data.channel_id !== channelId.current) {
+        return;
+      }
+      pendingWrite = pendingWrite.then(async () => {
+        const output = data.compressed
+          ? await new Response(
+              new Blob([data.output])
+                .stream()
+                .pipeThrough(new DecompressionStream("deflate")),
+            ).text()
+          : (data.output as string);
+        if (term.current) {
+          term.current.write(output);
+        }
+      });
+    };
+    const handleTaskFinished = (data: { reason: string; channel_id: string }) => {
+      if (data.channel_id !== channelId.current) {
+        return;
       }
-    });
-
-    socket.off("task_finished");
-    socket.on("task_finished", (data) => {
       console.log("Task finished", data);
-    });
-
-    socket.off("channel_closed");
-    socket.on("channel_closed", (data) => {
-      console.log("Channel closed", data);
-    });
+      if (data.reason && term.current) {
+        term.current.writeln(`\r\n${data.reason}`);
+      }
+    };
+    const handleChannelClosed = (data: { channel_id: string }) => {
+      if (data.channel_id === channelId.current) {
+        console.log("Channel closed", data);
+      }
+    };
+    socket.on("pty-output", handleOutput);
+    socket.on("task_finished", handleTaskFinished);
+    socket.on("channel_closed", handleChannelClosed);
 
     fitAddon.current.fit(); // Adjust terminal size
     const dims = { cols: term.current.cols, rows: term.current.rows };
-    socket.emit("resize", dims);
     console.log("sending new dimensions to server's pty", dims);
     socket.emit("start_command", {
       hostname: props.hostname,
       username: props.username,
       cmd: cmd,
       cmd_args: cmdArgs,
+      channel_id: channelId.current,
+      ...dims,
     });
 
     // Clean up and close connection when component unmounts
     return () => {
       console.log("Signing off");
-      socket.off("task_finished");
-      socket.off("channel_closed");
-      socket.off("pty-output");
+      socket.emit("stop_command", { channel_id: channelId.current });
+      socket.off("task_finished", handleTaskFinished);
+      socket.off("channel_closed", handleChannelClosed);
+      socket.off("pty-output", handleOutput);
       if (term.current) {
         term.current.dispose();
       }
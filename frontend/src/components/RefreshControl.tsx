@@ -87,7 +87,7 @@ export const RefreshControl = React.memo((props: RefreshControlProps) => {
             <RestartAltIcon />
           </Button>
         </Tooltip>
-        <Tooltip title="Set auto refresh interval">
+        <Tooltip title="Set the longest auto refresh interval of a host">
           <Button
             size="small"
             onClick={handleToggle}
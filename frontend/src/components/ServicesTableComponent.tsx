@@ -16,35 +16,63 @@ import {
   MenuItem,
   IconButton,
   Tooltip,
+  LinearProgress,
 } from "@mui/material";
 import { TabContext, TabPanel } from "@mui/lab";
 import PtyTerminal from "./PtyTerminal";
+import JournalView from "./JournalView";
+import UnitResources from "./UnitResources";
 import PlayArrowIcon from "@mui/icons-material/PlayArrow";
 import StopIcon from "@mui/icons-material/Stop";
 import RestartAltIcon from "@mui/icons-material/RestartAlt";
-import { runMethod } from "../utils/socket";
-import { ServiceProxy, State } from "../App";
+import { runMethod, socket } from "../utils/socket";
+import { ServiceProxy, State, UnitSubscription } from "../App";
 import { useURLTags } from "../hooks/useURLTags";
+import { useVisibleRows } from "../hooks/useVisibleRows";
 
 export type SystemdUnitState = {
-  value: "ACTIVE" | "INACTIVE" | "FAILED" | "DEACTIVATING";
+  value:
+    | "ACTIVE"
+    | "INACTIVE"
+    | "FAILED"
+    | "ACTIVATING"
+    | "DEACTIVATING"
+    | "RELOADING"
+    | "MAINTENANCE"
+    | "REFRESHING";
   enum: {
     ACTIVE: "active";
     INACTIVE: "inactive";
     FAILED: "failed";
+    ACTIVATING: "activating";
     DEACTIVATING: "deactivating";
+    RELOADING: "reloading";
+    MAINTENANCE: "maintenance";
+    REFRESHING: "refreshing";
   };
 };
 
+type UnitQueryResult = {
+  units: [string, string][];
+  tag_counts: Record<string, number>;
+  state_counts: Record<string, number>;
+};
+
+const UNIT_QUERY_INTERVAL = 500;
+
+const rowKey = (serviceProxy: ServiceProxy) =>
+  JSON.stringify([serviceProxy.value.hostname.value, serviceProxy.value.unit.value]);
+
 type ServicesTableProps = {
   state: State;
   selectedService: string | null;
   onSelectService: (service: string | null) => void;
+  onSubscribe: (subscription: UnitSubscription) => void;
 };
 
 const ServicesTable = React.memo((props: ServicesTableProps) => {
-  const { state, selectedService, onSelectService } = props;
-  const [serviceProxyList, setServiceProxyList] = useState<ServiceProxy[]>([]);
+  const { state, selectedService, onSelectService, onSubscribe } = props;
+  const [unitQuery, setUnitQuery] = useState<UnitQueryResult | null>(null);
   const [displayedServices, setDisplayedServices] = useState<ServiceProxy[]>([]);
   const [allTags, setAllTags] = useState<string[]>([]);
   const [allHostnames, setAllHostnames] = useState<string[]>([]);
@@ -56,53 +84,87 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
   const [terminalKey, setTerminalKey] = useState(Date.now()); // used to rerender the Terminal by changing the key
   const selectedServiceRef = useRef<HTMLTableRowElement | null>(null);
   const [hasScrolledInitially, setHasScrolledInitially] = useState(false);
+  const filtersRef = useRef<{ hostnames: string[]; tags: string[] }>({
+    hostnames: [],
+    tags: selectedTags,
+  });
+  const queryTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null);
+  const { visibleRows, observeRow } = useVisibleRows();
+  const subscribedRowsRef = useRef<string | null>(null);
 
-  useEffect(() => {
-    // Update serviceProxyList based on the `state`
-    const newList = state.value.service_hosts.value.flatMap((host, hostIndex) =>
-      host.value.service_proxy_list.value.map((serviceProxy, serviceIndex) => ({
-        ...serviceProxy,
-        fullAccessPath: `service_hosts[${hostIndex}].service_proxy_list[${serviceIndex}]`,
-      })),
+  // The units matching the selected hostnames and tags are looked up by the
+  // orchestrator, which keeps an index of them
+  const queryUnits = () => {
+    queryTimeoutRef.current = null;
+    socket.emit("query_units", filtersRef.current, (result: UnitQueryResult) =>
+      setUnitQuery(result),
     );
-    setServiceProxyList(newList);
+  };
 
-    // Update allHostnames based on the `state`
-    setAllHostnames(
-      Array.from(
-        new Set(
-          state.value.service_hosts.value.map((host) => host.value.hostname.value),
-        ),
-      ),
-    );
+  useEffect(() => {
+    filtersRef.current = { hostnames: selectedHostnames, tags: selectedTags };
+    queryUnits();
+  }, [selectedTags, selectedHostnames]);
 
-    // Update allTags based on the `state`
-    setAllTags(
-      Array.from(
-        new Set(
-          newList.flatMap((serviceProxy) =>
-            serviceProxy.value.tags.value.map((tag) => tag.value),
-          ),
-        ),
-      ),
-    );
+  // Only get notified about the units whose rows are visible. The subscription is
+  // only renewed when they change, as renewing it sends back the state of the units.
+  useEffect(() => {
+    const displayedRows = new Set(displayedServices.map(rowKey));
+    const rows = [...visibleRows].filter((key) => displayedRows.has(key)).sort();
+    const subscribedRows = JSON.stringify(rows);
+    if (subscribedRows === subscribedRowsRef.current) {
+      return;
+    }
+    subscribedRowsRef.current = subscribedRows;
+    onSubscribe({
+      hostnames: [],
+      tags: [],
+      units: rows.map((key) => JSON.parse(key) as [string, string]),
+    });
+  }, [visibleRows, displayedServices]);
+
+  useEffect(() => {
+    setAllHostnames(Object.keys(state.value.service_hosts.value));
+
+    // Units might have changed their state or tags, thus the query is repeated (at
+    // most every UNIT_QUERY_INTERVAL ms)
+    if (queryTimeoutRef.current === null) {
+      queryTimeoutRef.current = setTimeout(queryUnits, UNIT_QUERY_INTERVAL);
+    }
   }, [state]);
 
   useEffect(() => {
-    // Contains all the ServiceProxy elements that are on the selected hostname and has
-    // at least on of the selcted tags.
+    return () => {
+      if (queryTimeoutRef.current !== null) {
+        clearTimeout(queryTimeoutRef.current);
+      }
+    };
+  }, []);
+
+  useEffect(() => {
+    if (unitQuery === null) {
+      return;
+    }
+    setAllTags(Object.keys(unitQuery.tag_counts).sort());
+
+    // The rows are addressed by hostname and unit name, which stay valid when other
+    // units appear or disappear
+    const serviceHosts = state.value.service_hosts.value;
     setDisplayedServices(
-      serviceProxyList.filter(
-        (serviceProxy) =>
-          (selectedTags.length === 0 ||
-            serviceProxy.value.tags.value.some((tag) =>
-              selectedTags.includes(tag.value),
-            )) &&
-          (selectedHostnames.length === 0 ||
-            selectedHostnames.includes(serviceProxy.value.hostname.value)),
-      ),
+      unitQuery.units.flatMap(([hostname, unit]) => {
+        const serviceProxy = serviceHosts[hostname]?.value.service_proxies.value[unit];
+        if (serviceProxy === undefined) {
+          return [];
+        }
+        return [
+          {
+            ...serviceProxy,
+            fullAccessPath: `service_hosts["${hostname}"].service_proxies["${unit}"]`,
+          },
+        ];
+      }),
     );
-  }, [serviceProxyList, selectedTags, selectedHostnames]);
+  }, [unitQuery, state]);
 
   // Scroll to the selected service row when loading the page
   useEffect(() => {
@@ -132,8 +194,39 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
 
     runMethod(`${fullAccessPath}.${action}`);
   };
+  // The hosts are connected in the background, thus their units show up one host
+  // after the other. Until then, the units saved by the last run are shown as stale.
+  const serviceHosts = Object.values(state.value.service_hosts.value);
+  const connectingHosts = serviceHosts.filter((serviceHost) =>
+    ["CONNECTING", "STALE"].includes(serviceHost.value.readiness.value),
+  ).length;
+  const staleHostnames = new Set(
+    serviceHosts
+      .filter((serviceHost) => serviceHost.value.readiness.value !== "READY")
+      .map((serviceHost) => serviceHost.value.hostname.value),
+  );
+  const unreachableHosts = serviceHosts
+    .filter((serviceHost) => serviceHost.value.readiness.value === "UNREACHABLE")
+    .map((serviceHost) => serviceHost.value.hostname.value);
+
   return (
     <>
+      {connectingHosts > 0 && (
+        <Box sx={{ marginBottom: "10px" }}>
+          Connecting to {connectingHosts} of {serviceHosts.length} hosts...
+          <LinearProgress
+            variant="determinate"
+            value={
+              (100 * (serviceHosts.length - connectingHosts)) / serviceHosts.length
+            }
+          />
+        </Box>
+      )}
+      {unreachableHosts.length > 0 && (
+        <Box sx={{ marginBottom: "10px", color: "error.main" }}>
+          Unreachable: {unreachableHosts.join(", ")}
+        </Box>
+      )}
       <div style={{ float: "right" }}>
         <div
           style={{
@@ -196,12 +289,17 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
                       selectedService === serviceProxy.fullAccessPath
                         ? "#e0e0e0"
                         : "transparent",
+                    opacity: staleHostnames.has(serviceProxy.value.hostname.value)
+                      ? 0.5
+                      : 1,
+                  }}
+                  data-row-key={rowKey(serviceProxy)}
+                  ref={(row) => {
+                    if (selectedService === serviceProxy.fullAccessPath) {
+                      selectedServiceRef.current = row;
+                    }
+                    observeRow(row);
                   }}
-                  ref={
-                    selectedService === serviceProxy.fullAccessPath
-                      ? selectedServiceRef
-                      : null
-                  }
                   onClick={() => {
                     if (selectedService === serviceProxy.fullAccessPath) {
                       onSelectService(null); // set to null to collapse
@@ -301,6 +399,10 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
                                 ))}
                             </ul>{" "}
                             <br></br>
+                            <UnitResources
+                              hostname={serviceProxy.value.hostname.value}
+                              unit={serviceProxy.value.unit.value}
+                            />
                           </TabPanel>
 
                           <TabPanel value="logs">
@@ -325,6 +427,7 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
                                   setTerminalKey(Date.now()); // Update the terminalKey state to force a re-render
                                 }}>
                                 <MenuItem value="journalctl">journalctl</MenuItem>
+                                <MenuItem value="journal">journal (structured)</MenuItem>
                                 <MenuItem value="systemctl">systemctl</MenuItem>
                                 <MenuItem value="podman">podman</MenuItem>
                               </Select>
@@ -345,6 +448,14 @@ const ServicesTable = React.memo((props: ServicesTableProps) => {
                               />
                             )}
 
+                            {key === "journal" && (
+                              <JournalView
+                                key={terminalKey}
+                                hostname={serviceProxy.value.hostname.value}
+                                unit={serviceProxy.value.unit.value}
+                              />
+                            )}
+
                             {key === "systemctl" && (
                               <PtyTerminal
                                 key={terminalKey}
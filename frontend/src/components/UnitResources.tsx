@@ -0,0 +1,122 @@
+import { useEffect, useState } from "react";
+import { Box } from "@mui/material";
+import { socket } from "../utils/socket";
+
+type TelemetrySeries = {
+  time: number[];
+  memory_bytes: (number | null)[];
+  cpu_rate: (number | null)[];
+  restarts: (number | null)[];
+};
+
+type UnitTelemetry = {
+  main_pid: number | null;
+  active_enter_timestamp: string;
+  samples: TelemetrySeries;
+};
+
+interface UnitResourcesProps {
+  hostname: string;
+  unit: string;
+}
+
+// The samples are kept by the orchestrator, thus polling them costs no SSH calls
+const POLL_INTERVAL = 5000;
+const SPARKLINE_WIDTH = 160;
+const SPARKLINE_HEIGHT = 30;
+
+const formatBytes = (bytes: number) => {
+  const units = ["B", "KiB", "MiB", "GiB", "TiB"];
+  let exponent = 0;
+  while (bytes >= 1024 && exponent < units.length - 1) {
+    bytes /= 1024;
+    exponent++;
+  }
+  return `${bytes.toFixed(exponent === 0 ? 0 : 1)} ${units[exponent]}`;
+};
+
+const lastValue = (values: (number | null)[]) => {
+  for (let i = values.length - 1; i >= 0; i--) {
+    if (values[i] !== null) {
+      return values[i];
+    }
+  }
+  return null;
+};
+
+const Sparkline = ({ time, values }: { time: number[]; values: (number | null)[] }) => {
+  const known = values.filter((value): value is number => value !== null);
+  if (known.length < 2) {
+    return null;
+  }
+  const minValue = Math.min(...known);
+  const valueRange = Math.max(...known) - minValue || 1;
+  const timeRange = time[time.length - 1] - time[0] || 1;
+  // Unknown values interrupt the line
+  const segments: string[][] = [[]];
+  values.forEach((value, i) => {
+    if (value === null) {
+      segments.push([]);
+      return;
+    }
+    const x = ((time[i] - time[0]) / timeRange) * SPARKLINE_WIDTH;
+    const y = SPARKLINE_HEIGHT - ((value - minValue) / valueRange) * SPARKLINE_HEIGHT;
+    segments[segments.length - 1].push(`${x.toFixed(1)},${y.toFixed(1)}`);
+  });
+  return (
+    <svg
+      width={SPARKLINE_WIDTH}
+      height={SPARKLINE_HEIGHT}
+      style={{ verticalAlign: "middle", marginLeft: "10px" }}>
+      {segments.map((points, i) => (
+        <polyline
+          key={i}
+          points={points.join(" ")}
+          fill="none"
+          stroke="currentColor"
+          strokeWidth={1}
+        />
+      ))}
+    </svg>
+  );
+};
+
+const UnitResources = (props: UnitResourcesProps) => {
+  const { hostname, unit } = props;
+  const [telemetry, setTelemetry] = useState<UnitTelemetry | null>(null);
+
+  useEffect(() => {
+    const poll = () =>
+      socket.emit(
+        "unit_telemetry",
+        { hostname: hostname, unit: unit },
+        (response: UnitTelemetry | null) => setTelemetry(response),
+      );
+    poll();
+    const interval = setInterval(poll, POLL_INTERVAL);
+    return () => clearInterval(interval);
+  }, [hostname, unit]);
+
+  if (telemetry === null) {
+    return null;
+  }
+
+  const { time, memory_bytes, cpu_rate, restarts } = telemetry.samples;
+  const memory = lastValue(memory_bytes);
+  const cpu = lastValue(cpu_rate);
+  const restartCount = lastValue(restarts);
+  return (
+    <Box>
+      <b>Main PID</b>: {telemetry.main_pid ?? "-"} <br></br>
+      <b>Active since</b>: {telemetry.active_enter_timestamp || "-"} <br></br>
+      <b>Memory</b>: {memory !== null ? formatBytes(memory) : "-"}
+      <Sparkline time={time} values={memory_bytes} /> <br></br>
+      <b>CPU</b>: {cpu !== null ? `${(100 * cpu).toFixed(1)} %` : "-"}
+      <Sparkline time={time} values={cpu_rate} /> <br></br>
+      <b>Restarts</b>: {restartCount ?? "-"}
+      <Sparkline time={time} values={restarts} />
+    </Box>
+  );
+};
+
+export default UnitResources;
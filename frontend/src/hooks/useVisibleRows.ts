@@ -0,0 +1,45 @@
+import { useCallback, useEffect, useRef, useState } from "react";
+
+// Tracks which of the observed elements are (partly) visible in the viewport. The
+// elements are registered with `observeRow` (a ref callback) and identified by their
+// `data-row-key` attribute.
+export function useVisibleRows(): {
+  visibleRows: Set<string>;
+  observeRow: (element: HTMLElement | null) => void;
+} {
+  const [visibleRows, setVisibleRows] = useState<Set<string>>(new Set());
+  const observerRef = useRef<IntersectionObserver | null>(null);
+
+  const observeRow = useCallback((element: HTMLElement | null) => {
+    if (element === null) {
+      return;
+    }
+    // Ref callbacks run before effects, thus the observer is created lazily
+    if (observerRef.current === null) {
+      observerRef.current = new IntersectionObserver((entries) =>
+        setVisibleRows((currentRows) => {
+          const rows = new Set(currentRows);
+          for (const entry of entries) {
+            const key = (entry.target as HTMLElement).dataset.rowKey;
+            if (key === undefined) {
+              continue;
+            }
+            if (entry.isIntersecting) {
+              rows.add(key);
+            } else {
+              rows.delete(key);
+            }
+          }
+          return rows;
+        }),
+      );
+    }
+    observerRef.current.observe(element);
+  }, []);
+
+  useEffect(() => {
+    return () => observerRef.current?.disconnect();
+  }, []);
+
+  return { visibleRows, observeRow };
+}
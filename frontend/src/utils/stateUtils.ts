@@ -153,36 +153,59 @@ function getContainerItemByKey(
   }
 }
 
+function setContainerItem(
+  container: Record<string, SerializedValue> | SerializedValue[],
+  key: string,
+  item: SerializedValue,
+): void {
+  const processedKey = parseSerializedKey(key);
+
+  if (Array.isArray(container)) {
+    container[processedKey as number] = item;
+  } else {
+    container[processedKey] = item;
+  }
+}
+
+/**
+ * Returns a copy of the serialization dict with the object at the given path updated.
+ *
+ * Only the objects along the path are copied, such that the unchanged parts of the
+ * state keep their identity and an update does not scale with the size of the state.
+ */
 export function setNestedValueByPath(
   serializationDict: Record<string, SerializedValue>,
   path: string,
   serializedValue: SerializedValue,
 ): Record<string, SerializedValue> {
   const pathParts = parseFullAccessPath(path);
-  const newSerializationDict: Record<string, SerializedValue> = JSON.parse(
-    JSON.stringify(serializationDict),
-  );
+  const newSerializationDict: Record<string, SerializedValue> = {
+    ...serializationDict,
+  };
 
-  let currentDict = newSerializationDict;
+  let currentDict: Record<string, SerializedValue> | SerializedValue[] =
+    newSerializationDict;
 
   try {
     for (let i = 0; i < pathParts.length - 1; i++) {
       const pathPart = pathParts[i];
-      const nextLevelSerializedObject = getContainerItemByKey(
-        currentDict,
-        pathPart,
-        false,
-      );
-      currentDict = nextLevelSerializedObject["value"] as Record<
-        string,
-        SerializedValue
-      >;
+      const nextLevelSerializedObject = {
+        ...getContainerItemByKey(currentDict, pathPart, false),
+      };
+      const nextLevelValue = nextLevelSerializedObject["value"];
+      nextLevelSerializedObject["value"] = Array.isArray(nextLevelValue)
+        ? [...nextLevelValue]
+        : { ...(nextLevelValue as Record<string, unknown>) };
+      setContainerItem(currentDict, pathPart, nextLevelSerializedObject);
+      currentDict = nextLevelSerializedObject["value"] as
+        | Record<string, SerializedValue>
+        | SerializedValue[];
     }
 
     const finalPart = pathParts[pathParts.length - 1];
     const finalObject = getContainerItemByKey(currentDict, finalPart, true);
 
-    Object.assign(finalObject, serializedValue);
+    setContainerItem(currentDict, finalPart, { ...finalObject, ...serializedValue });
 
     return newSerializationDict;
   } catch (error) {
@@ -5,13 +5,21 @@ import pydase
 
 import orchestrator.web_server.setup_sio_events
 from orchestrator import SystemdServiceOrchestrator
+from orchestrator.config import SystemdServiceOrchestratorConfig
+from orchestrator.web_server.metrics_server import MetricsServer
 
 logging.getLogger("paramiko.transport").setLevel(logging.INFO)
 
 orchestrator.web_server.setup_sio_events.main()
 
+config = SystemdServiceOrchestratorConfig()
 service = SystemdServiceOrchestrator()
 pydase.Server(
     service,
     frontend_src=Path(__file__).parent / "frontend",
+    additional_servers=[
+        {"server": MetricsServer, "port": config.metrics_port, "kwargs": {}}
+    ]
+    if config.metrics_port is not None
+    else [],
 ).run()
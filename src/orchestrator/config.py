@@ -7,18 +7,77 @@ from `ServiceConfig().config_dir / "config.yaml"` which can be configured using
 from pathlib import Path
 
 import confz
-from pydantic import SecretStr
+from pydantic import Field, SecretStr
 from pydase.config import ServiceConfig
 
 
 class ServiceHostConfig(confz.BaseConfig):  # type: ignore[misc]
     hostname: str
+    port: int = 22
     username: str
     password: SecretStr | None = None
     ssh_key_path: Path | None = None
+    push_updates: bool = False
+    """Follow unit state changes through a D-Bus monitor (requires `busctl --json`)
+    instead of relying on polling only."""
 
 
 class SystemdServiceOrchestratorConfig(confz.BaseConfig):  # type: ignore[misc]
     service_hosts: list[ServiceHostConfig]
+    max_concurrent_host_updates: int = 16
+    """Maximum number of hosts that are polled at the same time (per poll worker
+    process, if any)."""
+    poll_worker_processes: int = 0
+    """Number of worker processes the hosts are polled in, each one polling a shard of
+    the hosts (0 polls them in the orchestrator process), see
+    `orchestrator.poll_shards`."""
+    host_update_timeout: float = 30.0
+    """Time in seconds after which polling a single host is given up."""
+    min_poll_interval: float = 2.0
+    """Shortest polling interval in seconds of a host, used right after an action on or
+    a change of its units. The interval grows up to `update_wait_time` of the
+    orchestrator while nothing changes."""
+    poll_jitter: float = 0.2
+    """Relative random variation of the polling intervals, spreading the polls of the
+    hosts over time."""
+    max_host_polls_per_second: float | None = None
+    """Upper bound of the host polls started per second over all hosts, if set."""
+    consistency_sweep_interval: float = 300.0
+    """Polling interval in seconds of hosts with `push_updates` enabled."""
+    snapshot_ttl: float = 5.0
+    """Time in seconds for which the scanned units of a host are reused by refreshes
+    and, at most for `min_poll_interval`, by polls."""
+    telemetry_samples: int = Field(default=60, gt=0)
+    """Number of recent resource samples (memory, CPU and restarts) kept per unit."""
+    unit_state_file: Path | None = ServiceConfig().config_dir / "unit_states.json"
+    """File the last known units of all hosts are saved to and restored from on
+    startup (`None` disables saving them)."""
+    unit_state_save_interval: float = 5.0
+    """Time in seconds between saves of the unit state file (only if units changed)."""
+    ssh_keepalive_interval: int = 30
+    """Interval in seconds of the keepalive packets sent on the SSH connections."""
+    max_reconnection_wait_time: float = 300.0
+    """Upper bound in seconds of the exponential backoff when reconnecting hosts."""
+    compress_terminal_output: bool = False
+    """Deflate large frames of terminal output sent to the browser."""
+    max_terminal_sessions_per_client: int = 8
+    """Maximum number of terminal sessions a single browser client can have open."""
+    max_terminal_sessions: int = 64
+    """Maximum number of terminal sessions open over all browser clients."""
+    max_terminal_input_rate: float | None = 64 * 1024
+    """Maximum number of bytes per second a single browser client can type or paste
+    into its terminal sessions (`None` for no limit)."""
+    share_log_streams: bool = True
+    """Let clients following the same logs on a host share a single remote session."""
+    rollout_dependencies: dict[str, list[str]] = Field(default_factory=dict)
+    """Dependencies of units for rollouts in addition to their `After=` and `Requires=`
+    properties, also across hosts, as `"<hostname>/<unit>": ["<hostname>/<unit>", ...]`,
+    see `orchestrator.rollouts`."""
+    config_reload_interval: float | None = 5.0
+    """Interval in seconds at which this file is checked for changes of the service
+    hosts, which are applied without a restart (`None` disables reloading), see
+    `orchestrator.config_watcher`."""
+    metrics_port: int | None = None
+    """Port serving the metrics in the Prometheus text format at `/metrics`, if set."""
 
     CONFIG_SOURCES = confz.FileSource(file=ServiceConfig().config_dir / "config.yaml")
@@ -0,0 +1,96 @@
+"""
+Reloading of the service hosts from the config file.
+
+The config file is checked for changes by comparing its modification time, size and
+inode every `config_reload_interval` seconds. The standard library has no file change
+notifications, and polling the metadata of a single file is cheap enough.
+
+A changed file is loaded and validated as a whole; if it is invalid, the current config
+is kept. The hosts are compared by hostname, such that only added, removed and changed
+hosts are touched by the orchestrator. Other settings take effect on the next restart.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import confz
+
+from orchestrator.config import ServiceHostConfig, SystemdServiceOrchestratorConfig
+
+logger = logging.getLogger(__name__)
+
+
+class HostConfigChanges(NamedTuple):
+    added: list[ServiceHostConfig]
+    removed: list[str]
+    """Hostnames of the removed hosts."""
+    changed: list[ServiceHostConfig]
+    """New configs of the hosts whose connection settings changed."""
+
+
+def diff_host_configs(
+    current: dict[str, ServiceHostConfig], new: dict[str, ServiceHostConfig]
+) -> HostConfigChanges:
+    return HostConfigChanges(
+        added=[config for hostname, config in new.items() if hostname not in current],
+        removed=[hostname for hostname in current if hostname not in new],
+        changed=[
+            config
+            for hostname, config in new.items()
+            if hostname in current and current[hostname] != config
+        ],
+    )
+
+
+def _file_signature(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ConfigWatcher:
+    """Follows the changes of the service hosts in the config file at `path`, starting
+    from the already loaded `config`."""
+
+    def __init__(self, path: Path, config: SystemdServiceOrchestratorConfig) -> None:
+        self._path = path
+        self._signature = _file_signature(path)
+        self._config = config
+        self._hosts = {host.hostname: host for host in config.service_hosts}
+
+    def check(self) -> HostConfigChanges | None:
+        """Reloads the config file if it changed since the last check. Returns the
+        changes of the hosts, or `None` if the file did not change or is invalid.
+        Blocks while the file is read."""
+
+        signature = _file_signature(self._path)
+        if signature == self._signature:
+            return None
+        self._signature = signature
+
+        try:
+            config = SystemdServiceOrchestratorConfig(
+                config_sources=confz.FileSource(file=self._path)
+            )
+        except Exception as e:
+            logger.error("Ignoring the changes of %s: %s", self._path, e)
+            return None
+
+        if config.model_dump(exclude={"service_hosts"}) != self._config.model_dump(
+            exclude={"service_hosts"}
+        ):
+            logger.warning(
+                "Settings other than the service hosts changed in %s, they take "
+                "effect after a restart.",
+                self._path,
+            )
+        self._config = config
+
+        hosts = {host.hostname: host for host in config.service_hosts}
+        changes = diff_host_configs(self._hosts, hosts)
+        self._hosts = hosts
+        return changes
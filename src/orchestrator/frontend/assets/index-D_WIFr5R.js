@@ -162,4 +162,4 @@ WARNING: This link could potentially be dangerous`)){const u=window.open();if(u)
  * LICENSE.md file in the root directory of this source tree.
  *
  * @license MIT
- */function nh(e){return e===void 0&&(e=""),new URLSearchParams(typeof e=="string"||Array.isArray(e)||e instanceof URLSearchParams?e:Object.keys(e).reduce((t,r)=>{let n=e[r];return t.concat(Array.isArray(n)?n.map(i=>[r,i]):[[r,n]])},[]))}function N5(e,t){let r=nh(e);return t&&t.forEach((n,i)=>{r.has(i)||t.getAll(i).forEach(s=>{r.append(i,s)})}),r}const F5="6";try{window.__reactRouterVersion=F5}catch{}const z5="startTransition",Jg=ll[z5];function H5(e){let{basename:t,children:r,future:n,window:i}=e,s=T.useRef();s.current==null&&(s.current=y5({window:i,v5Compat:!0}));let c=s.current,[o,a]=T.useState({action:c.action,location:c.location}),{v7_startTransition:f}=n||{},g=T.useCallback(p=>{f&&Jg?Jg(()=>a(p)):a(p)},[a,f]);return T.useLayoutEffect(()=>c.listen(g),[c,g]),T.createElement($5,{basename:t,children:r,location:o.location,navigationType:o.action,navigator:c,future:n})}var Zg;(function(e){e.UseScrollRestoration="useScrollRestoration",e.UseSubmit="useSubmit",e.UseSubmitFetcher="useSubmitFetcher",e.UseFetcher="useFetcher",e.useViewTransitionState="useViewTransitionState"})(Zg||(Zg={}));var em;(function(e){e.UseFetcher="useFetcher",e.UseFetchers="useFetchers",e.UseScrollRestoration="useScrollRestoration"})(em||(em={}));function S1(e){let t=T.useRef(nh(e)),r=T.useRef(!1),n=m1(),i=T.useMemo(()=>N5(n.search,r.current?null:t.current),[n.search]),s=Jf(),c=T.useCallback((o,a)=>{const f=nh(typeof o=="function"?o(i):o);r.current=!0,s("?"+f,a)},[s,i]);return[i,c]}function j5(){var i;const[e]=S1(),t=Jf();return{selectedURLTags:((i=e.get("tags"))==null?void 0:i.split(","))||[],setSelectedURLTags:s=>{const c=new URLSearchParams(e.toString());s&&s.length>0?c.set("tags",s.join(",")):c.delete("tags"),t({search:c.toString()})}}}const C1=Wt.memo(e=>{const{state:t,selectedService:r,onSelectService:n}=e,[i,s]=T.useState([]),[c,o]=T.useState([]),[a,f]=T.useState([]),[g,p]=T.useState([]),[v,y]=T.useState([]),{selectedURLTags:S,setSelectedURLTags:_}=j5(),[h,u]=T.useState(S),[l,d]=T.useState("journalctl"),[m,b]=T.useState("description"),[w,x]=T.useState(Date.now()),C=T.useRef(null),[E,R]=T.useState(!1);T.useEffect(()=>{const P=t.value.service_hosts.value.flatMap(($,z)=>$.value.service_proxy_list.value.map((F,j)=>({...F,fullAccessPath:`service_hosts[${z}].service_proxy_list[${j}]`})));s(P),p(Array.from(new Set(t.value.service_hosts.value.map($=>$.value.hostname.value)))),f(Array.from(new Set(P.flatMap($=>$.value.tags.value.map(z=>z.value)))))},[t]),T.useEffect(()=>{o(i.filter(P=>(h.length===0||P.value.tags.value.some($=>h.includes($.value)))&&(v.length===0||v.includes(P.value.hostname.value))))},[i,h,v]),T.useEffect(()=>{E||(r?C.current&&(C.current.scrollIntoView({behavior:"smooth"}),R(!0)):R(!0))},[c]);const I=P=>{_(P),u(P)},L=(P,$,z)=>{P.stopPropagation(),Za(`${z}.${$}`)};return B.jsxs(B.Fragment,{children:[B.jsxs("div",{style:{float:"right"},children:[B.jsx("div",{style:{display:"inline-block",marginRight:"10px",minWidth:"200px"},children:B.jsx(Sg,{multiple:!0,id:"hostnames-autocomplete",options:g,onChange:(P,$)=>y($),renderInput:P=>B.jsx(Kg,{...P,variant:"standard",label:"Hostnames",placeholder:"Select hostnames"})})}),B.jsx("div",{style:{display:"inline-block",minWidth:"200px"},children:B.jsx(Sg,{multiple:!0,id:"tags-autocomplete",options:a,value:h,onChange:(P,$)=>I($),renderInput:P=>B.jsx(Kg,{...P,variant:"standard",label:"Tags",placeholder:"Filter tags"})})})]}),B.jsx(fA,{component:Ri,children:B.jsxs(QO,{children:[B.jsx(yA,{children:B.jsxs(Bu,{children:[B.jsx($r,{children:"Service"}),B.jsx($r,{children:"Tags"}),B.jsx($r,{children:"Hostname"}),B.jsx($r,{children:"State"}),B.jsx($r,{})]})}),B.jsx(nA,{children:c.map(P=>B.jsxs(Wt.Fragment,{children:[B.jsxs(Bu,{style:{cursor:"pointer",backgroundColor:r===P.fullAccessPath?"#e0e0e0":"transparent"},ref:r===P.fullAccessPath?C:null,onClick:()=>{r===P.fullAccessPath?n(null):n(P.fullAccessPath)},children:[B.jsx($r,{children:P.value.unit.value.slice(10)}),B.jsx($r,{children:P.value.tags.value.flatMap($=>$.value).join(", ")}),B.jsx($r,{children:P.value.hostname.value}),B.jsx($r,{style:{backgroundColor:P.value.state.value==="ACTIVE"?"green":P.value.state.value==="FAILED"?"red":"orange",color:"white"},children:P.value.state.value==="INACTIVE"?"stopped":P.value.state.enum[P.value.state.value]}),B.jsxs($r,{children:[B.jsx(fo,{title:"Start Service",children:B.jsx(Fn,{"aria-label":"play",size:"small",onClick:$=>L($,"start",P.fullAccessPath),children:B.jsx(h1,{color:"success"})})}),B.jsx(fo,{title:"Stop Service",children:B.jsx(Fn,{"aria-label":"stop",size:"small",onClick:$=>L($,"stop",P.fullAccessPath),children:B.jsx(f1,{color:"error"})})}),B.jsx(fo,{title:"Restart Service",children:B.jsx(Fn,{"aria-label":"restart",size:"small",onClick:$=>L($,"restart",P.fullAccessPath),children:B.jsx(Ul,{color:"primary"})})})]})]}),r===P.fullAccessPath&&B.jsx(Bu,{children:B.jsx($r,{colSpan:7,children:B.jsx(JA,{value:m,children:B.jsxs(EP,{id:"row-content",children:[B.jsxs(VA,{value:m,sx:{borderRight:1,borderColor:"divider"},onChange:($,z)=>b(z),children:[B.jsx($g,{label:"Description",value:"description"}),B.jsx($g,{label:"Logs",value:"logs"})]}),B.jsxs(qg,{value:"description",children:[B.jsx("p",{children:P.value.description.value}),B.jsx("b",{children:"Hostname"}),": ",P.value.hostname.value," ",B.jsx("br",{}),B.jsx("br",{}),B.jsx("b",{children:"Systemd Unit Name"}),": ",P.value.unit.value," ",B.jsx("br",{}),B.jsx("b",{children:"State"}),":"," ",P.value.state.enum[P.value.state.value]," ",B.jsx("br",{}),B.jsx("b",{children:"Tags"}),":",B.jsx("ul",{children:P.value.tags.value.flatMap($=>$.value).map(($,z)=>B.jsx("li",{children:$},z))})," ",B.jsx("br",{})]}),B.jsxs(qg,{value:"logs",children:[B.jsxs("div",{style:{textAlign:"right",marginBottom:"10px"},children:[B.jsx(Fn,{"aria-label":"restart",size:"medium",onClick:()=>{x(Date.now())},children:B.jsx(Ul,{color:"primary"})}),B.jsxs(Uf,{value:l,onChange:$=>{d($.target.value),x(Date.now())},children:[B.jsx(al,{value:"journalctl",children:"journalctl"}),B.jsx(al,{value:"systemctl",children:"systemctl"}),B.jsx(al,{value:"podman",children:"podman"})]})]}),l==="journalctl"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"journalctl",cmdArgs:"--user --unit='"+P.value.unit.value+"' -n 300 -f",scrollback:9999},w),l==="systemctl"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"systemctl",cmdArgs:"--user status "+P.value.unit.value,scrollback:0},w),l==="podman"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"podman",cmdArgs:"logs -f "+P.value.unit.value.slice(10),scrollback:9999},w)]})]})})})})]},P.value.hostname.value+P.value.unit.value))})]})})]})});C1.displayName="ServicesTable";var Zf={},W5=ki;Object.defineProperty(Zf,"__esModule",{value:!0});var w1=Zf.default=void 0,U5=W5(ia()),V5=B;w1=Zf.default=(0,U5.default)((0,V5.jsx)("path",{d:"M19 6.41 17.59 5 12 10.59 6.41 5 5 6.41 10.59 12 5 17.59 6.41 19 12 13.41 17.59 19 19 17.59 13.41 12z"}),"Close");const x1=Wt.memo(({connectionStatus:e})=>{const[t,r]=T.useState(!0),n=(f,g)=>{g!=="clickaway"&&r(!1)};T.useEffect(()=>{r(!0)},[e]);const i=()=>{switch(e){case"connecting":return{message:"Connecting...",severity:"info",autoHideDuration:void 0};case"connected":return{message:"Connected",severity:"success",autoHideDuration:1e3};case"disconnected":return{message:"Disconnected",severity:"error",autoHideDuration:void 0};case"reconnecting":return{message:"Reconnecting...",severity:"info",autoHideDuration:void 0};default:return{message:"Unknown connection status",severity:"error",autoHideDuration:void 0}}},{message:s,severity:c,autoHideDuration:o}=i(),a=B.jsx(Fn,{size:"small","aria-label":"close",color:"inherit",onClick:n,children:B.jsx(w1,{fontSize:"small"})});return B.jsx(DO,{open:t,anchorOrigin:{vertical:"bottom",horizontal:"center"},autoHideDuration:o,onClose:(f,g)=>n(f,g),action:a,children:B.jsx(O2,{onClose:n,severity:c,children:s})})});x1.displayName="ConnectionSnackbar";var ep={},K5=ki;Object.defineProperty(ep,"__esModule",{value:!0});var E1=ep.default=void 0,q5=K5(ia()),G5=B;E1=ep.default=(0,q5.default)((0,G5.jsx)("path",{d:"m7 10 5 5 5-5z"}),"ArrowDropDown");const Kl={Off:null,"10s":10,"30s":30,"1m":60,"5m":300,"10m":600},X5=e=>Object.keys(Kl).find(t=>Kl[t]===e),ih=Wt.memo(e=>{const{refreshInterval:t}=e,[r,n]=T.useState(void 0),[i,s]=T.useState(!1),c=T.useRef(null),o=()=>{Za("update")},a=()=>{s(p=>!p)},f=p=>{c.current&&c.current.contains(p.target)||s(!1)},g=p=>{n(p),s(!1),UC({type:"int",full_access_path:"update_wait_time",readonly:!1,value:Kl[p]}),Za("stop_update_hosts"),setTimeout(()=>Za("start_update_hosts"),100)};return T.useEffect(()=>{n(()=>X5(t))},[e]),B.jsxs(B.Fragment,{children:[B.jsxs($P,{variant:"contained",ref:c,"aria-label":"split button",color:"inherit",children:[B.jsx(fo,{title:"Refresh Dashboard",children:B.jsx(Cg,{size:"small","aria-label":"restart",color:"inherit",onClick:o,children:B.jsx(Ul,{})})}),B.jsx(fo,{title:"Set auto refresh interval",children:B.jsx(Cg,{size:"small",onClick:a,endIcon:B.jsx(E1,{}),style:{textTransform:"initial"},children:t!==null&&r})})]}),B.jsx(na,{open:i,anchorEl:c.current,transition:!0,children:({TransitionProps:p,placement:v})=>B.jsx(_s,{...p,style:{transformOrigin:v==="bottom"?"center top":"center bottom"},children:B.jsx(Ri,{children:B.jsx(By,{onClickAway:f,children:B.jsx(r1,{id:"split-button-menu",children:Object.keys(Kl).map(y=>B.jsx(al,{selected:y===r,onClick:()=>g(y),children:y},y))})})})})})]})});ih.displayName="RefreshControl";function Y5(e){const t=/\w+|\[\d+\.\d+\]|\[\d+\]|\["[^"]*"\]|\['[^']*'\]/g;return e.match(t)??[]}function Q5(e){if(e.startsWith("[")&&e.endsWith("]")&&(e=e.slice(1,-1)),e.startsWith("'")&&e.endsWith("'")||e.startsWith('"')&&e.endsWith('"'))return e.slice(1,-1);const t=parseFloat(e);return isNaN(t)?e:t}function J5(e,t,r){if(t in e)return e[t];if(Array.isArray(e)){if(r&&t===e.length)return e.push(rm()),e[t];throw new Error(`Index out of bounds: ${t}`)}else{if(r)return e[t]=rm(),e[t];throw new Error(`Key not found: ${t}`)}}function tm(e,t,r=!1){const n=Q5(t);try{return J5(e,n,r)}catch(i){throw i instanceof RangeError?new Error(`Index '${n}': ${i.message}`):i instanceof Error?new Error(`Key '${n}': ${i.message}`):i}}function Z5(e,t,r){const n=Y5(t),i=JSON.parse(JSON.stringify(e));let s=i;try{for(let a=0;a<n.length-1;a++){const f=n[a];s=tm(s,f,!1).value}const c=n[n.length-1],o=tm(s,c,!0);return Object.assign(o,r),i}catch{}return{}}function rm(){return{full_access_path:"",value:void 0,type:"None",doc:null,readonly:!1}}function eM(){const[e]=S1(),t=Jf();return{selectedService:e.get("service"),setSelectedService:i=>{const s=new URLSearchParams(e.toString());i?s.set("service",i):s.delete("service"),t({search:s.toString()})}}}const tM=(e,t)=>{switch(t.type){case"SET_DATA":return t.data;case"UPDATE_ATTRIBUTE":return e===null?null:{...e,value:Z5(e.value,t.fullAccessPath,t.newValue)};default:throw new Error}},rM=()=>{const[e,t]=T.useReducer(tM,null),[r,n]=T.useState("connecting"),{selectedService:i,setSelectedService:s}=eM();function c(o){const{full_access_path:a,value:f}=o.data;t({type:"UPDATE_ATTRIBUTE",fullAccessPath:a,newValue:f})}return T.useEffect(()=>(kt.on("connect",()=>{n("connected"),fetch(`http://${O0}:${A0}/service-properties`).then(o=>o.json()).then(o=>t({type:"SET_DATA",data:o})),n("connected")}),kt.on("disconnect",()=>{n("disconnected"),setTimeout(()=>{n(o=>o==="disconnected"?"reconnecting":o)},2e3)}),kt.on("notify",c),()=>{kt.off("notify",c)}),[]),B.jsxs("div",{className:"App",children:[B.jsxs("header",{className:"App-header",children:[B.jsx("h1",{children:"Service Orchestrator"}),e!==null?B.jsx(ih,{refreshInterval:e.value.update_wait_time.value}):B.jsx(ih,{refreshInterval:null})]}),e&&B.jsx(C1,{state:e,selectedService:i,onSelectService:o=>s(o)}),B.jsx(x1,{connectionStatus:r})]})};Hu.createRoot(document.getElementById("root")).render(B.jsx(Wt.StrictMode,{children:B.jsx(H5,{children:B.jsx(rM,{})})}));
+ */function nh(e){return e===void 0&&(e=""),new URLSearchParams(typeof e=="string"||Array.isArray(e)||e instanceof URLSearchParams?e:Object.keys(e).reduce((t,r)=>{let n=e[r];return t.concat(Array.isArray(n)?n.map(i=>[r,i]):[[r,n]])},[]))}function N5(e,t){let r=nh(e);return t&&t.forEach((n,i)=>{r.has(i)||t.getAll(i).forEach(s=>{r.append(i,s)})}),r}const F5="6";try{window.__reactRouterVersion=F5}catch{}const z5="startTransition",Jg=ll[z5];function H5(e){let{basename:t,children:r,future:n,window:i}=e,s=T.useRef();s.current==null&&(s.current=y5({window:i,v5Compat:!0}));let c=s.current,[o,a]=T.useState({action:c.action,location:c.location}),{v7_startTransition:f}=n||{},g=T.useCallback(p=>{f&&Jg?Jg(()=>a(p)):a(p)},[a,f]);return T.useLayoutEffect(()=>c.listen(g),[c,g]),T.createElement($5,{basename:t,children:r,location:o.location,navigationType:o.action,navigator:c,future:n})}var Zg;(function(e){e.UseScrollRestoration="useScrollRestoration",e.UseSubmit="useSubmit",e.UseSubmitFetcher="useSubmitFetcher",e.UseFetcher="useFetcher",e.useViewTransitionState="useViewTransitionState"})(Zg||(Zg={}));var em;(function(e){e.UseFetcher="useFetcher",e.UseFetchers="useFetchers",e.UseScrollRestoration="useScrollRestoration"})(em||(em={}));function S1(e){let t=T.useRef(nh(e)),r=T.useRef(!1),n=m1(),i=T.useMemo(()=>N5(n.search,r.current?null:t.current),[n.search]),s=Jf(),c=T.useCallback((o,a)=>{const f=nh(typeof o=="function"?o(i):o);r.current=!0,s("?"+f,a)},[s,i]);return[i,c]}function j5(){var i;const[e]=S1(),t=Jf();return{selectedURLTags:((i=e.get("tags"))==null?void 0:i.split(","))||[],setSelectedURLTags:s=>{const c=new URLSearchParams(e.toString());s&&s.length>0?c.set("tags",s.join(",")):c.delete("tags"),t({search:c.toString()})}}}const C1=Wt.memo(e=>{const{state:t,selectedService:r,onSelectService:n}=e,[i,s]=T.useState([]),[c,o]=T.useState([]),[a,f]=T.useState([]),[g,p]=T.useState([]),[v,y]=T.useState([]),{selectedURLTags:S,setSelectedURLTags:_}=j5(),[h,u]=T.useState(S),[l,d]=T.useState("journalctl"),[m,b]=T.useState("description"),[w,x]=T.useState(Date.now()),C=T.useRef(null),[E,R]=T.useState(!1);T.useEffect(()=>{const P=Object.entries(t.value.service_hosts.value).flatMap(([z,$])=>Object.entries($.value.service_proxies.value).map(([j,F])=>({...F,fullAccessPath:`service_hosts["${z}"].service_proxies["${j}"]`})));s(P),p(Object.keys(t.value.service_hosts.value)),f(Array.from(new Set(P.flatMap($=>$.value.tags.value.map(z=>z.value)))))},[t]),T.useEffect(()=>{o(i.filter(P=>(h.length===0||P.value.tags.value.some($=>h.includes($.value)))&&(v.length===0||v.includes(P.value.hostname.value))))},[i,h,v]),T.useEffect(()=>{E||(r?C.current&&(C.current.scrollIntoView({behavior:"smooth"}),R(!0)):R(!0))},[c]);const I=P=>{_(P),u(P)},L=(P,$,z)=>{P.stopPropagation(),Za(`${z}.${$}`)};return B.jsxs(B.Fragment,{children:[B.jsxs("div",{style:{float:"right"},children:[B.jsx("div",{style:{display:"inline-block",marginRight:"10px",minWidth:"200px"},children:B.jsx(Sg,{multiple:!0,id:"hostnames-autocomplete",options:g,onChange:(P,$)=>y($),renderInput:P=>B.jsx(Kg,{...P,variant:"standard",label:"Hostnames",placeholder:"Select hostnames"})})}),B.jsx("div",{style:{display:"inline-block",minWidth:"200px"},children:B.jsx(Sg,{multiple:!0,id:"tags-autocomplete",options:a,value:h,onChange:(P,$)=>I($),renderInput:P=>B.jsx(Kg,{...P,variant:"standard",label:"Tags",placeholder:"Filter tags"})})})]}),B.jsx(fA,{component:Ri,children:B.jsxs(QO,{children:[B.jsx(yA,{children:B.jsxs(Bu,{children:[B.jsx($r,{children:"Service"}),B.jsx($r,{children:"Tags"}),B.jsx($r,{children:"Hostname"}),B.jsx($r,{children:"State"}),B.jsx($r,{})]})}),B.jsx(nA,{children:c.map(P=>B.jsxs(Wt.Fragment,{children:[B.jsxs(Bu,{style:{cursor:"pointer",backgroundColor:r===P.fullAccessPath?"#e0e0e0":"transparent"},ref:r===P.fullAccessPath?C:null,onClick:()=>{r===P.fullAccessPath?n(null):n(P.fullAccessPath)},children:[B.jsx($r,{children:P.value.unit.value.slice(10)}),B.jsx($r,{children:P.value.tags.value.flatMap($=>$.value).join(", ")}),B.jsx($r,{children:P.value.hostname.value}),B.jsx($r,{style:{backgroundColor:P.value.state.value==="ACTIVE"?"green":P.value.state.value==="FAILED"?"red":"orange",color:"white"},children:P.value.state.value==="INACTIVE"?"stopped":P.value.state.enum[P.value.state.value]}),B.jsxs($r,{children:[B.jsx(fo,{title:"Start Service",children:B.jsx(Fn,{"aria-label":"play",size:"small",onClick:$=>L($,"start",P.fullAccessPath),children:B.jsx(h1,{color:"success"})})}),B.jsx(fo,{title:"Stop Service",children:B.jsx(Fn,{"aria-label":"stop",size:"small",onClick:$=>L($,"stop",P.fullAccessPath),children:B.jsx(f1,{color:"error"})})}),B.jsx(fo,{title:"Restart Service",children:B.jsx(Fn,{"aria-label":"restart",size:"small",onClick:$=>L($,"restart",P.fullAccessPath),children:B.jsx(Ul,{color:"primary"})})})]})]}),r===P.fullAccessPath&&B.jsx(Bu,{children:B.jsx($r,{colSpan:7,children:B.jsx(JA,{value:m,children:B.jsxs(EP,{id:"row-content",children:[B.jsxs(VA,{value:m,sx:{borderRight:1,borderColor:"divider"},onChange:($,z)=>b(z),children:[B.jsx($g,{label:"Description",value:"description"}),B.jsx($g,{label:"Logs",value:"logs"})]}),B.jsxs(qg,{value:"description",children:[B.jsx("p",{children:P.value.description.value}),B.jsx("b",{children:"Hostname"}),": ",P.value.hostname.value," ",B.jsx("br",{}),B.jsx("br",{}),B.jsx("b",{children:"Systemd Unit Name"}),": ",P.value.unit.value," ",B.jsx("br",{}),B.jsx("b",{children:"State"}),":"," ",P.value.state.enum[P.value.state.value]," ",B.jsx("br",{}),B.jsx("b",{children:"Tags"}),":",B.jsx("ul",{children:P.value.tags.value.flatMap($=>$.value).map(($,z)=>B.jsx("li",{children:$},z))})," ",B.jsx("br",{})]}),B.jsxs(qg,{value:"logs",children:[B.jsxs("div",{style:{textAlign:"right",marginBottom:"10px"},children:[B.jsx(Fn,{"aria-label":"restart",size:"medium",onClick:()=>{x(Date.now())},children:B.jsx(Ul,{color:"primary"})}),B.jsxs(Uf,{value:l,onChange:$=>{d($.target.value),x(Date.now())},children:[B.jsx(al,{value:"journalctl",children:"journalctl"}),B.jsx(al,{value:"systemctl",children:"systemctl"}),B.jsx(al,{value:"podman",children:"podman"})]})]}),l==="journalctl"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"journalctl",cmdArgs:"--user --unit='"+P.value.unit.value+"' -n 300 -f",scrollback:9999},w),l==="systemctl"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"systemctl",cmdArgs:"--user status "+P.value.unit.value,scrollback:0},w),l==="podman"&&B.jsx(Nu,{hostname:P.value.hostname.value,username:P.value.username.value,cmd:"podman",cmdArgs:"logs -f "+P.value.unit.value.slice(10),scrollback:9999},w)]})]})})})})]},P.value.hostname.value+P.value.unit.value))})]})})]})});C1.displayName="ServicesTable";var Zf={},W5=ki;Object.defineProperty(Zf,"__esModule",{value:!0});var w1=Zf.default=void 0,U5=W5(ia()),V5=B;w1=Zf.default=(0,U5.default)((0,V5.jsx)("path",{d:"M19 6.41 17.59 5 12 10.59 6.41 5 5 6.41 10.59 12 5 17.59 6.41 19 12 13.41 17.59 19 19 17.59 13.41 12z"}),"Close");const x1=Wt.memo(({connectionStatus:e})=>{const[t,r]=T.useState(!0),n=(f,g)=>{g!=="clickaway"&&r(!1)};T.useEffect(()=>{r(!0)},[e]);const i=()=>{switch(e){case"connecting":return{message:"Connecting...",severity:"info",autoHideDuration:void 0};case"connected":return{message:"Connected",severity:"success",autoHideDuration:1e3};case"disconnected":return{message:"Disconnected",severity:"error",autoHideDuration:void 0};case"reconnecting":return{message:"Reconnecting...",severity:"info",autoHideDuration:void 0};default:return{message:"Unknown connection status",severity:"error",autoHideDuration:void 0}}},{message:s,severity:c,autoHideDuration:o}=i(),a=B.jsx(Fn,{size:"small","aria-label":"close",color:"inherit",onClick:n,children:B.jsx(w1,{fontSize:"small"})});return B.jsx(DO,{open:t,anchorOrigin:{vertical:"bottom",horizontal:"center"},autoHideDuration:o,onClose:(f,g)=>n(f,g),action:a,children:B.jsx(O2,{onClose:n,severity:c,children:s})})});x1.displayName="ConnectionSnackbar";var ep={},K5=ki;Object.defineProperty(ep,"__esModule",{value:!0});var E1=ep.default=void 0,q5=K5(ia()),G5=B;E1=ep.default=(0,q5.default)((0,G5.jsx)("path",{d:"m7 10 5 5 5-5z"}),"ArrowDropDown");const Kl={Off:null,"10s":10,"30s":30,"1m":60,"5m":300,"10m":600},X5=e=>Object.keys(Kl).find(t=>Kl[t]===e),ih=Wt.memo(e=>{const{refreshInterval:t}=e,[r,n]=T.useState(void 0),[i,s]=T.useState(!1),c=T.useRef(null),o=()=>{Za("update")},a=()=>{s(p=>!p)},f=p=>{c.current&&c.current.contains(p.target)||s(!1)},g=p=>{n(p),s(!1),UC({type:"int",full_access_path:"update_wait_time",readonly:!1,value:Kl[p]}),Za("stop_update_hosts"),setTimeout(()=>Za("start_update_hosts"),100)};return T.useEffect(()=>{n(()=>X5(t))},[e]),B.jsxs(B.Fragment,{children:[B.jsxs($P,{variant:"contained",ref:c,"aria-label":"split button",color:"inherit",children:[B.jsx(fo,{title:"Refresh Dashboard",children:B.jsx(Cg,{size:"small","aria-label":"restart",color:"inherit",onClick:o,children:B.jsx(Ul,{})})}),B.jsx(fo,{title:"Set auto refresh interval",children:B.jsx(Cg,{size:"small",onClick:a,endIcon:B.jsx(E1,{}),style:{textTransform:"initial"},children:t!==null&&r})})]}),B.jsx(na,{open:i,anchorEl:c.current,transition:!0,children:({TransitionProps:p,placement:v})=>B.jsx(_s,{...p,style:{transformOrigin:v==="bottom"?"center top":"center bottom"},children:B.jsx(Ri,{children:B.jsx(By,{onClickAway:f,children:B.jsx(r1,{id:"split-button-menu",children:Object.keys(Kl).map(y=>B.jsx(al,{selected:y===r,onClick:()=>g(y),children:y},y))})})})})})]})});ih.displayName="RefreshControl";function Y5(e){const t=/\w+|\[\d+\.\d+\]|\[\d+\]|\["[^"]*"\]|\['[^']*'\]/g;return e.match(t)??[]}function Q5(e){if(e.startsWith("[")&&e.endsWith("]")&&(e=e.slice(1,-1)),e.startsWith("'")&&e.endsWith("'")||e.startsWith('"')&&e.endsWith('"'))return e.slice(1,-1);const t=parseFloat(e);return isNaN(t)?e:t}function J5(e,t,r){if(t in e)return e[t];if(Array.isArray(e)){if(r&&t===e.length)return e.push(rm()),e[t];throw new Error(`Index out of bounds: ${t}`)}else{if(r)return e[t]=rm(),e[t];throw new Error(`Key not found: ${t}`)}}function tm(e,t,r=!1){const n=Q5(t);try{return J5(e,n,r)}catch(i){throw i instanceof RangeError?new Error(`Index '${n}': ${i.message}`):i instanceof Error?new Error(`Key '${n}': ${i.message}`):i}}function Z5(e,t,r){const n=Y5(t),i=JSON.parse(JSON.stringify(e));let s=i;try{for(let a=0;a<n.length-1;a++){const f=n[a];s=tm(s,f,!1).value}const c=n[n.length-1],o=tm(s,c,!0);return Object.assign(o,r),i}catch{}return{}}function rm(){return{full_access_path:"",value:void 0,type:"None",doc:null,readonly:!1}}function eM(){const[e]=S1(),t=Jf();return{selectedService:e.get("service"),setSelectedService:i=>{const s=new URLSearchParams(e.toString());i?s.set("service",i):s.delete("service"),t({search:s.toString()})}}}const tM=(e,t)=>{switch(t.type){case"SET_DATA":return t.data;case"UPDATE_ATTRIBUTE":return e===null?null:{...e,value:Z5(e.value,t.fullAccessPath,t.newValue)};default:throw new Error}},rM=()=>{const[e,t]=T.useReducer(tM,null),[r,n]=T.useState("connecting"),{selectedService:i,setSelectedService:s}=eM();function c(o){const{full_access_path:a,value:f}=o.data;t({type:"UPDATE_ATTRIBUTE",fullAccessPath:a,newValue:f})}return T.useEffect(()=>(kt.on("connect",()=>{n("connected"),fetch(`http://${O0}:${A0}/service-properties`).then(o=>o.json()).then(o=>t({type:"SET_DATA",data:o})),n("connected")}),kt.on("disconnect",()=>{n("disconnected"),setTimeout(()=>{n(o=>o==="disconnected"?"reconnecting":o)},2e3)}),kt.on("notify",c),()=>{kt.off("notify",c)}),[]),B.jsxs("div",{className:"App",children:[B.jsxs("header",{className:"App-header",children:[B.jsx("h1",{children:"Service Orchestrator"}),e!==null?B.jsx(ih,{refreshInterval:e.value.update_wait_time.value}):B.jsx(ih,{refreshInterval:null})]}),e&&B.jsx(C1,{state:e,selectedService:i,onSelectService:o=>s(o)}),B.jsx(x1,{connectionStatus:r})]})};Hu.createRoot(document.getElementById("root")).render(B.jsx(Wt.StrictMode,{children:B.jsx(H5,{children:B.jsx(rM,{})})}));
@@ -0,0 +1,238 @@
+"""
+Structured queries of the journal of a unit.
+
+`journalctl --output=json` prints one JSON object per entry and line, e.g.
+
+    {"__CURSOR": "s=…;i=2f1;…", "__REALTIME_TIMESTAMP": "1700000000000000",
+     "PRIORITY": "6", "SYSLOG_IDENTIFIER": "python", "_PID": "1234",
+     "MESSAGE": "Listening on port 8001", ...}
+
+Fields that are not valid UTF-8 are printed as arrays of bytes, fields that are too
+large as `null`. Each entry has a cursor, which `--after-cursor` continues from (in the
+reverse direction together with `--reverse`), such that a view can be paged and
+updated incrementally.
+"""
+
+import json
+import shlex
+import threading
+from collections.abc import Iterable, Iterator
+from typing import Any, TypedDict
+
+from orchestrator.metrics import PARSE_FAILURES, metrics
+
+JOURNAL_PAGE_SIZE = 200
+"""Default number of entries of a journal page."""
+JOURNAL_CACHE_SIZE = 2000
+"""Maximum number of entries cached per unit."""
+
+_OUTPUT_FIELDS = ("MESSAGE", "PRIORITY", "SYSLOG_IDENTIFIER", "_COMM", "_PID")
+
+
+class JournalRecord(TypedDict):
+    cursor: str
+    timestamp: float
+    """Seconds since the epoch."""
+    priority: int
+    """Syslog priority, from 0 (emergency) to 7 (debug)."""
+    identifier: str
+    pid: int | None
+    message: str
+
+
+class JournalPage(TypedDict):
+    records: list[JournalRecord]
+    """Entries in chronological order."""
+    has_more: bool
+    """Whether there are further entries in the direction the page was queried in."""
+
+
+def build_journal_command(
+    unit: str,
+    *,
+    after_cursor: str | None = None,
+    since: str | None = None,
+    lines: int | None = None,
+    reverse: bool = False,
+) -> str:
+    """Returns the `journalctl` command listing the entries of `unit`.
+
+    `lines` selects the most recent entries, it cannot be combined with a cursor or
+    `since` (the number of entries read is limited by the reader instead).
+    """
+
+    args = [
+        "journalctl",
+        "--user",
+        f"--unit={shlex.quote(unit)}",
+        "--output=json",
+        f"--output-fields={','.join(_OUTPUT_FIELDS)}",
+        "--no-pager",
+    ]
+    if after_cursor is not None:
+        args.append(f"--after-cursor={shlex.quote(after_cursor)}")
+    if since is not None:
+        args.append(f"--since={shlex.quote(since)}")
+    if lines is not None:
+        args.append(f"--lines={lines}")
+    if reverse:
+        args.append("--reverse")
+    return " ".join(args)
+
+
+def _field(entry: dict[str, Any], name: str) -> str:
+    value = entry.get(name)
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        # binary data, or several values of the same field
+        if all(isinstance(item, int) for item in value):
+            return bytes(value).decode("utf-8", errors="replace")
+        return " ".join(_field({name: item}, name) for item in value)
+    return str(value)
+
+
+def create_journal_record(entry: dict[str, Any]) -> JournalRecord:
+    pid = _field(entry, "_PID")
+    priority = _field(entry, "PRIORITY")
+    return {
+        "cursor": entry["__CURSOR"],
+        "timestamp": int(entry["__REALTIME_TIMESTAMP"]) / 1e6,
+        "priority": int(priority) if priority.isdigit() else 6,
+        "identifier": _field(entry, "SYSLOG_IDENTIFIER") or _field(entry, "_COMM"),
+        "pid": int(pid) if pid.isdigit() else None,
+        "message": _field(entry, "MESSAGE"),
+    }
+
+
+def parse_journal_records(
+    lines: Iterable[str], max_records: int | None = None
+) -> Iterator[JournalRecord]:
+    """Parses the output of `journalctl --output=json` line by line, stopping after
+    `max_records` entries."""
+
+    n_records = 0
+    for line in lines:
+        if max_records is not None and n_records >= max_records:
+            return
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            # e.g. "-- No entries --" of older journalctl versions
+            if not line.startswith("--"):
+                metrics.inc(PARSE_FAILURES, parser="journal")
+            continue
+        if "__CURSOR" not in entry or "__REALTIME_TIMESTAMP" not in entry:
+            metrics.inc(PARSE_FAILURES, parser="journal")
+            continue
+        n_records += 1
+        yield create_journal_record(entry)
+
+
+class JournalCache:
+    """The most recent entries of the journal of a unit, which were fetched before.
+
+    The cached entries are contiguous, i.e. there are no entries between two cached
+    ones, such that pages can be served from the cache and only entries newer than
+    `newest_cursor` have to be fetched from the host.
+
+    The cache is thread-safe. Entries are fetched without holding its lock and merged
+    afterwards: `append` and `prepend` take the cursor the entries were fetched
+    relative to, and drop them if the cache was changed in the meantime.
+    """
+
+    def __init__(self, max_size: int = JOURNAL_CACHE_SIZE) -> None:
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._records: list[JournalRecord] = []
+        self._has_start = False
+        """Whether the oldest cached entry is the first entry of the journal."""
+
+    @property
+    def newest_cursor(self) -> str | None:
+        with self._lock:
+            return self._records[-1]["cursor"] if self._records else None
+
+    @property
+    def oldest_cursor(self) -> str | None:
+        with self._lock:
+            return self._records[0]["cursor"] if self._records else None
+
+    def contains(self, cursor: str) -> bool:
+        with self._lock:
+            return self._index(cursor) is not None
+
+    def replace(self, records: list[JournalRecord], *, has_start: bool) -> None:
+        with self._lock:
+            self._records = records[-self._max_size :]
+            self._has_start = has_start and len(records) <= self._max_size
+
+    def append(self, records: list[JournalRecord], *, after: str) -> bool:
+        """Adds entries following `after`, which has to be the newest cached entry.
+        Returns whether the entries were added."""
+
+        with self._lock:
+            if not self._records or self._records[-1]["cursor"] != after:
+                return False
+            self._records.extend(records)
+            if len(self._records) > self._max_size:
+                del self._records[: -self._max_size]
+                self._has_start = False
+            return True
+
+    def prepend(
+        self, records: list[JournalRecord], *, before: str, has_start: bool
+    ) -> bool:
+        """Adds entries preceding `before`, which has to be the oldest cached entry, as
+        long as there is room. Returns whether the entries were added."""
+
+        with self._lock:
+            if not self._records or self._records[0]["cursor"] != before:
+                return False
+            if self._max_size - len(self._records) < len(records):
+                return False
+            self._records = records + self._records
+            self._has_start = has_start
+            return True
+
+    def latest(self, limit: int) -> JournalPage:
+        with self._lock:
+            return {
+                "records": self._records[-limit:],
+                "has_more": len(self._records) > limit or not self._has_start,
+            }
+
+    def before(self, cursor: str, limit: int) -> JournalPage | None:
+        """Returns up to `limit` entries preceding `cursor`, or None if the cache does
+        not hold as many."""
+
+        with self._lock:
+            index = self._index(cursor)
+            if index is None or (index < limit and not self._has_start):
+                return None
+            return {
+                "records": self._records[max(index - limit, 0) : index],
+                "has_more": index > limit or not self._has_start,
+            }
+
+    def after(self, cursor: str, limit: int) -> JournalPage | None:
+        """Returns up to `limit` entries following `cursor`, or None if `cursor` is not
+        cached."""
+
+        with self._lock:
+            index = self._index(cursor)
+            if index is None:
+                return None
+            records = self._records[index + 1 : index + 1 + limit]
+            return {
+                "records": records,
+                "has_more": index + 1 + limit < len(self._records),
+            }
+
+    def _index(self, cursor: str) -> int | None:
+        for index in range(len(self._records) - 1, -1, -1):
+            if self._records[index]["cursor"] == cursor:
+                return index
+        return None
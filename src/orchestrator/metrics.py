@@ -0,0 +1,277 @@
+"""
+Instrumentation of the orchestrator.
+
+Latencies, counts and current levels are recorded in the process-wide `metrics`
+registry. Recording a value takes a lock and a dictionary lookup, so it is cheap enough
+to be done on every SSH command, terminal read and socket.io emit.
+
+The registry is exposed in the Prometheus text format (see `render_prometheus` and
+`orchestrator.web_server.metrics_server`) and, summarised, as the `MetricsService`
+subtree of the orchestrator.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+import pydase
+
+HOST_UPDATE_SECONDS = "orchestrator_host_update_seconds"
+SSH_COMMAND_SECONDS = "orchestrator_ssh_command_seconds"
+UNIT_ACTION_SECONDS = "orchestrator_unit_action_seconds"
+SOCKETIO_EMIT_SECONDS = "orchestrator_socketio_emit_seconds"
+HOST_SCANS = "orchestrator_host_scans_total"
+PARSE_FAILURES = "orchestrator_parse_failures_total"
+SSH_RECONNECTS = "orchestrator_ssh_reconnects_total"
+PTY_BYTES = "orchestrator_pty_bytes_total"
+PTY_INPUT_BYTES = "orchestrator_pty_input_bytes_total"
+SOCKETIO_EMITS = "orchestrator_socketio_emits_total"
+SSH_CONNECTIONS = "orchestrator_ssh_connections"
+TERMINAL_SESSIONS = "orchestrator_terminal_sessions"
+SHARED_STREAMS = "orchestrator_shared_streams"
+SOCKETIO_CLIENTS = "orchestrator_socketio_clients"
+
+_METRICS = {
+    HOST_UPDATE_SECONDS: ("histogram", "Duration of the periodic update of a host."),
+    SSH_COMMAND_SECONDS: ("histogram", "Round-trip time of remote commands."),
+    UNIT_ACTION_SECONDS: ("histogram", "Duration of actions on units."),
+    SOCKETIO_EMIT_SECONDS: ("histogram", "Duration of socket.io emits."),
+    HOST_SCANS: ("counter", "Number of unit scans of a host."),
+    PARSE_FAILURES: ("counter", "Number of remote outputs that could not be parsed."),
+    SSH_RECONNECTS: ("counter", "Number of re-opened SSH connections."),
+    PTY_BYTES: ("counter", "Number of bytes read from terminal sessions."),
+    PTY_INPUT_BYTES: ("counter", "Number of bytes written to terminal sessions."),
+    SOCKETIO_EMITS: ("counter", "Number of socket.io emits."),
+    SSH_CONNECTIONS: ("gauge", "Number of open SSH connections."),
+    TERMINAL_SESSIONS: ("gauge", "Number of open terminal sessions."),
+    SHARED_STREAMS: ("gauge", "Number of running shared log streams."),
+    SOCKETIO_CLIENTS: ("gauge", "Number of connected socket.io clients."),
+}
+"""Type and description of each metric."""
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+"""Upper bounds in seconds of the histogram buckets."""
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self) -> None:
+        # the last bucket counts the observations above the largest bound
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimates the `q`-quantile, interpolating linearly within its bucket."""
+
+        rank = q * self.count
+        cumulative_count = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count and cumulative_count + bucket_count >= rank:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                if index == len(LATENCY_BUCKETS):
+                    return lower
+                fraction = (rank - cumulative_count) / bucket_count
+                return lower + (LATENCY_BUCKETS[index] - lower) * fraction
+            cumulative_count += bucket_count
+        return 0.0
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    items = [f'{key}="{_escape_label_value(value)}"' for key, value in labels]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _format_series(name: str, labels: Labels) -> str:
+    """Returns a compact series name, e.g. `name{host=a,operation=scan}`."""
+
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{key}={value}" for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._gauges: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """Observes the duration of the `with` block (also if it raises)."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+
+        lines: list[str] = []
+        with self._lock:
+            for name, (metric_type, description) in _METRICS.items():
+                if metric_type == "counter":
+                    samples = self._counters.get(name, {})
+                elif metric_type == "gauge":
+                    samples = self._gauges.get(name, {})
+                else:
+                    samples = {}
+                histograms = self._histograms.get(name, {})
+                if not samples and not histograms:
+                    continue
+
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                for labels, histogram in histograms.items():
+                    cumulative_count = 0
+                    for bound, count in zip(
+                        (*LATENCY_BUCKETS, "+Inf"), histogram.bucket_counts
+                    ):
+                        cumulative_count += count
+                        bucket_labels = _format_labels(labels, f'le="{bound}"')
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative_count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def summary(
+        self,
+    ) -> tuple[dict[str, float], dict[str, float], dict[str, dict[str, float]]]:
+        """Returns the counters, the gauges and a summary of the histograms, keyed by
+        their series name."""
+
+        with self._lock:
+            counters = {
+                _format_series(name, labels): value
+                for name, series in self._counters.items()
+                for labels, value in series.items()
+            }
+            gauges = {
+                _format_series(name, labels): value
+                for name, series in self._gauges.items()
+                for labels, value in series.items()
+            }
+            latencies = {
+                _format_series(name, labels): {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for name, series in self._histograms.items()
+                for labels, histogram in series.items()
+            }
+        return counters, gauges, latencies
+
+
+metrics = MetricsRegistry()
+
+
+def _update_dict(target: dict[str, Any], values: dict[str, Any]) -> None:
+    """Updates `target` in place to equal `values`, assigning only the keys whose value
+    changed (recursing into nested dictionaries)."""
+
+    for key in [key for key in target if key not in values]:
+        target.pop(key)
+    for key, value in values.items():
+        current_value = target.get(key)
+        if isinstance(current_value, dict) and isinstance(value, dict):
+            _update_dict(current_value, value)
+        elif current_value != value or key not in target:
+            target[key] = value
+
+
+class MetricsService(pydase.DataService):
+    """Summary of the recorded metrics, updated every `update_interval` seconds.
+
+    The latencies are given in seconds, the percentiles are estimated from the
+    histogram buckets. Only the values that changed are assigned, such that the clients
+    are notified of those instead of the whole summary. A summary is replaced as a whole
+    when series appear or disappear, as pydase warns about every key added to an
+    observed dictionary.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.update_interval = 5.0
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, float] = {}
+        self.latencies: dict[str, dict[str, float]] = {}
+        self._autostart_tasks["refresh"] = ()  # type: ignore
+
+    async def refresh(self) -> None:
+        while True:
+            counters, gauges, latencies = metrics.summary()
+            self._update_summary("counters", counters)
+            self._update_summary("gauges", gauges)
+            self._update_summary("latencies", latencies)
+            await asyncio.sleep(self.update_interval)
+
+    def _update_summary(self, name: str, values: dict[str, Any]) -> None:
+        summary = getattr(self, name)
+        if summary.keys() == values.keys():
+            _update_dict(summary, values)
+        else:
+            setattr(self, name, values)
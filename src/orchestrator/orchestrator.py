@@ -1,37 +1,635 @@
 import asyncio
 import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypeVar
 
+import confz
 import pydase
 
-from orchestrator.config import SystemdServiceOrchestratorConfig
+from orchestrator.config import ServiceHostConfig, SystemdServiceOrchestratorConfig
+from orchestrator.config_watcher import ConfigWatcher, HostConfigChanges
+from orchestrator.metrics import (
+    HOST_UPDATE_SECONDS,
+    UNIT_ACTION_SECONDS,
+    MetricsService,
+    metrics,
+)
+from orchestrator.poll_scheduler import PollOutcome, PollScheduler
+from orchestrator.poll_shards import PollShard, PollShards, ShardHostConfig
+from orchestrator.rate_limit import TokenBucket
+from orchestrator.rollouts import (
+    RolloutBudget,
+    RolloutStepResult,
+    RolloutStepStatus,
+    parse_unit_reference,
+    plan_rollout,
+    run_rollout,
+)
 from orchestrator.service_host import ServiceHost
+from orchestrator.systemd_service_proxy import ManagerAction
+from orchestrator.unit_actions import UnitActionResult
+from orchestrator.unit_index import UnitIndex, UnitKey
+from orchestrator.unit_jobs import UNIT_JOB_TIMEOUT, UnitJobError
+from orchestrator.unit_store import UnitStore
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def _shard_host_config(host: ServiceHostConfig) -> ShardHostConfig:
+    return {
+        "hostname": host.hostname,
+        "port": host.port,
+        "username": host.username,
+        "password": host.password,
+        "key_path": host.ssh_key_path,
+    }
+
+
+def _rollout_step_results(
+    action: ManagerAction,
+    waves: list[list[UnitKey]],
+    status: RolloutStepStatus,
+    message: str = "",
+) -> dict[UnitKey, RolloutStepResult]:
+    """Returns results of the given status for the units of a rollout, by unit."""
+
+    return {
+        (hostname, unit): RolloutStepResult(
+            hostname=hostname,
+            unit=unit,
+            action=action.value,
+            wave=wave,
+            status=status.value,
+            message=message,
+            started_at=None,
+            duration=0.0,
+        )
+        for wave, keys in enumerate(waves)
+        for hostname, unit in keys
+    }
+
+
+def _create_config_watcher(
+    config: SystemdServiceOrchestratorConfig,
+) -> ConfigWatcher | None:
+    """Returns a watcher of the config file, unless reloading is disabled or the config
+    is not read from a file."""
+
+    sources = SystemdServiceOrchestratorConfig.CONFIG_SOURCES
+    if (
+        config.config_reload_interval is None
+        or not isinstance(sources, confz.FileSource)
+        or not isinstance(sources.file, Path)
+    ):
+        return None
+    return ConfigWatcher(sources.file, config)
+
 
 class SystemdServiceOrchestrator(pydase.DataService):
     def __init__(self) -> None:
         super().__init__()
-        self.update_wait_time: int | None = 10
-        self.service_hosts = [
-            ServiceHost(
-                hostname=host.hostname,
-                username=host.username,
-                password=host.password,
-                key_path=host.ssh_key_path,
-            )
-            for host in SystemdServiceOrchestratorConfig().service_hosts
-        ]
+        config = SystemdServiceOrchestratorConfig()
+        self.update_wait_time: int | None = 60
+        """Longest polling interval in seconds of a host (`None` disables polling), see
+        `orchestrator.poll_scheduler`."""
+        self._host_update_timeout = config.host_update_timeout
+        self._consistency_sweep_interval = config.consistency_sweep_interval
+        # The SSH calls are blocking, thus the hosts are polled in a bounded pool of
+        # worker threads to not block the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.max_concurrent_host_updates,
+            thread_name_prefix="host-update",
+        )
+        # Bulk actions wait for systemd to finish the jobs, which can take much longer
+        # than a poll, thus they have workers of their own.
+        self._action_executor = ThreadPoolExecutor(
+            max_workers=config.max_concurrent_host_updates,
+            thread_name_prefix="unit-action",
+        )
+        self._unit_index = UnitIndex()
+        """Index of the units of all hosts by hostname, tag and state."""
+        self._poll_scheduler = PollScheduler(
+            min_interval=config.min_poll_interval,
+            max_interval=self.update_wait_time,
+            max_backoff=config.max_reconnection_wait_time,
+            jitter=config.poll_jitter,
+        )
+        self._poll_budget = (
+            TokenBucket(config.max_host_polls_per_second)
+            if config.max_host_polls_per_second is not None
+            else None
+        )
+        self._unit_store = (
+            UnitStore(config.unit_state_file)
+            if config.unit_state_file is not None
+            else None
+        )
+        self._unit_state_save_interval = config.unit_state_save_interval
+        self._poll_shards = PollShards(
+            [_shard_host_config(host) for host in config.service_hosts],
+            config.poll_worker_processes,
+            {
+                "command_timeout": config.host_update_timeout,
+                "keepalive_interval": config.ssh_keepalive_interval,
+                "telemetry_samples": config.telemetry_samples,
+                "max_concurrent_polls": config.max_concurrent_host_updates,
+            },
+        )
+        self._config = config
+        self._config_watcher = _create_config_watcher(config)
+        self.service_hosts = {
+            host.hostname: self._create_host(host, self._poll_shards.get(host.hostname))
+            for host in config.service_hosts
+        }
+        """The service hosts, by hostname."""
+        for hostname in self.service_hosts:
+            self._poll_scheduler.add(hostname)
+        self.bulk_action_results: list[UnitActionResult] = []
+        """Per-unit results of the last bulk action, see `bulk_action`."""
+        self.rollout_results: list[RolloutStepResult] = []
+        """Per-unit results of the current or last rollout, see `rollout`."""
+        self._rollout_running = False
+        self._rollout_task: asyncio.Task[list[RolloutStepResult]] | None = None
+        self.metrics = MetricsService()
+        self._autostart_tasks["_start_hosts"] = ()  # type: ignore
         self._autostart_tasks["update_hosts"] = ()  # type: ignore
+        self._autostart_tasks["persist_unit_states"] = ()  # type: ignore
+        self._autostart_tasks["manage_hosts"] = ()  # type: ignore
+
+    def _create_host(
+        self, host: ServiceHostConfig, poll_shard: PollShard | None
+    ) -> ServiceHost:
+        config = self._config
+        return ServiceHost(
+            hostname=host.hostname,
+            username=host.username,
+            password=host.password,
+            key_path=host.ssh_key_path,
+            command_timeout=config.host_update_timeout,
+            push_updates=host.push_updates,
+            keepalive_interval=config.ssh_keepalive_interval,
+            max_reconnection_wait_time=config.max_reconnection_wait_time,
+            snapshot_ttl=config.snapshot_ttl,
+            port=host.port,
+            unit_index=self._unit_index,
+            poll_scheduler=self._poll_scheduler,
+            unit_store=self._unit_store,
+            telemetry_samples=config.telemetry_samples,
+            poll_shard=poll_shard,
+        )
+
+    @staticmethod
+    def _start_host(host: ServiceHost) -> None:
+        """Starts the background tasks of the host, which connect and scan it (see
+        `ServiceHost._handle_connection`)."""
+
+        if not host._task_manager.tasks:
+            host._task_manager.start_autostart_tasks()
+
+    async def _start_hosts(self) -> None:
+        # pydase only starts the tasks of services in attributes and lists, not of the
+        # ones in dictionaries
+        for host in self.service_hosts.values():
+            self._start_host(host)
+
+    async def manage_hosts(self) -> None:
+        """Applies the changes of the hosts in the config file, see
+        `orchestrator.config_watcher`."""
+
+        config_watcher = self._config_watcher
+        reload_interval = self._config.config_reload_interval
+        if config_watcher is None or reload_interval is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(reload_interval)
+            changes = await loop.run_in_executor(None, config_watcher.check)
+            if changes is not None:
+                self._apply_host_config_changes(changes)
+
+    def _apply_host_config_changes(self, changes: HostConfigChanges) -> None:
+        """Adds, removes and reconnects the given hosts. The other hosts, with their
+        connections, units and terminal sessions, are not touched."""
+
+        for hostname in changes.removed:
+            logger.info("Removing host %a.", hostname)
+            self._poll_scheduler.remove(hostname)
+            self._poll_shards.remove_host(hostname)
+            self.service_hosts.pop(hostname)._close()
+
+        for host_config in changes.changed:
+            logger.info(
+                "Reconnecting host %a with its new settings.", host_config.hostname
+            )
+            self._poll_shards.remove_host(host_config.hostname)
+            self.service_hosts[host_config.hostname]._reconfigure(
+                username=host_config.username,
+                password=host_config.password,
+                key_path=host_config.ssh_key_path,
+                port=host_config.port,
+                push_updates=host_config.push_updates,
+                poll_shard=self._poll_shards.add_host(_shard_host_config(host_config)),
+            )
+
+        for host_config in changes.added:
+            logger.info("Adding host %a.", host_config.hostname)
+            host = self._create_host(
+                host_config,
+                self._poll_shards.add_host(_shard_host_config(host_config)),
+            )
+            self.service_hosts[host_config.hostname] = host
+            self._poll_scheduler.add(host_config.hostname)
+            self._start_host(host)
+
+    async def _restore_units(self, unit_store: UnitStore) -> None:
+        """Shows the units saved by the last run until the hosts are scanned.
+
+        Creating the service proxies is slow, thus this happens host by host in the
+        running server instead of delaying its start.
+        """
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        stored_hosts = await loop.run_in_executor(None, unit_store.load)
+        for hostname, stored_host in stored_hosts.items():
+            host = self.service_hosts.get(hostname)
+            if host is None:
+                unit_store.remove(hostname)
+                continue
+            host._restore_units(stored_host)
+            await asyncio.sleep(0)
+        logger.info(
+            "Restored the saved units of %d hosts in %.2f s.",
+            len(stored_hosts),
+            time.perf_counter() - start,
+        )
+
+    async def persist_unit_states(self) -> None:
+        """Restores the units saved by the last run, then saves the last known units of
+        all hosts whenever they changed, see `orchestrator.unit_store`."""
+
+        unit_store = self._unit_store
+        if unit_store is None:
+            return
+
+        await self._restore_units(unit_store)
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._unit_state_save_interval)
+            if not unit_store.dirty:
+                continue
+            try:
+                await loop.run_in_executor(None, unit_store.save)
+            except OSError as e:
+                logger.error("Could not save the unit states: %s", e)
 
     def update(self) -> None:
-        for host in self.service_hosts:
-            host.service_proxy_list = host.get_service_proxy_list()
+        """Triggers a refresh of all service hosts without waiting for it to finish."""
+
+        asyncio.get_running_loop().create_task(self._update_all_hosts())
+
+    def bulk_action(
+        self,
+        action: ManagerAction,
+        tag: str | None = None,
+        hostname: str | None = None,
+    ) -> None:
+        """Runs `action` on all units having the given tag and/or running on the given
+        host, without waiting for it to finish. The per-unit results are published in
+        `bulk_action_results` once all hosts are done."""
+
+        if tag is None and hostname is None:
+            raise ValueError("Bulk actions need a tag or a hostname to select units.")
+        asyncio.get_running_loop().create_task(
+            self._bulk_action(ManagerAction(action), tag, hostname)
+        )
+
+    async def _bulk_action(
+        self,
+        action: ManagerAction,
+        tag: str | None = None,
+        hostname: str | None = None,
+    ) -> list[UnitActionResult]:
+        """Runs `action` on the selected units of each host in a single systemctl call.
+        The hosts are handled in parallel (in other threads than the polls, which are
+        not held up), and the selected units are re-queried once per host afterwards.
+        """
+
+        if tag is None and hostname is None:
+            raise ValueError("Bulk actions need a tag or a hostname to select units.")
+
+        query = self._unit_index.query(
+            hostnames=None if hostname is None else [hostname],
+            tags=None if tag is None else [tag],
+        )
+        units_per_host: dict[ServiceHost, list[str]] = {}
+        for unit_hostname, unit in query["units"]:
+            host = self.service_hosts[unit_hostname]
+            units_per_host.setdefault(host, []).append(unit)
+            self._poll_scheduler.expedite(unit_hostname)
+
+        async def run_on_host(
+            host: ServiceHost, units: list[str]
+        ) -> list[UnitActionResult]:
+            if not host.connected:
+                errors = {unit: "Host is not connected." for unit in units}
+                return self._unit_action_results(host, action, units, errors, 0.0)
+
+            start = time.perf_counter()
+            try:
+                errors = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._action_executor, host._run_unit_action, action, units
+                    ),
+                    timeout=UNIT_JOB_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                errors = {unit: "Timed out waiting for the job." for unit in units}
+            except Exception as e:
+                logger.error("An error occurred on host %a: %s", host.hostname, e)
+                errors = {unit: str(e) or type(e).__name__ for unit in units}
+            duration = time.perf_counter() - start
+            metrics.observe(
+                UNIT_ACTION_SECONDS, duration, host=host.hostname, action=action.value
+            )
+
+            try:
+                records = await self._run_in_executor(host._refresh_unit_records, units)
+                host._apply_unit_records(records)
+            except Exception as e:
+                logger.error("An error occurred on host %a: %s", host.hostname, e)
+
+            return self._unit_action_results(host, action, units, errors, duration)
+
+        logger.info(
+            "Running %s on %s units of %s hosts.",
+            action.value,
+            sum(len(units) for units in units_per_host.values()),
+            len(units_per_host),
+        )
+        results_per_host = await asyncio.gather(
+            *(
+                run_on_host(host, units)
+                for host, units in units_per_host.items()
+                if units
+            )
+        )
+        self.bulk_action_results = [
+            result for results in results_per_host for result in results
+        ]
+        return self.bulk_action_results
+
+    def rollout(  # noqa: PLR0913
+        self,
+        action: ManagerAction,
+        tag: str | None = None,
+        hostname: str | None = None,
+        max_parallel: int = 4,
+        max_unavailable: int = 1,
+        readiness_timeout: float = 60.0,
+    ) -> None:
+        """Runs `action` on all units having the given tag and/or running on the given
+        host in dependency order, without waiting for it to finish, see
+        `orchestrator.rollouts`. The results are published in `rollout_results` after
+        each wave, or with all units failed if the rollout cannot be planned (e.g. if
+        the dependencies of the units are cyclic)."""
+
+        if tag is None and hostname is None:
+            raise ValueError("Rollouts need a tag or a hostname to select units.")
+        if self._rollout_running:
+            raise RuntimeError("Another rollout is running.")
+
+        query = self._unit_index.query(
+            hostnames=None if hostname is None else [hostname],
+            tags=None if tag is None else [tag],
+        )
+        self._rollout_task = asyncio.get_running_loop().create_task(
+            self._rollout(
+                ManagerAction(action),
+                query["units"],
+                RolloutBudget(max_parallel, max_unavailable),
+                readiness_timeout,
+            )
+        )
+        self._rollout_running = True
+
+    async def _rollout(
+        self,
+        action: ManagerAction,
+        units: list[UnitKey],
+        budget: RolloutBudget,
+        readiness_timeout: float,
+    ) -> list[RolloutStepResult]:
+        """Plans the waves of the rollout from the dependencies of the units and runs
+        them, waiting up to `readiness_timeout` seconds for each unit to get ready."""
+
+        self._rollout_running = True
+        try:
+            try:
+                plan = plan_rollout(
+                    units,
+                    await self._rollout_dependencies(units),
+                    reverse=action == ManagerAction.STOP,
+                )
+            except ValueError as e:
+                # the rollout runs in the background, thus the error is published
+                logger.error("Cannot roll out %s: %s", action.value, e)
+                self.rollout_results = list(
+                    _rollout_step_results(
+                        action, [units], RolloutStepStatus.FAILED, str(e)
+                    ).values()
+                )
+                return self.rollout_results
+
+            results = _rollout_step_results(
+                action, plan.waves, RolloutStepStatus.PENDING
+            )
+            self.rollout_results = list(results.values())
+            logger.info(
+                "Rolling out %s on %s units in %s waves.",
+                action.value,
+                len(results),
+                len(plan.waves),
+            )
+
+            # Unlike single unit actions, the steps are not tracked as `UnitJob`s:
+            # adding services to the tree is slow in pydase.
+            async def run_step(key: UnitKey) -> tuple[bool, str]:
+                hostname, unit = key
+                host = self.service_hosts.get(hostname)
+                if host is None or not host.connected:
+                    return False, "Host is not connected."
+                exit_status, output = await self._run_in_executor(
+                    host._enqueue_unit_action, action, unit
+                )
+                if exit_status != 0:
+                    return False, output
+                try:
+                    return await host._await_unit_job(action, unit, readiness_timeout)
+                except UnitJobError as e:
+                    return False, str(e)
+
+            async for wave_results in run_rollout(plan, action, run_step, budget):
+                for result in wave_results:
+                    results[(result["hostname"], result["unit"])] = result
+                self.rollout_results = list(results.values())
+            return self.rollout_results
+        finally:
+            self._rollout_running = False
+
+    async def _rollout_dependencies(
+        self, units: list[UnitKey]
+    ) -> dict[UnitKey, set[UnitKey]]:
+        """Returns the dependencies of the units, read from the hosts (in parallel) and
+        from `rollout_dependencies` of the config."""
+
+        units_per_host: dict[str, list[str]] = {}
+        for hostname, unit in units:
+            units_per_host.setdefault(hostname, []).append(unit)
+
+        async def query_host(
+            hostname: str, host_units: list[str]
+        ) -> dict[str, set[str]]:
+            host = self.service_hosts.get(hostname)
+            if host is None or not host.connected:
+                return {}
+            try:
+                return await self._run_in_executor(
+                    host._query_unit_dependencies, host_units
+                )
+            except Exception as e:
+                logger.error("An error occurred on host %a: %s", hostname, e)
+                return {}
+
+        hostnames = list(units_per_host)
+        host_dependencies = await asyncio.gather(
+            *(query_host(hostname, units_per_host[hostname]) for hostname in hostnames)
+        )
+        dependencies: dict[UnitKey, set[UnitKey]] = {}
+        for hostname, unit_dependencies in zip(hostnames, host_dependencies):
+            for unit, dependency_units in unit_dependencies.items():
+                dependencies[(hostname, unit)] = {
+                    (hostname, dependency) for dependency in dependency_units
+                }
+        for unit_reference, references in self._config.rollout_dependencies.items():
+            dependencies.setdefault(parse_unit_reference(unit_reference), set()).update(
+                parse_unit_reference(reference) for reference in references
+            )
+        return dependencies
+
+    def _unit_action_results(  # noqa: PLR0913
+        self,
+        host: ServiceHost,
+        action: ManagerAction,
+        units: list[str],
+        errors: dict[str, str],
+        duration: float,
+    ) -> list[UnitActionResult]:
+        return [
+            {
+                "hostname": host.hostname,
+                "unit": unit,
+                "action": action.value,
+                "success": unit not in errors,
+                "message": errors.get(unit, ""),
+                "state": self._unit_index.state(host.hostname, unit) or "unknown",
+                "host_duration": duration,
+            }
+            for unit in units
+        ]
+
+    async def _run_in_executor(self, func: Callable[..., T], *args: Any) -> T:
+        """Runs the blocking `func` in the worker threads of the host updates."""
+
+        return await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(self._executor, func, *args),
+            timeout=self._host_update_timeout,
+        )
+
+    async def _update_host(self, host: ServiceHost) -> None:
+        """Polls `host` (unless it follows its unit states and was polled recently) and
+        schedules its next poll according to the outcome. The outcome is always
+        recorded, as the host would not be polled again otherwise."""
+
+        outcome = PollOutcome.FAILED
+        try:
+            outcome = await self._poll_host(host)
+        except Exception:
+            logger.exception("Failed to update host %a.", host.hostname)
+        finally:
+            self._poll_scheduler.record(host.hostname, outcome)
+
+    async def _poll_host(self, host: ServiceHost) -> PollOutcome:
+        if not host.connected:
+            return PollOutcome.FAILED
+
+        # The scheduler decides when to poll, thus only a scan started within the
+        # shortest interval (e.g. by a concurrent refresh) is reused, and only while
+        # the snapshot of the host has not expired.
+        max_age = min(host._snapshot_ttl, self._poll_scheduler.min_interval)
+        try:
+            if host._push_updates and not host._is_watching_unit_states():
+                # State changes might have been missed while the watcher was not
+                # running, thus the host is scanned again right after (re)starting it.
+                await self._run_in_executor(
+                    host._start_unit_state_watcher, asyncio.get_running_loop()
+                )
+                max_age = 0.0
+            elif (
+                host._is_watching_unit_states()
+                and time.time() - host.last_refresh < self._consistency_sweep_interval
+            ):
+                return PollOutcome.UNCHANGED
+
+            with metrics.time(HOST_UPDATE_SECONDS, host=host.hostname):
+                records = await self._run_in_executor(host._get_unit_snapshot, max_age)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Updating host %a timed out after %s s.",
+                host.hostname,
+                self._host_update_timeout,
+            )
+            return PollOutcome.FAILED
+        except Exception as e:
+            logger.error("An error occurred on host %a: %s", host.hostname, e)
+            host._connected = False
+            return PollOutcome.FAILED
+
+        changed = host._apply_systemd_service_records(records)
+        host._update_connection_metrics()
+        return PollOutcome.CHANGED if changed else PollOutcome.UNCHANGED
+
+    async def _update_all_hosts(self) -> None:
+        await asyncio.gather(
+            *(self._update_host(host) for host in self.service_hosts.values())
+        )
 
     async def update_hosts(self) -> None:
-        while True:
-            self.update()
+        """Polls each host when it is due, see `orchestrator.poll_scheduler`. Without
+        `update_wait_time`, all hosts are polled once."""
+
+        if self.update_wait_time is None:
+            await self._update_all_hosts()
+            return
+
+        scheduler = self._poll_scheduler
+        polls: set[asyncio.Task[None]] = set()
+        while self.update_wait_time is not None:
+            scheduler.max_interval = self.update_wait_time
+            hostname, delay = scheduler.next_due()
+            if hostname is None or delay > 0:
+                await scheduler.wait(delay)
+                continue
 
-            if self.update_wait_time is None:
-                break
-            await asyncio.sleep(self.update_wait_time)
+            scheduler.start(hostname)
+            if self._poll_budget is not None:
+                await self._poll_budget.acquire()
+            poll = asyncio.create_task(self._update_host(self.service_hosts[hostname]))
+            polls.add(poll)
+            poll.add_done_callback(polls.discard)
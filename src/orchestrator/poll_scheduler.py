@@ -0,0 +1,152 @@
+"""
+Scheduling of the periodic host polls.
+
+Each host is polled on its own interval. Right after a unit action or a detected change
+a host is polled every `min_interval` seconds, and while nothing changes its interval
+grows by `INTERVAL_GROWTH` per poll up to `max_interval`. Hosts that could not be
+polled are retried with exponential backoff up to `max_backoff`.
+
+All delays are jittered, such that hosts with the same interval drift apart and the
+SSH load is spread evenly instead of coming in bursts. On top of that, the number of
+polls started per second over all hosts can be bounded with a
+`orchestrator.rate_limit.TokenBucket`.
+"""
+
+import asyncio
+import contextlib
+import enum
+import heapq
+import math
+import random
+import time
+
+INTERVAL_GROWTH = 1.5
+"""Factor by which the poll interval of a host grows while nothing changes."""
+
+
+class PollOutcome(enum.Enum):
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+    FAILED = "failed"
+
+
+class _HostSchedule:
+    __slots__ = ("due", "failures", "interval")
+
+    def __init__(self, interval: float, due: float) -> None:
+        self.interval = interval
+        self.failures = 0
+        self.due = due
+        """Monotonic time of the next poll (infinite while a poll is running)."""
+
+
+class PollScheduler:
+    """Keeps track of when each host is due to be polled.
+
+    Has to be used from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        max_backoff: float,
+        jitter: float = 0.2,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self._schedules: dict[str, _HostSchedule] = {}
+        self._queue: list[tuple[float, str]] = []
+        self._changed = asyncio.Event()
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def _schedule(self, hostname: str, delay: float) -> None:
+        schedule = self._schedules[hostname]
+        schedule.due = time.monotonic() + self._jittered(delay)
+        heapq.heappush(self._queue, (schedule.due, hostname))
+        self._changed.set()
+
+    def add(self, hostname: str) -> None:
+        """Adds a host, which is due after (a jittered) `min_interval`."""
+
+        self._schedules[hostname] = _HostSchedule(self.min_interval, math.inf)
+        self._schedule(hostname, self.min_interval)
+
+    def remove(self, hostname: str) -> None:
+        self._schedules.pop(hostname, None)
+        self._changed.set()
+
+    def interval(self, hostname: str) -> float:
+        """Returns the current poll interval of the host (without backoff)."""
+
+        return self._schedules[hostname].interval
+
+    def next_due(self) -> tuple[str | None, float]:
+        """Returns the host due next and the time in seconds until it is due (`None`
+        and infinity if all hosts are being polled)."""
+
+        while self._queue:
+            due, hostname = self._queue[0]
+            schedule = self._schedules.get(hostname)
+            if schedule is not None and schedule.due == due:
+                return hostname, max(due - time.monotonic(), 0.0)
+            # outdated entry of a rescheduled or removed host
+            heapq.heappop(self._queue)
+        return None, math.inf
+
+    async def wait(self, timeout: float) -> None:
+        """Waits for `timeout` seconds or until the schedule changed."""
+
+        self._changed.clear()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                self._changed.wait(), timeout if timeout != math.inf else None
+            )
+
+    def start(self, hostname: str) -> None:
+        """Marks the host as being polled, until its outcome is recorded."""
+
+        self._schedules[hostname].due = math.inf
+
+    def record(self, hostname: str, outcome: PollOutcome) -> None:
+        """Schedules the next poll of the host according to the outcome of the last
+        one."""
+
+        schedule = self._schedules.get(hostname)
+        if schedule is None:
+            return
+
+        if outcome == PollOutcome.FAILED:
+            schedule.failures += 1
+            delay = min(
+                self.min_interval * 2 ** min(schedule.failures, 32),
+                max(self.max_backoff, self.min_interval),
+            )
+        else:
+            schedule.failures = 0
+            if outcome == PollOutcome.CHANGED:
+                schedule.interval = self.min_interval
+            else:
+                schedule.interval = schedule.interval * INTERVAL_GROWTH
+            schedule.interval = min(
+                schedule.interval, max(self.max_interval, self.min_interval)
+            )
+            delay = schedule.interval
+        self._schedule(hostname, delay)
+
+    def expedite(self, hostname: str) -> None:
+        """Polls the host at the shortest interval again, e.g. after an action on one
+        of its units."""
+
+        schedule = self._schedules.get(hostname)
+        if schedule is None:
+            return
+
+        schedule.interval = self.min_interval
+        due_in = schedule.due - time.monotonic()
+        if due_in != math.inf and due_in > self.min_interval:
+            self._schedule(hostname, self.min_interval)
@@ -0,0 +1,374 @@
+"""
+Polling of the hosts in worker processes.
+
+paramiko implements the SSH transport in Python, so with hundreds of hosts the
+encryption of the polling connections alone saturates the core of the orchestrator
+process. With `poll_worker_processes` set, the hosts are split into that many shards
+and each shard is polled by a worker process, which holds its own polling connections
+and does the scanning and parsing.
+
+The orchestrator keeps scheduling the polls (see `orchestrator.poll_scheduler`) and
+sends each poll as a request to the worker of the host over a pipe. The worker replies
+with a `HostDelta`: only the records whose state, description or tags changed since
+its last reply to that host, or all records if units appeared or disappeared. The
+resource samples (see `orchestrator.unit_telemetry`) change with every scan, thus they
+stay in the worker and are requested on demand.
+
+Unit actions, journal queries and terminal sessions are less frequent and keep using
+the connections of the orchestrator process, which opens no polling connection to the
+sharded hosts. A worker that dies is restarted with the hosts of its shard.
+"""
+
+import concurrent.futures
+import contextlib
+import itertools
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from collections.abc import Callable, KeysView, Sequence
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, TypedDict, cast
+
+from pydantic import SecretStr
+
+from orchestrator.ssh_connection_pool import ConnectionRole, SSHConnectionPool
+from orchestrator.unit_records import (
+    LIST_UNITS_COMMAND,
+    SystemdRecord,
+    parse_systemd_records,
+)
+from orchestrator.unit_telemetry import TelemetryBuffer, UnitTelemetry
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 1.0
+"""Time in seconds after which a worker process that died is restarted."""
+
+
+class ShardHostConfig(TypedDict):
+    hostname: str
+    port: int
+    username: str
+    password: SecretStr | None
+    key_path: Path | None
+
+
+class PollWorkerOptions(TypedDict):
+    command_timeout: float | None
+    keepalive_interval: int
+    telemetry_samples: int
+    max_concurrent_polls: int
+
+
+class HostDelta(TypedDict):
+    records: list[SystemdRecord] | None
+    """All records of the host, if units appeared or disappeared (or all records were
+    requested)."""
+    changed: list[SystemdRecord]
+    """Otherwise, the records that changed since the last reply."""
+
+
+class PollWorkerError(Exception):
+    pass
+
+
+def _state_key(record: SystemdRecord) -> tuple[str, str, str, str, tuple[str, ...]]:
+    return (
+        record["load_state"],
+        record["active_state"],
+        record["sub_state"],
+        record["description"],
+        tuple(record["tags"]),
+    )
+
+
+class _ShardHost:
+    """The worker side of a host: scans it and tracks what was sent to the
+    orchestrator."""
+
+    def __init__(self, config: ShardHostConfig, options: PollWorkerOptions) -> None:
+        self._hostname = config["hostname"]
+        self._command_timeout = options["command_timeout"]
+        self._connection_pool = SSHConnectionPool(
+            hostname=config["hostname"],
+            username=config["username"],
+            password=config["password"],
+            key_path=config["key_path"],
+            keepalive_interval=options["keepalive_interval"],
+            port=config["port"],
+        )
+        self._telemetry = TelemetryBuffer(options["telemetry_samples"])
+        self._lock = threading.Lock()
+        self._records: list[SystemdRecord] | None = None
+        self._scan_time = 0.0
+        self._sent: dict[str, tuple[str, str, str, str, tuple[str, ...]]] = {}
+
+    def poll(self, max_age: float, full: bool) -> HostDelta:
+        """Scans the host, unless the last scan started less than `max_age` seconds
+        ago, and returns the records changed since the last call (or all records if
+        `full`)."""
+
+        with self._lock:
+            if self._records is None or time.monotonic() - self._scan_time >= max_age:
+                scan_time = time.monotonic()
+                sample_time = time.time()
+                client = self._connection_pool.get_client(ConnectionRole.POLLING)
+                _, stdout, _ = client.exec_command(
+                    LIST_UNITS_COMMAND, timeout=self._command_timeout
+                )
+                self._records = list(parse_systemd_records(stdout, self._hostname))
+                self._scan_time = scan_time
+                self._telemetry.record(sample_time, self._records)
+
+            sent = self._sent
+            self._sent = {
+                record["unit"]: _state_key(record) for record in self._records
+            }
+            if full or self._sent.keys() != sent.keys():
+                return {"records": self._records, "changed": []}
+            return {
+                "records": None,
+                "changed": [
+                    record
+                    for record in self._records
+                    if self._sent[record["unit"]] != sent[record["unit"]]
+                ],
+            }
+
+    def telemetry(self, unit: str) -> UnitTelemetry | None:
+        return self._telemetry.get(unit)
+
+    def close(self) -> None:
+        self._connection_pool.close()
+
+
+def run_poll_worker(
+    connection: Connection,
+    host_configs: list[ShardHostConfig],
+    options: PollWorkerOptions,
+) -> None:
+    """Main function of a worker process, serving the requests of the orchestrator
+    until it closes the pipe."""
+
+    hosts = {config["hostname"]: _ShardHost(config, options) for config in host_configs}
+
+    def add_host(config: ShardHostConfig) -> None:
+        remove_host(config["hostname"])
+        hosts[config["hostname"]] = _ShardHost(config, options)
+
+    def remove_host(hostname: str) -> None:
+        host = hosts.pop(hostname, None)
+        if host is not None:
+            host.close()
+
+    handlers: dict[str, Callable[..., Any]] = {
+        "poll": lambda hostname, *args: hosts[hostname].poll(*args),
+        "telemetry": lambda hostname, *args: hosts[hostname].telemetry(*args),
+    }
+    # changes of the shard are applied in order, before any later request is served
+    updates: dict[str, Callable[..., None]] = {
+        "add_host": add_host,
+        "remove_host": remove_host,
+    }
+    send_lock = threading.Lock()
+
+    def handle(request_id: int, method: str, args: tuple[Any, ...]) -> None:
+        reply: tuple[int, Any, str | None]
+        try:
+            reply = (request_id, handlers[method](*args), None)
+        except Exception as e:
+            reply = (request_id, None, f"{type(e).__name__}: {e}")
+        with send_lock:
+            connection.send(reply)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=options["max_concurrent_polls"]
+    ) as executor:
+        while True:
+            try:
+                request_id, method, args = connection.recv()
+            except EOFError:
+                break
+            if method in updates:
+                updates[method](*args)
+            else:
+                executor.submit(handle, request_id, method, args)
+
+
+class PollShard:
+    """The orchestrator side of a worker process polling a shard of the hosts.
+
+    The methods block until the worker replied and raise `PollWorkerError` if the
+    request failed. They are thread-safe. A worker that died is restarted after
+    `RESTART_DELAY` seconds with the current hosts of the shard, the requests pending
+    or sent in the meantime fail.
+    """
+
+    def __init__(
+        self, name: str, host_configs: list[ShardHostConfig], options: PollWorkerOptions
+    ) -> None:
+        self._name = name
+        self._options = options
+        self._host_configs = {config["hostname"]: config for config in host_configs}
+        self._send_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._pending: dict[int, concurrent.futures.Future[Any]] = {}
+        self.restart_count = 0
+        """Number of times the worker was restarted after it died."""
+        with self._send_lock:
+            self._start()
+
+    @property
+    def hostnames(self) -> KeysView[str]:
+        """The hosts polled by this worker."""
+
+        return self._host_configs.keys()
+
+    def _start(self) -> None:
+        """Starts the worker process, must be called with the send lock held."""
+
+        # forking would copy the threads and event loop of the orchestrator
+        context = multiprocessing.get_context("spawn")
+        connection, worker_connection = context.Pipe()
+        process = context.Process(
+            target=run_poll_worker,
+            args=(worker_connection, list(self._host_configs.values()), self._options),
+            name=self._name,
+            daemon=True,
+        )
+        process.start()
+        worker_connection.close()
+        self._connection, self._process = connection, process
+        threading.Thread(
+            target=self._receive_replies,
+            args=(connection, process),
+            name=f"{self._name}-replies",
+            daemon=True,
+        ).start()
+
+    def _call(self, method: str, *args: Any) -> Any:
+        future: concurrent.futures.Future[Any] = concurrent.futures.Future()
+        with self._send_lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+            try:
+                self._connection.send((request_id, method, args))
+            except OSError as e:
+                del self._pending[request_id]
+                raise PollWorkerError(f"{self._name} is not running") from e
+        return future.result()
+
+    def _send_update(self, method: str, *args: Any) -> None:
+        """Sends a change of the shard, which the worker applies before serving any
+        later request. Does not wait for the worker. Must be called with the send lock
+        held."""
+
+        # a dead worker is restarted with the changed hosts of the shard
+        with contextlib.suppress(OSError):
+            self._connection.send((None, method, args))
+
+    def _receive_replies(
+        self, connection: Connection, process: multiprocessing.process.BaseProcess
+    ) -> None:
+        while True:
+            try:
+                request_id, result, error = connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(request_id)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(PollWorkerError(error))
+
+        process.join(timeout=1.0)
+        if process.is_alive():
+            process.terminate()
+        # daemonic workers are terminated when the orchestrator exits
+        died = process.exitcode not in (0, -signal.SIGTERM)
+        if died:
+            logger.error(
+                "%s exited with code %s, restarting it in %s s.",
+                self._name,
+                process.exitcode,
+                RESTART_DELAY,
+            )
+        with self._send_lock:
+            connection.close()
+            for future in self._pending.values():
+                future.set_exception(PollWorkerError(f"{self._name} is not running"))
+            self._pending.clear()
+        if not died:
+            return
+
+        time.sleep(RESTART_DELAY)
+        with self._send_lock:
+            self.restart_count += 1
+            self._start()
+
+    def poll(self, hostname: str, max_age: float, full: bool) -> HostDelta:
+        return cast(HostDelta, self._call("poll", hostname, max_age, full))
+
+    def telemetry(self, hostname: str, unit: str) -> UnitTelemetry | None:
+        return cast(UnitTelemetry | None, self._call("telemetry", hostname, unit))
+
+    def add_host(self, config: ShardHostConfig) -> None:
+        """Starts polling the host, replacing its previous config if it is polled
+        already."""
+
+        with self._send_lock:
+            self._host_configs[config["hostname"]] = config
+            self._send_update("add_host", config)
+
+    def remove_host(self, hostname: str) -> None:
+        with self._send_lock:
+            self._host_configs.pop(hostname, None)
+            self._send_update("remove_host", hostname)
+
+
+class PollShards:
+    """The worker processes polling the hosts.
+
+    The hosts are assigned round-robin on startup, and hosts added later to the worker
+    with the fewest hosts. Without workers, no host is assigned to any.
+    """
+
+    def __init__(
+        self,
+        host_configs: Sequence[ShardHostConfig],
+        n_workers: int,
+        options: PollWorkerOptions,
+    ) -> None:
+        # all workers are started, such that hosts added later are spread as well
+        self._shards = [
+            PollShard(
+                f"poll-worker-{index}", list(host_configs[index::n_workers]), options
+            )
+            for index in range(n_workers)
+        ]
+
+    def get(self, hostname: str) -> PollShard | None:
+        """Returns the shard polling `hostname`, if any."""
+
+        for shard in self._shards:
+            if hostname in shard.hostnames:
+                return shard
+        return None
+
+    def add_host(self, config: ShardHostConfig) -> PollShard | None:
+        """Assigns the host to the least loaded shard and returns it (`None` if there
+        are no workers)."""
+
+        if not self._shards:
+            return None
+        shard = min(self._shards, key=lambda shard: len(shard.hostnames))
+        shard.add_host(config)
+        return shard
+
+    def remove_host(self, hostname: str) -> None:
+        shard = self.get(hostname)
+        if shard is not None:
+            shard.remove_host(hostname)
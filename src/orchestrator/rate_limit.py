@@ -0,0 +1,41 @@
+"""
+Rate limiting of the host polls and of the terminal input.
+
+A `TokenBucket` bounds the number of host polls started per second over all hosts (see
+`orchestrator.poll_scheduler`) and the number of bytes per second a client can type
+or paste into its terminal sessions (see `orchestrator.web_server.input_pipeline`).
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Allows `rate` tokens to be acquired per second on average and bursts of up to
+    `burst` tokens."""
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self._rate = rate
+        self._capacity = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * self._rate, self._capacity
+        )
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Waits until `tokens` tokens are available and takes them. More tokens than
+        the burst are taken once the bucket is full, delaying the next acquisitions
+        until they are refilled."""
+
+        while True:
+            self._refill()
+            needed = min(tokens, self._capacity)
+            if self._tokens >= needed:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((needed - self._tokens) / self._rate)
@@ -0,0 +1,249 @@
+"""
+Rollouts of an action over many units in dependency order.
+
+A rollout runs an action (e.g. a restart) on a set of units across hosts. A unit is
+acted upon after the units it depends on, which are
+
+- the units named in its `After=` and `Requires=` properties (on the same host), read
+  with `systemctl show --property=Id,After,Requires`, and
+- the units given in `rollout_dependencies` of the config, which can be on other hosts:
+
+      rollout_dependencies:
+        worker-1/worker: [db-1/postgres, mq-1/broker]
+
+Dependencies on units outside of the rollout are ignored. The units are grouped into
+waves, each unit being in the wave after the last of its dependencies, such that the
+units of a wave are independent of each other and run in parallel. Stopping runs the
+waves in reverse order, i.e. dependents first.
+
+At most `max_parallel` units are acted upon at the same time, i.e. are unavailable
+while being restarted. `max_unavailable` bounds the units that did not get ready
+(e.g. active again after a restart) within the readiness timeout and thus stay
+unavailable: once that many units failed, the remaining units are skipped, as are the
+units depending on a failed unit. At most `max_parallel + max_unavailable - 1` units
+are thus unavailable at once.
+"""
+
+import asyncio
+import enum
+import shlex
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from typing import NamedTuple, TypedDict
+
+from orchestrator.systemd_service_proxy import ManagerAction
+from orchestrator.unit_index import UnitKey
+
+DEPENDENCY_PROPERTIES = ("Id", "After", "Requires")
+
+
+class RolloutStepStatus(enum.Enum):
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+class RolloutStepResult(TypedDict):
+    hostname: str
+    unit: str
+    action: str
+    wave: int
+    status: str
+    """Value of `RolloutStepStatus`."""
+    message: str
+    started_at: float | None
+    """Unix timestamp of when the action was started (`None` if it was not)."""
+    duration: float
+    """Seconds from the start of the action until the unit was ready (or failed)."""
+
+
+class RolloutPlan(NamedTuple):
+    waves: list[list[UnitKey]]
+    dependencies: dict[UnitKey, set[UnitKey]]
+    """The dependencies of each unit within the rollout."""
+
+
+def build_show_dependencies_command(units: Iterable[str]) -> str:
+    return f"systemctl show --user --property={','.join(DEPENDENCY_PROPERTIES)} " + (
+        " ".join(shlex.quote(f"{unit}.service") for unit in units)
+    )
+
+
+def _service_names(value: str) -> set[str]:
+    return {name[:-8] for name in value.split() if name.endswith(".service")}
+
+
+def parse_unit_dependencies(lines: Iterable[str]) -> dict[str, set[str]]:
+    """Parses the output of `build_show_dependencies_command`, returning the services
+    each unit is ordered after or requires."""
+
+    dependencies: dict[str, set[str]] = {}
+    unit: str | None = None
+    for line in lines:
+        key, _, value = line.rstrip("\r\n").partition("=")
+        if key == "Id":
+            unit = value[:-8] if value.endswith(".service") else None
+            if unit is not None:
+                dependencies.setdefault(unit, set())
+        elif unit is not None and key in ("After", "Requires"):
+            dependencies[unit] |= _service_names(value)
+    return dependencies
+
+
+def parse_unit_reference(reference: str) -> UnitKey:
+    """Parses a unit given as `<hostname>/<unit>`."""
+
+    hostname, separator, unit = reference.rpartition("/")
+    if not separator or not hostname or not unit:
+        raise ValueError(f"Expected '<hostname>/<unit>', got {reference!r}.")
+    return hostname, unit
+
+
+def plan_rollout(
+    units: Iterable[UnitKey],
+    dependencies: Mapping[UnitKey, Iterable[UnitKey]],
+    reverse: bool = False,
+) -> RolloutPlan:
+    """Groups `units` into waves such that every unit comes after the units it depends
+    on (before them if `reverse`). Raises `ValueError` if the dependencies are
+    cyclic."""
+
+    selected = list(dict.fromkeys(units))
+    selected_set = set(selected)
+    within = {
+        key: {
+            dependency
+            for dependency in dependencies.get(key, ())
+            if dependency in selected_set and dependency != key
+        }
+        for key in selected
+    }
+    ordered_after = within
+    if reverse:
+        ordered_after = {key: set() for key in selected}
+        for key, key_dependencies in within.items():
+            for dependency in key_dependencies:
+                ordered_after[dependency].add(key)
+
+    waves: list[list[UnitKey]] = []
+    wave_of: dict[UnitKey, int] = {}
+    remaining = selected
+    while remaining:
+        wave = [
+            key
+            for key in remaining
+            if all(dependency in wave_of for dependency in ordered_after[key])
+        ]
+        if not wave:
+            cycle = ", ".join(f"{hostname}/{unit}" for hostname, unit in remaining)
+            raise ValueError(f"The dependencies of these units are cyclic: {cycle}")
+        for key in wave:
+            wave_of[key] = len(waves)
+        waves.append(wave)
+        remaining = [key for key in remaining if key not in wave_of]
+    return RolloutPlan(waves, ordered_after)
+
+
+class RolloutBudget:
+    """Bounds the units being acted upon (`max_parallel`) and the units that failed to
+    get ready (`max_unavailable`), see the module docstring."""
+
+    def __init__(self, max_parallel: int, max_unavailable: int) -> None:
+        if max_parallel < 1 or max_unavailable < 1:
+            raise ValueError("max_parallel and max_unavailable must be at least 1.")
+        self._max_parallel = max_parallel
+        self._max_unavailable = max_unavailable
+        self._running = 0
+        self._failed = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether failed units use up the unavailability budget."""
+
+        return self._failed >= self._max_unavailable
+
+    async def acquire(self) -> bool:
+        """Waits until another unit may be acted upon. Returns `False` if the budget is
+        exhausted instead."""
+
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.exhausted or self._running < self._max_parallel
+            )
+            if self.exhausted:
+                return False
+            self._running += 1
+            return True
+
+    async def release(self, ready: bool) -> None:
+        async with self._condition:
+            self._running -= 1
+            if not ready:
+                self._failed += 1
+            self._condition.notify_all()
+
+
+RolloutStep = Callable[[UnitKey], Awaitable[tuple[bool, str]]]
+"""Runs the action on a unit and waits until it is ready. Returns whether it got ready
+and a message."""
+
+
+async def run_rollout(
+    plan: RolloutPlan,
+    action: ManagerAction,
+    run_step: RolloutStep,
+    budget: RolloutBudget,
+) -> AsyncIterator[list[RolloutStepResult]]:
+    """Runs the waves of `plan` one after the other, yielding the results of each
+    wave once all of its units are done."""
+
+    not_ready: set[UnitKey] = set()
+
+    async def run(key: UnitKey, wave: int) -> RolloutStepResult:
+        hostname, unit = key
+        result: RolloutStepResult = {
+            "hostname": hostname,
+            "unit": unit,
+            "action": action.value,
+            "wave": wave,
+            "status": RolloutStepStatus.SKIPPED.value,
+            "message": "",
+            "started_at": None,
+            "duration": 0.0,
+        }
+        not_ready_dependencies = plan.dependencies[key] & not_ready
+        if not_ready_dependencies:
+            result["message"] = "Depends on units that did not get ready: " + ", ".join(
+                f"{dependency_hostname}/{dependency_unit}"
+                for dependency_hostname, dependency_unit in sorted(
+                    not_ready_dependencies
+                )
+            )
+            not_ready.add(key)
+            return result
+        if not await budget.acquire():
+            result["message"] = "Too many units are unavailable."
+            not_ready.add(key)
+            return result
+
+        result["started_at"] = time.time()
+        start = time.perf_counter()
+        ready = False
+        try:
+            ready, result["message"] = await run_step(key)
+        except Exception as e:
+            result["message"] = str(e) or type(e).__name__
+        finally:
+            await budget.release(ready)
+        result["duration"] = time.perf_counter() - start
+        if ready:
+            result["status"] = RolloutStepStatus.DONE.value
+        else:
+            result["status"] = RolloutStepStatus.FAILED.value
+            not_ready.add(key)
+        return result
+
+    for wave, keys in enumerate(plan.waves):
+        yield list(await asyncio.gather(*(run(key, wave) for key in keys)))
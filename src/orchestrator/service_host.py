@@ -1,49 +1,169 @@
+import asyncio
+import contextlib
+import enum
 import logging
-import re
+import threading
+import time
 from pathlib import Path
-from typing import TypedDict
 
 import paramiko
 import pydase.components
 from paramiko.ssh_exception import NoValidConnectionsError
 from pydantic import SecretStr
 
+from orchestrator.journal import (
+    JOURNAL_CACHE_SIZE,
+    JOURNAL_PAGE_SIZE,
+    JournalCache,
+    JournalPage,
+    JournalRecord,
+    build_journal_command,
+    parse_journal_records,
+)
+from orchestrator.metrics import (
+    HOST_SCANS,
+    SSH_COMMAND_SECONDS,
+    SSH_CONNECTIONS,
+    metrics,
+)
+from orchestrator.poll_scheduler import PollScheduler
+from orchestrator.poll_shards import PollShard
+from orchestrator.rollouts import (
+    build_show_dependencies_command,
+    parse_unit_dependencies,
+)
+from orchestrator.ssh_connection_pool import ConnectionRole, SSHConnectionPool
 from orchestrator.systemd_service_proxy import (
     ManagerAction,
     ServiceState,
     SystemdServiceProxy,
 )
+from orchestrator.unit_actions import (
+    build_unit_action_command,
+    parse_unit_action_errors,
+)
+from orchestrator.unit_index import UnitIndex
+from orchestrator.unit_jobs import (
+    MAX_UNIT_JOBS,
+    UNIT_JOB_TIMEOUT,
+    UnitJob,
+    UnitJobError,
+    action_succeeded,
+    build_list_jobs_command,
+    has_pending_job,
+)
+from orchestrator.unit_records import (
+    LIST_UNITS_COMMAND,
+    SystemdRecord,
+    UnitSnapshot,
+    build_show_units_command,
+    parse_systemd_records,
+)
+from orchestrator.unit_state_watcher import UnitStateEvent, UnitStateWatcher
+from orchestrator.unit_store import StoredHost, StoredUnit, UnitStore
+from orchestrator.unit_telemetry import (
+    TELEMETRY_SAMPLES,
+    TelemetryBuffer,
+    UnitTelemetry,
+)
 
 logger = logging.getLogger(__name__)
 
+_MIN_JOB_POLL_INTERVAL = 0.2
+_MAX_JOB_POLL_INTERVAL = 2.0
+
+_CONNECTION_ERRORS = (
+    OSError,
+    paramiko.BadHostKeyException,
+    paramiko.AuthenticationException,
+    NoValidConnectionsError,
+    paramiko.SSHException,
+)
+
 
-class SystemdRecord(TypedDict):
-    unit: str
-    load_state: str
-    active_state: str
-    sub_state: str
-    description: str
-    tags: list[str]
-    hostname: str
+def _main_connection_role(poll_shard: PollShard | None) -> ConnectionRole:
+    """Hosts polled by a worker process do not need a polling connection in the
+    orchestrator process, their actions connection tells whether they are reachable."""
+
+    return ConnectionRole.POLLING if poll_shard is None else ConnectionRole.ACTIONS
+
+
+class HostReadiness(enum.Enum):
+    CONNECTING = "connecting"
+    """The host has not been reached yet."""
+    STALE = "stale"
+    """The units of the host are restored from the last run, the host has not been
+    reached yet."""
+    READY = "ready"
+    """The units of the host have been listed."""
+    UNREACHABLE = "unreachable"
+    """The last attempt to connect to the host failed, it is retried in the
+    background."""
 
 
 class ServiceHost(pydase.components.DeviceConnection):
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         hostname: str,
         username: str,
         password: SecretStr | None = None,
         key_path: Path | None = None,
+        command_timeout: float | None = None,
+        push_updates: bool = False,
+        keepalive_interval: int = 30,
+        max_reconnection_wait_time: float = 300.0,
+        snapshot_ttl: float = 5.0,
+        port: int = 22,
+        unit_index: UnitIndex | None = None,
+        poll_scheduler: PollScheduler | None = None,
+        unit_store: UnitStore | None = None,
+        telemetry_samples: int = TELEMETRY_SAMPLES,
+        poll_shard: PollShard | None = None,
     ) -> None:
         super().__init__()
         self._hostname = hostname
         self._username = username
-        self._password = password
-        self._key_path = key_path
-        self._ssh_client = paramiko.SSHClient()
-        self._ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.service_proxy_list: list[SystemdServiceProxy] = []
-        self.connect()
+        self._command_timeout = command_timeout
+        self._push_updates = push_updates
+        self._unit_state_watcher: UnitStateWatcher | None = None
+        self._keepalive_interval = keepalive_interval
+        self._reconnect_requested = asyncio.Event()
+        self._connection_pool = SSHConnectionPool(
+            hostname=hostname,
+            username=username,
+            password=password,
+            key_path=key_path,
+            keepalive_interval=keepalive_interval,
+            port=port,
+            main_role=_main_connection_role(poll_shard),
+        )
+        self._max_reconnection_wait_time = max_reconnection_wait_time
+        self._snapshot_ttl = snapshot_ttl
+        self._snapshot = UnitSnapshot()
+        self._telemetry = TelemetryBuffer(telemetry_samples)
+        self._poll_shard = poll_shard
+        self._journal_caches: dict[str, JournalCache] = {}
+        self._journal_lock = threading.Lock()
+        """Guards `_journal_caches`, each cache has a lock of its own."""
+        self._unit_index = unit_index if unit_index is not None else UnitIndex()
+        self._poll_scheduler = poll_scheduler
+        self._unit_store = unit_store
+        self.service_proxies: dict[str, SystemdServiceProxy] = {}
+        """The service proxies of this host, by unit name."""
+        self.last_refresh = 0.0
+        """Unix timestamp of the last successful refresh (0.0 if never refreshed)."""
+        self.open_connections = 0
+        """Number of open SSH connections to this host."""
+        self.idle_connections = 0
+        """Number of open SSH connections without any open channel."""
+        self.reconnect_count = 0
+        """Number of times an SSH connection to this host was re-established."""
+        self.unit_jobs: dict[str, UnitJob] = {}
+        """The recent actions on units of this host, by job id."""
+        self.readiness = HostReadiness.CONNECTING
+        """Whether the units of this host are known. The host is connected and scanned
+        for the first time in the background (see `_handle_connection`), such that
+        constructing many hosts does not wait for any of them."""
 
     @property
     def hostname(self) -> str:
@@ -53,128 +173,695 @@ class ServiceHost(pydase.components.DeviceConnection):
     def username(self) -> str:
         return self._username
 
+    @property
+    def connected(self) -> bool:
+        return self._connected and self._connection_pool.connected
+
     def connect(self) -> None:
+        """Makes `_handle_connection` reconnect right away, e.g. when triggered from
+        the reconnect overlay of the frontend. Connecting blocks, thus it is not done
+        here, in the event loop."""
+
+        self._reconnect_requested.set()
+
+    async def _handle_connection(self) -> None:
+        """Reconnects to the host in the background.
+
+        Replaces the implementation of `DeviceConnection`, such that connecting does not
+        block the event loop and unreachable hosts are retried with exponential
+        backoff. Hosts that are not ready are scanned right after connecting, so that
+        their units show up without waiting for the poll scheduler.
+        """
+
+        loop = asyncio.get_running_loop()
+        wait_time = self._reconnection_wait_time
+        while True:
+            if not self.connected:
+                try:
+                    await loop.run_in_executor(None, self._connection_pool.connect)
+                except _CONNECTION_ERRORS as e:
+                    logger.error("Could not connect to %a: %s", self._hostname, e)
+                    self.readiness = HostReadiness.UNREACHABLE
+                    wait_time = min(2 * wait_time, self._max_reconnection_wait_time)
+                else:
+                    self._connected = True
+                    wait_time = self._reconnection_wait_time
+                    if self.readiness != HostReadiness.READY:
+                        await self._scan_initially(loop)
+                    if self._poll_scheduler is not None:
+                        self._poll_scheduler.expedite(self._hostname)
+
+            self._update_connection_metrics()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._reconnect_requested.wait(), wait_time)
+            self._reconnect_requested.clear()
+
+    def _reconfigure(  # noqa: PLR0913
+        self,
+        username: str,
+        password: SecretStr | None,
+        key_path: Path | None,
+        port: int,
+        push_updates: bool,
+        poll_shard: PollShard | None,
+    ) -> None:
+        """Switches to new connection settings. The connections are closed and
+        `_handle_connection` reconnects right away, while the units are kept until the
+        host is polled again. Must be called in the event loop."""
+
+        self._stop_unit_state_watcher()
+        previous_pool = self._connection_pool
+        self._username = username
+        self._push_updates = push_updates
+        self._poll_shard = poll_shard
+        self._connection_pool = SSHConnectionPool(
+            hostname=self._hostname,
+            username=username,
+            password=password,
+            key_path=key_path,
+            keepalive_interval=self._keepalive_interval,
+            port=port,
+            main_role=_main_connection_role(poll_shard),
+        )
+        self._connected = False
+        self._close_in_background(previous_pool)
+        self._reconnect_requested.set()
+
+    def _close(self) -> None:
+        """Stops the background tasks of the host and closes its connections, which
+        also ends the terminal sessions opened on it. Its units are removed from the
+        shared unit index and store. Must be called in the event loop."""
+
+        for task in self._task_manager.tasks.values():
+            task.cancel()
+        self._stop_unit_state_watcher()
+        self._connected = False
+        self._close_in_background(self._connection_pool)
+
+        for unit in self._unit_index.units(self._hostname):
+            self._unit_index.remove(self._hostname, unit)
+        if self._unit_store is not None:
+            self._unit_store.remove(self._hostname)
+        # polls still in flight must not add the units again
+        self._unit_index = UnitIndex()
+        self._unit_store = None
+        self._poll_scheduler = None
+
+    def _close_in_background(self, connection_pool: SSHConnectionPool) -> None:
+        # closing waits for the transport threads to end
+        asyncio.get_running_loop().run_in_executor(None, connection_pool.close)
+
+    async def _scan_initially(self, loop: asyncio.AbstractEventLoop) -> None:
         try:
-            if self._password is not None:
-                self._ssh_client.connect(
-                    self._hostname,
-                    username=self._username,
-                    password=self._password.get_secret_value(),
+            records = await loop.run_in_executor(None, self._get_unit_snapshot)
+        except Exception as e:
+            logger.error("An error occurred on host %a: %s", self._hostname, e)
+            self._connected = False
+            self.readiness = HostReadiness.UNREACHABLE
+            return
+        self._apply_systemd_service_records(records)
+
+    def _update_connection_metrics(self) -> None:
+        self.open_connections = self._connection_pool.open_connections
+        self.idle_connections = self._connection_pool.idle_connections
+        self.reconnect_count = self._connection_pool.reconnect_count
+        metrics.set(
+            SSH_CONNECTIONS,
+            self.open_connections - self.idle_connections,
+            host=self._hostname,
+            state="busy",
+        )
+        metrics.set(
+            SSH_CONNECTIONS, self.idle_connections, host=self._hostname, state="idle"
+        )
+
+    def _apply_systemd_service_records(self, records: list[SystemdRecord]) -> bool:
+        """Updates the service proxies of this host with the given records. Returns
+        whether any unit appeared, disappeared or changed.
+
+        Existing proxies are kept and only updated where their state, description or
+        tags changed, such that the frontend is only notified about actual changes,
+        addressed by unit name. `service_proxies` itself is only replaced when units
+        appeared or disappeared (adding or popping single items makes pydase re-notify
+        all properties of the other proxies).
+
+        Has to be called from the event loop thread, as it notifies the frontend.
+        """
+
+        current_proxies = self.service_proxies
+        units = {record["unit"] for record in records}
+        changed = units != current_proxies.keys()
+        if changed:
+            self.service_proxies = {
+                record["unit"]: current_proxies.get(record["unit"])
+                or self._create_service_proxy(
+                    unit=record["unit"],
+                    state=ServiceState(record["active_state"]),
+                    description=record["description"],
+                    tags=record["tags"],
                 )
-            elif self._key_path is not None:
-                self._ssh_client.connect(
+                for record in records
+            }
+            for unit in self._unit_index.units(self._hostname) - units:
+                self._unit_index.remove(self._hostname, unit)
+
+        service_proxies = self.service_proxies
+        for record in records:
+            changed |= self._update_service_proxy(
+                service_proxies[record["unit"]],
+                state=ServiceState(record["active_state"]),
+                description=record["description"],
+                tags=record["tags"],
+            )
+        self.last_refresh = time.time()
+        if self.readiness != HostReadiness.READY:
+            self.readiness = HostReadiness.READY
+        if self._unit_store is not None:
+            self._unit_store.touch(self._hostname, self.last_refresh)
+        if changed:
+            self._store_units()
+        return changed
+
+    def _restore_units(self, stored_host: StoredHost) -> None:
+        """Creates the service proxies of the units stored by a previous run, unless
+        the host has been scanned already. They are marked as stale until the host is
+        scanned."""
+
+        if self.readiness == HostReadiness.READY:
+            return
+
+        service_proxies: dict[str, SystemdServiceProxy] = {}
+        for stored_unit in stored_host.units:
+            try:
+                state = ServiceState(stored_unit.state)
+            except ValueError:
+                # e.g. saved by a version knowing other states, the unit shows up
+                # again once the host is scanned
+                logger.warning(
+                    "Not restoring unit %a of %a in the unknown state %a.",
+                    stored_unit.unit,
                     self._hostname,
-                    username=self._username,
-                    key_filename=str(self._key_path),
+                    stored_unit.state,
                 )
-            else:
-                raise Exception(
-                    "Host configured with neither password not ssh key. Please add "
-                    "either to the host configuration."
+                continue
+            service_proxies[stored_unit.unit] = self._create_service_proxy(
+                unit=stored_unit.unit,
+                state=state,
+                description=stored_unit.description,
+                tags=stored_unit.tags,
+            )
+        self.service_proxies = service_proxies
+        for proxy in self.service_proxies.values():
+            self._unit_index.update(
+                self._hostname, proxy._unit, proxy._state.value, proxy._tags
+            )
+        self.last_refresh = stored_host.last_seen
+        if self.readiness == HostReadiness.CONNECTING:
+            self.readiness = HostReadiness.STALE
+
+    def _store_units(self) -> None:
+        if self._unit_store is None:
+            return
+
+        self._unit_store.update(
+            self._hostname,
+            [
+                StoredUnit(
+                    proxy._unit, proxy._state.value, proxy._description, proxy._tags
                 )
-        except (
-            OSError,
-            paramiko.BadHostKeyException,
-            paramiko.AuthenticationException,
-            NoValidConnectionsError,
-            paramiko.SSHException,
-        ) as e:
-            self._connected = False
-            logger.exception("Got error %s", e)
+                for proxy in self.service_proxies.values()
+            ],
+        )
+
+    def _apply_unit_records(self, records: list[SystemdRecord]) -> None:
+        """Updates the service proxies of the given units only.
+
+        Has to be called from the event loop thread, as it notifies the frontend.
+        """
+
+        changed = False
+        for record in records:
+            proxy = self.service_proxies.get(record["unit"])
+            if proxy is not None:
+                changed |= self._update_service_proxy(
+                    proxy,
+                    state=ServiceState(record["active_state"]),
+                    description=record["description"],
+                    tags=record["tags"],
+                )
+        if changed:
+            self._store_units()
+
+    def _is_watching_unit_states(self) -> bool:
+        return self._unit_state_watcher is not None and self._unit_state_watcher.running
+
+    def _start_unit_state_watcher(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Starts following the unit state changes pushed by the host.
+
+        Blocks until the watcher channel is opened. The state changes are applied in
+        the given event loop.
+        """
+
+        def callback(event: UnitStateEvent) -> None:
+            loop.call_soon_threadsafe(self._apply_unit_state_event, event)
+
+        connection_pool = self._connection_pool
+        self._unit_state_watcher = UnitStateWatcher(
+            connection_pool.get_client(connection_pool.main_role), callback
+        )
+        self._unit_state_watcher.start()
+
+    def _stop_unit_state_watcher(self) -> None:
+        if self._unit_state_watcher is not None:
+            self._unit_state_watcher.stop()
+            self._unit_state_watcher = None
+
+    def _apply_unit_state_event(self, event: UnitStateEvent) -> None:
+        proxy = self.service_proxies.get(event.unit)
+        if proxy is None:
             return
 
-        self._connected = True
-        self.service_proxy_list = self.get_service_proxy_list()
+        try:
+            state = ServiceState(event.active_state)
+        except ValueError:
+            logger.debug("Ignoring unknown state of %a: %s", event.unit, event)
+            return
 
-    def get_service_proxy_list(self) -> list[SystemdServiceProxy]:
-        service_proxy_list: list[SystemdServiceProxy] = []
+        # A refresh must not revert the state with a snapshot scanned before. The lock
+        # of the snapshot is held while scanning, thus it is not taken here.
+        self._snapshot.change_time = time.monotonic()
+        if self._update_service_proxy(proxy, state=state):
+            self._store_units()
 
-        systemd_record_list = self._get_systemd_service_records()
+    def _update_service_proxy(
+        self,
+        proxy: SystemdServiceProxy,
+        state: ServiceState | None = None,
+        description: str | None = None,
+        tags: list[str] | None = None,
+    ) -> bool:
+        """Updates `proxy` and its entry in the unit index. Returns whether anything
+        changed."""
 
-        for systemd_record in systemd_record_list:
+        changed = proxy._update(state=state, description=description, tags=tags)
+        self._unit_index.update(
+            self._hostname, proxy._unit, proxy._state.value, proxy._tags
+        )
+        return changed
 
-            def change_unit_state(
-                action: ManagerAction, *, systemd_unit: str = systemd_record["unit"]
-            ) -> None:
-                self._manage_systemd_unit(action, systemd_unit)
-                self.service_proxy_list = self.get_service_proxy_list()
+    def _create_service_proxy(
+        self, unit: str, state: ServiceState, description: str, tags: list[str]
+    ) -> SystemdServiceProxy:
+        def change_unit_state(
+            action: ManagerAction, *, systemd_unit: str = unit
+        ) -> str:
+            return self._start_unit_job(action, systemd_unit)
 
-            service_proxy = SystemdServiceProxy(
-                hostname=self._hostname,
-                username=self._username,
-                unit=systemd_record["unit"],
-                state=ServiceState(systemd_record["active_state"]),
-                description=systemd_record["description"],
-                tags=systemd_record["tags"],
-                systemd_unit_manager=change_unit_state,
-            )
-            service_proxy_list.append(service_proxy)
+        return SystemdServiceProxy(
+            hostname=self._hostname,
+            username=self._username,
+            unit=unit,
+            state=state,
+            description=description,
+            tags=tags,
+            systemd_unit_manager=change_unit_state,
+        )
 
-        return service_proxy_list
+    def _start_unit_job(self, action: ManagerAction, unit: str) -> str:
+        """Runs `action` on `unit` in the background and returns the id of the job
+        tracking it (see `unit_jobs`). While a job of the unit has not finished, no
+        other action is started and the id of that job is returned instead.
 
-    def _manage_systemd_unit(self, action: ManagerAction, unit: str) -> str | None:
-        """
-        Manages a given systemd unit.
-
-        :param action: Action to perform (start, stop, restart)
-        :param unit: Systemd unit name
-        :param hostname: Hostname or IP address to connect to
-        :param user: SSH username
-        :param key_path: Path to the SSH private key (if applicable)
-        :return: Response from the execution
+        Has to be called from the event loop thread.
         """
 
-        cmd = f"systemctl --user {action.value} {unit}"
+        for job in self.unit_jobs.values():
+            if job.unit == unit and not job.finished:
+                logger.warning(
+                    "Not running %s on %a, its %s is still running.",
+                    action.value,
+                    unit,
+                    job.action.value,
+                )
+                return job.id
+
+        finished_jobs = [
+            job_id for job_id, job in self.unit_jobs.items() if job.finished
+        ]
+        n_dropped = max(len(self.unit_jobs) - MAX_UNIT_JOBS + 1, 0)
+        for job_id in finished_jobs[:n_dropped]:
+            self.unit_jobs.pop(job_id)
+
+        job = UnitJob(self._hostname, unit, action)
+        self.unit_jobs[job.id] = job
+        asyncio.get_running_loop().create_task(self._run_unit_job(job))
+        if self._poll_scheduler is not None:
+            self._poll_scheduler.expedite(self._hostname)
+        return job.id
+
+    async def _run_unit_job(self, job: UnitJob) -> None:
+        """Enqueues the action of `job` and watches the unit until systemd finished the
+        job, updating the service proxy on the way."""
 
+        loop = asyncio.get_running_loop()
         try:
-            _, stdout, _ = self._ssh_client.exec_command(cmd)
-            return stdout.read().decode("utf-8")
+            exit_status, output = await loop.run_in_executor(
+                None, self._enqueue_unit_action, job.action, job.unit
+            )
         except Exception as e:
             logger.error("An error occurred on host %a: %s", self._hostname, e)
             self._connected = False
-            return None
+            job._finish(success=False, output=str(e))
+            return
+        if exit_status != 0:
+            job._finish(success=False, output=output)
+            return
+
+        job._set_running(output)
+        try:
+            success, state = await self._await_unit_job(
+                job.action, job.unit, UNIT_JOB_TIMEOUT
+            )
+        except UnitJobError as e:
+            job._finish(success=False, output=str(e))
+            return
+        job._finish(success=success, output=job.output or state)
 
-    def _get_systemd_service_records(self) -> list[SystemdRecord]:
-        cmd = (
-            r'systemctl list-units --user --all --full --no-pager | grep "Tags \[.*\]"'
+    async def _await_unit_job(
+        self, action: ManagerAction, unit: str, timeout: float
+    ) -> tuple[bool, str]:
+        """Watches `unit` until systemd finished its job, updating the service proxy on
+        the way. Returns whether `action` succeeded and the resulting state. Raises
+        `UnitJobError` if the job cannot be followed or does not finish within
+        `timeout` seconds."""
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        poll_interval = _MIN_JOB_POLL_INTERVAL
+        while True:
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(2 * poll_interval, _MAX_JOB_POLL_INTERVAL)
+            try:
+                pending, records = await loop.run_in_executor(
+                    None, self._query_unit_job, unit
+                )
+            except Exception as e:
+                logger.error("An error occurred on host %a: %s", self._hostname, e)
+                raise UnitJobError(f"Lost track of the job: {e}") from e
+
+            self._apply_unit_records(records)
+            if not pending:
+                break
+            if loop.time() > deadline:
+                raise UnitJobError("Timed out waiting for the job.")
+
+        if not records:
+            raise UnitJobError("The unit disappeared.")
+        state = f"{records[0]['active_state']} ({records[0]['sub_state']})"
+        return (
+            action_succeeded(action, records[0]["active_state"]),
+            f"Unit is {state}.",
         )
-        result_list: list[SystemdRecord] = []
 
-        systemd_unit_pattern = (
-            r"[^\w]+([\w-]+\.service)\s+(\w+)\s+(\w+)\s+(\w+)\s+(.+?)\s+Tags \[(.+?)\]"
+    def _enqueue_unit_action(self, action: ManagerAction, unit: str) -> tuple[int, str]:
+        """Enqueues `action` on `unit` without waiting for it to finish. Returns the
+        exit status and output of systemctl. Blocks and raises on SSH errors."""
+
+        client = self._connection_pool.get_client(ConnectionRole.ACTIONS)
+        with metrics.time(
+            SSH_COMMAND_SECONDS, host=self._hostname, operation="enqueue_action"
+        ):
+            _, stdout, stderr = client.exec_command(
+                build_unit_action_command(action, [unit], no_block=True),
+                timeout=self._command_timeout,
+            )
+            output = stdout.read() + stderr.read()
+            exit_status = stdout.channel.recv_exit_status()
+        return exit_status, output.decode("utf-8", "replace")
+
+    def _query_unit_job(self, unit: str) -> tuple[bool, list[SystemdRecord]]:
+        """Returns whether `unit` has a pending job and its current record. Blocks and
+        raises on SSH errors."""
+
+        client = self._connection_pool.get_client(ConnectionRole.ACTIONS)
+        with metrics.time(
+            SSH_COMMAND_SECONDS, host=self._hostname, operation="list_jobs"
+        ):
+            _, stdout, _ = client.exec_command(
+                build_list_jobs_command(unit), timeout=self._command_timeout
+            )
+            pending = has_pending_job(stdout, unit)
+        return pending, self._refresh_unit_records([unit])
+
+    def _query_unit_dependencies(self, units: list[str]) -> dict[str, set[str]]:
+        """Returns the services each of `units` is ordered after or requires, see
+        `orchestrator.rollouts`. Blocks and raises on SSH errors."""
+
+        client = self._connection_pool.get_client(ConnectionRole.ACTIONS)
+        with metrics.time(
+            SSH_COMMAND_SECONDS, host=self._hostname, operation="show_dependencies"
+        ):
+            _, stdout, _ = client.exec_command(
+                build_show_dependencies_command(units), timeout=self._command_timeout
+            )
+            return parse_unit_dependencies(stdout)
+
+    def _run_unit_action(
+        self, action: ManagerAction, units: list[str]
+    ) -> dict[str, str]:
+        """Runs `action` on all `units` in a single systemctl call. Returns the error
+        message of each unit the action failed on.
+
+        systemctl prints nothing until all jobs finished, thus the call may take up to
+        `UNIT_JOB_TIMEOUT` instead of the command timeout. Like
+        `_query_systemd_service_records`, this blocks and raises on SSH errors without
+        modifying the state of the service.
+        """
+
+        client = self._connection_pool.get_client(ConnectionRole.ACTIONS)
+        with metrics.time(SSH_COMMAND_SECONDS, host=self._hostname, operation="action"):
+            _, stdout, stderr = client.exec_command(
+                build_unit_action_command(action, units), timeout=UNIT_JOB_TIMEOUT
+            )
+            stdout.read()
+            errors = stderr.read().decode("utf-8", errors="replace")
+            exit_status = stdout.channel.recv_exit_status()
+        return parse_unit_action_errors(exit_status, errors, units)
+
+    def _query_journal(  # noqa: PLR0913
+        self,
+        unit: str,
+        *,
+        after_cursor: str | None = None,
+        before_cursor: str | None = None,
+        since: str | None = None,
+        limit: int = JOURNAL_PAGE_SIZE,
+    ) -> JournalPage:
+        """Returns a page of the journal of `unit`.
+
+        Without arguments, the `limit` most recent entries are returned. Older and newer
+        entries are paged with `before_cursor` and `after_cursor`, while `since` (any
+        time specification understood by journalctl) starts at a point in time.
+
+        The most recent entries of each unit are cached, such that repeated queries only
+        fetch the entries that were added in the meantime. Like
+        `_query_systemd_service_records`, this blocks and raises on SSH errors.
+        """
+
+        if since is not None:
+            records = self._read_journal(
+                build_journal_command(unit, since=since), limit + 1
+            )
+            return {"records": records[:limit], "has_more": len(records) > limit}
+
+        with self._journal_lock:
+            cache = self._journal_caches.setdefault(unit, JournalCache())
+
+        # The entries are read without holding a lock, such that slow queries do not
+        # hold up others. The cache only merges entries that still fit to its content.
+        if before_cursor is not None:
+            page = cache.before(before_cursor, limit)
+            oldest_cursor = cache.oldest_cursor
+            if page is None and cache.contains(before_cursor) and oldest_cursor:
+                # extend the cache to the past
+                records = self._read_older_journal_records(unit, oldest_cursor, limit)
+                cache.prepend(
+                    records, before=oldest_cursor, has_start=len(records) < limit
+                )
+                page = cache.before(before_cursor, limit)
+            if page is None:
+                records = self._read_older_journal_records(unit, before_cursor, limit)
+                page = {"records": records, "has_more": len(records) == limit}
+            return page
+
+        self._update_journal_cache(unit, cache, limit)
+        if after_cursor is None:
+            return cache.latest(limit)
+
+        page = cache.after(after_cursor, limit)
+        if page is None:
+            records = self._read_journal(
+                build_journal_command(unit, after_cursor=after_cursor), limit + 1
+            )
+            page = {"records": records[:limit], "has_more": len(records) > limit}
+        return page
+
+    def _update_journal_cache(self, unit: str, cache: JournalCache, limit: int) -> None:
+        """Fetches the entries newer than the cached ones. If there are more of them
+        than fit into the cache, only the `limit` most recent entries are kept.
+
+        If another query updated the cache in the meantime, its entries are at least as
+        recent as the ones fetched here, which are thus dropped.
+        """
+
+        newest_cursor = cache.newest_cursor
+        if newest_cursor is not None:
+            records = self._read_journal(
+                build_journal_command(unit, after_cursor=newest_cursor),
+                JOURNAL_CACHE_SIZE + 1,
+            )
+            if len(records) <= JOURNAL_CACHE_SIZE:
+                cache.append(records, after=newest_cursor)
+                return
+
+        records = self._read_journal(build_journal_command(unit, lines=limit))
+        cache.replace(records, has_start=len(records) < limit)
+
+    def _read_older_journal_records(
+        self, unit: str, cursor: str, limit: int
+    ) -> list[JournalRecord]:
+        records = self._read_journal(
+            build_journal_command(unit, after_cursor=cursor, reverse=True), limit
         )
+        records.reverse()
+        return records
 
-        try:
-            _, stdout, _ = self._ssh_client.exec_command(cmd)
-            lines = stdout.readlines()
-
-            for line in lines:
-                match = re.match(systemd_unit_pattern, line)
-                if match is not None:
-                    (
-                        unit,
-                        load_state,
-                        active_state,
-                        sub_state,
-                        description,
-                        tags,
-                    ) = match.groups()
-                    if unit.endswith(".service"):
-                        unit = unit[:-8]
-
-                result: SystemdRecord = {
-                    "hostname": self.hostname,
-                    "unit": unit,
-                    "load_state": load_state,
-                    "active_state": active_state,
-                    "sub_state": sub_state,
-                    "description": description,
-                    "tags": tags.split(", "),
-                }
-                result_list.append(result)
+    def _read_journal(
+        self, command: str, max_records: int | None = None
+    ) -> list[JournalRecord]:
+        # Journal queries might return a lot of data, thus they do not use the polling
+        # connection.
+        client = self._connection_pool.get_client(ConnectionRole.TERMINAL)
+        with metrics.time(
+            SSH_COMMAND_SECONDS, host=self._hostname, operation="journal"
+        ):
+            _, stdout, _ = client.exec_command(command, timeout=self._command_timeout)
+            try:
+                return list(parse_journal_records(stdout, max_records))
+            finally:
+                # stops journalctl if not all entries were read
+                stdout.channel.close()
 
-        except Exception as e:
-            logger.error("An error occurred on host %a: %s", self._hostname, e)
-            self._connected = False
+    def _get_unit_snapshot(self, max_age: float | None = None) -> list[SystemdRecord]:
+        """Returns the tagged systemd units of this host, scanning the host only if the
+        last scan started more than `max_age` seconds ago (by default the snapshot TTL).
+
+        Concurrent calls wait for the scan in flight and reuse its result instead of
+        scanning the host again. Like `_query_systemd_service_records`, this blocks and
+        raises on SSH errors.
+        """
+
+        if max_age is None:
+            max_age = self._snapshot_ttl
+        if self._poll_shard is not None:
+            return self._get_sharded_unit_snapshot(self._poll_shard, max_age)
+        snapshot = self._snapshot
+        with snapshot.lock:
+            if snapshot.is_fresh(max_age):
+                assert snapshot.records is not None
+                return snapshot.records
 
-        return result_list
+            scan_time = time.monotonic()
+            sample_time = time.time()
+            snapshot.records = self._query_systemd_service_records()
+            snapshot.scan_time = scan_time
+            self._telemetry.record(sample_time, snapshot.records)
+            return snapshot.records
+
+    def _get_sharded_unit_snapshot(
+        self, poll_shard: PollShard, max_age: float
+    ) -> list[SystemdRecord]:
+        """Like `_get_unit_snapshot`, but the host is scanned by its poll worker
+        process, see `orchestrator.poll_shards`.
+
+        The snapshot mirrors the records sent by the worker, which only sends the
+        changes since its last reply. Thus the polls of a host are serialized, and all
+        records are requested again after a failed poll.
+        """
+
+        snapshot = self._snapshot
+        with snapshot.lock:
+            if snapshot.change_time >= snapshot.scan_time:
+                # the worker does not know about the pushed changes
+                max_age = 0.0
+            current_records = snapshot.records
+            snapshot.records = None
+            delta = poll_shard.poll(self._hostname, max_age, current_records is None)
+            if delta["records"] is not None:
+                snapshot.records = delta["records"]
+            else:
+                assert current_records is not None
+                changed = {record["unit"]: record for record in delta["changed"]}
+                snapshot.records = (
+                    [changed.get(record["unit"], record) for record in current_records]
+                    if changed
+                    else current_records
+                )
+            snapshot.scan_time = time.monotonic()
+            return snapshot.records
+
+    def _get_unit_telemetry(self, unit: str) -> UnitTelemetry | None:
+        """Returns the recent resource samples of `unit`. Blocks if the host is polled
+        by a worker process."""
+
+        if self._poll_shard is not None:
+            return self._poll_shard.telemetry(self._hostname, unit)
+        return self._telemetry.get(unit)
+
+    def _refresh_unit_records(self, units: list[str]) -> list[SystemdRecord]:
+        """Re-queries the given units with a targeted `systemctl show` and updates them
+        in the snapshot and the telemetry, e.g. after an action changed their state.
+        The snapshot and the telemetry of a sharded host are left to its worker.
+
+        Units that are no tagged service (anymore) are not returned. Blocks and raises
+        on SSH errors.
+        """
+
+        client = self._connection_pool.get_client(ConnectionRole.ACTIONS)
+        sample_time = time.time()
+        with metrics.time(SSH_COMMAND_SECONDS, host=self._hostname, operation="show"):
+            _, stdout, _ = client.exec_command(
+                build_show_units_command(units), timeout=self._command_timeout
+            )
+            records = list(parse_systemd_records(stdout, self._hostname))
+        if self._poll_shard is not None:
+            # the snapshot has to mirror what the worker sent, and the telemetry is
+            # served from the worker
+            return records
+        self._telemetry.record(sample_time, records, complete=False)
+
+        snapshot = self._snapshot
+        with snapshot.lock:
+            if snapshot.records is not None:
+                updated_records = {record["unit"]: record for record in records}
+                snapshot.records = [
+                    updated_records.get(record["unit"], record)
+                    for record in snapshot.records
+                ]
+        return records
+
+    def _query_systemd_service_records(self) -> list[SystemdRecord]:
+        """Lists the tagged systemd units of this host.
+
+        This call blocks until the remote command has finished (or
+        `command_timeout` has passed) and raises on any SSH error. It does not modify
+        the state of the service, so it is safe to be called from a worker thread.
+        """
+
+        client = self._connection_pool.get_client(ConnectionRole.POLLING)
+        metrics.inc(HOST_SCANS, host=self._hostname)
+        with metrics.time(SSH_COMMAND_SECONDS, host=self._hostname, operation="scan"):
+            _, stdout, _ = client.exec_command(
+                LIST_UNITS_COMMAND, timeout=self._command_timeout
+            )
+            return list(parse_systemd_records(stdout, self._hostname))
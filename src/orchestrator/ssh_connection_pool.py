@@ -0,0 +1,153 @@
+import enum
+import logging
+import socket
+import threading
+from pathlib import Path
+
+import paramiko
+from pydantic import SecretStr
+
+from orchestrator.metrics import SSH_RECONNECTS, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionRole(enum.Enum):
+    """The purpose of an SSH connection. Each role uses its own transport, such that
+    e.g. a busy terminal session does not delay the status polling."""
+
+    POLLING = "polling"
+    ACTIONS = "actions"
+    TERMINAL = "terminal"
+
+
+class SSHConnectionPool:
+    """Holds one SSH connection per `ConnectionRole` to a host.
+
+    The connection of the `main_role` (by default the polling connection) is opened
+    by `connect` and tells whether the host is `connected`, the other ones are opened
+    on first use. Connections that were lost are re-opened by `connect` and
+    `get_client`. All methods that open connections are blocking and raise on
+    connection errors. The connections of different roles are opened independently of
+    each other, such that e.g. a slow terminal connection does not delay polling.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        hostname: str,
+        username: str,
+        password: SecretStr | None = None,
+        key_path: Path | None = None,
+        keepalive_interval: int = 30,
+        port: int = 22,
+        main_role: ConnectionRole = ConnectionRole.POLLING,
+    ) -> None:
+        if password is None and key_path is None:
+            raise Exception(
+                "Host configured with neither password not ssh key. Please add "
+                "either to the host configuration."
+            )
+
+        self._hostname = hostname
+        self._username = username
+        self._password = password
+        self._key_path = key_path
+        self._keepalive_interval = keepalive_interval
+        self._port = port
+        self.main_role = main_role
+        self._clients: dict[ConnectionRole, paramiko.SSHClient] = {}
+        self._used_roles: set[ConnectionRole] = set()
+        self._locks = {role: threading.Lock() for role in ConnectionRole}
+        self.reconnect_count = 0
+        """Number of times a connection had to be re-opened after it was lost."""
+
+    @property
+    def connected(self) -> bool:
+        return self._is_active(self.main_role)
+
+    @property
+    def open_connections(self) -> int:
+        return sum(self._is_active(role) for role in ConnectionRole)
+
+    @property
+    def idle_connections(self) -> int:
+        """Number of open connections without any open channel."""
+
+        return sum(
+            self._is_active(role) and self._open_channel_count(role) == 0
+            for role in ConnectionRole
+        )
+
+    def connect(self) -> None:
+        """Opens the main connection and re-opens any other lost connection."""
+
+        for role in ConnectionRole:
+            if role == self.main_role or role in self._used_roles:
+                self.get_client(role)
+
+    def get_client(self, role: ConnectionRole) -> paramiko.SSHClient:
+        """Returns the client of the given role, (re)connecting it if necessary."""
+
+        with self._locks[role]:
+            if not self._is_active(role):
+                if role in self._clients:
+                    self._clients.pop(role).close()
+                self._clients[role] = self._open_client()
+
+                if role in self._used_roles:
+                    self.reconnect_count += 1
+                    metrics.inc(SSH_RECONNECTS, host=self._hostname)
+                    logger.info(
+                        "Reconnected %s connection of %a.", role.value, self._hostname
+                    )
+                self._used_roles.add(role)
+            return self._clients[role]
+
+    def close(self) -> None:
+        for role, lock in self._locks.items():
+            with lock:
+                client = self._clients.pop(role, None)
+                if client is not None:
+                    client.close()
+
+    def _is_active(self, role: ConnectionRole) -> bool:
+        client = self._clients.get(role)
+        if client is None:
+            return False
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _open_channel_count(self, role: ConnectionRole) -> int:
+        transport = self._clients[role].get_transport()
+        if transport is None:
+            return 0
+        # paramiko does not expose the channels of a transport publicly
+        return len(transport._channels.values())  # type: ignore[attr-defined]
+
+    def _open_client(self) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        if self._password is not None:
+            client.connect(
+                self._hostname,
+                port=self._port,
+                username=self._username,
+                password=self._password.get_secret_value(),
+            )
+        else:
+            client.connect(
+                self._hostname,
+                port=self._port,
+                username=self._username,
+                key_filename=str(self._key_path),
+            )
+
+        transport = client.get_transport()
+        if transport is not None:
+            transport.set_keepalive(self._keepalive_interval)
+        if transport is not None and isinstance(transport.sock, socket.socket):
+            # Like OpenSSH, disable Nagle's algorithm. Otherwise, small requests
+            # following each other (e.g. opening a channel and executing a command)
+            # wait for the delayed ACK of the host, which takes up to 40 ms on Linux.
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return client
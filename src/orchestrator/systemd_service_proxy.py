@@ -9,11 +9,16 @@ logger = logging.getLogger(__name__)
 
 
 class ServiceState(enum.Enum):
+    """The `ActiveState` values of systemd units."""
+
     ACTIVE = "active"
     INACTIVE = "inactive"
     FAILED = "failed"
     ACTIVATING = "activating"
     DEACTIVATING = "deactivating"
+    RELOADING = "reloading"
+    MAINTENANCE = "maintenance"
+    REFRESHING = "refreshing"
 
 
 class ManagerAction(enum.Enum):
@@ -66,6 +71,30 @@ class SystemdServiceProxy(pydase.DataService):
     def tags(self) -> list[str]:
         return self._tags
 
+    def _update(
+        self,
+        state: ServiceState | None = None,
+        description: str | None = None,
+        tags: list[str] | None = None,
+    ) -> bool:
+        """Updates the unit information, only touching attributes that changed.
+        Returns whether anything changed."""
+
+        changed = False
+        if state is not None and state != self._state:
+            self._state = state
+            changed = True
+        if description is not None and description != self._description:
+            self._description = description
+            changed = True
+        if tags is not None and tags != self._tags:
+            self._tags = tags
+            changed = True
+        return changed
+
+    # The actions run in the background and return the id of the job tracking them,
+    # see `ServiceHost.unit_jobs`.
+
     @frontend
     def start(self) -> str | None:
         logger.info("Starting %s on %s", self._unit, self._hostname)
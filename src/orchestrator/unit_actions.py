@@ -0,0 +1,73 @@
+"""
+Running a `systemctl` action on several units of a host at once.
+
+`systemctl --user restart a b c` enqueues the jobs of all units in a single call and
+waits for all of them. If any of them fails, the exit status is non-zero and every
+failure is reported on stderr on a line naming the unit, e.g.
+
+    Failed to restart a.service: Unit a.service not found.
+    Job for b.service failed because the control process exited with error code.
+"""
+
+import re
+import shlex
+from typing import TypedDict
+
+from orchestrator.systemd_service_proxy import ManagerAction
+
+
+class UnitActionResult(TypedDict):
+    hostname: str
+    unit: str
+    action: str
+    success: bool
+    message: str
+    """Error reported by systemctl, if the action failed."""
+    state: str
+    """State of the unit after the action, as of the refresh following it."""
+    host_duration: float
+    """Seconds the systemctl call running the action on all selected units of the host
+    took (the jobs of the units are not timed individually)."""
+
+
+def build_unit_action_command(
+    action: ManagerAction, units: list[str], no_block: bool = False
+) -> str:
+    """Returns the systemctl call running `action` on `units`. With `no_block`, it
+    returns as soon as the jobs were enqueued instead of waiting for them."""
+
+    options = "--user --no-block" if no_block else "--user"
+    return f"systemctl {options} {action.value} " + " ".join(
+        shlex.quote(unit) for unit in units
+    )
+
+
+def parse_unit_action_errors(
+    exit_status: int, stderr: str, units: list[str]
+) -> dict[str, str]:
+    """Returns the error message of each unit the action failed on.
+
+    If the command failed without naming any of the units (e.g. the user manager is
+    not running), the action is considered to have failed on all of them.
+    """
+
+    if exit_status == 0:
+        return {}
+
+    errors: dict[str, str] = {}
+    for line in stderr.splitlines():
+        for unit in units:
+            if unit not in errors and _mentions_unit(line, unit):
+                errors[unit] = line.strip()
+
+    if not errors:
+        message = stderr.strip() or f"systemctl exited with status {exit_status}"
+        return {unit: message for unit in units}
+    return errors
+
+
+def _mentions_unit(line: str, unit: str) -> bool:
+    return (
+        re.search(rf"(?<![\w@.-]){re.escape(unit)}(\.service)?(?![\w@.-])", line)
+        is not None
+    )
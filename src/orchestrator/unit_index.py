@@ -0,0 +1,157 @@
+"""
+Inverted index of the units of all service hosts.
+
+The index maps each hostname, tag and state to the keys (`(hostname, unit)`) of the
+matching units. It is updated incrementally whenever a service proxy is created,
+changed or removed, such that filtering units never has to iterate over (and read the
+properties of) all service proxies.
+"""
+
+from collections.abc import Iterable
+from typing import TypedDict
+
+UnitKey = tuple[str, str]
+"""The hostname and name of a unit."""
+
+
+class UnitQueryResult(TypedDict):
+    units: list[UnitKey]
+    """The keys of the matching units, sorted by hostname and unit name."""
+    tag_counts: dict[str, int]
+    """Number of units per tag, among the units matching the hostname and state
+    filters (but not the tag filter)."""
+    state_counts: dict[str, int]
+    """Number of units per state, among the units matching the hostname and tag
+    filters (but not the state filter)."""
+
+
+def _add(index: dict[str, set[UnitKey]], value: str, key: UnitKey) -> None:
+    index.setdefault(value, set()).add(key)
+
+
+def _discard(index: dict[str, set[UnitKey]], value: str, key: UnitKey) -> None:
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+
+def _select(
+    index: dict[str, set[UnitKey]], values: Iterable[str] | None
+) -> set[UnitKey] | None:
+    """Returns the units having any of `values`, or `None` if `values` is empty (i.e.
+    if the dimension is not filtered)."""
+
+    if not values:
+        return None
+    return set[UnitKey]().union(*(index.get(value, ()) for value in values))
+
+
+class UnitIndex:
+    """Maps hostnames, tags and states to the units having them.
+
+    This is no pydase component and has to be used from the event loop thread only,
+    like the service proxies it mirrors.
+    """
+
+    def __init__(self) -> None:
+        self._units: dict[UnitKey, tuple[str, frozenset[str]]] = {}
+        self._by_host: dict[str, set[UnitKey]] = {}
+        self._by_tag: dict[str, set[UnitKey]] = {}
+        self._by_state: dict[str, set[UnitKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def update(self, hostname: str, unit: str, state: str, tags: Iterable[str]) -> None:
+        """Adds the unit, or updates its state and tags if they changed."""
+
+        key = (hostname, unit)
+        new_tags = frozenset(tags)
+        current = self._units.get(key)
+        if current == (state, new_tags):
+            return
+
+        if current is None:
+            _add(self._by_host, hostname, key)
+            old_state, old_tags = None, frozenset[str]()
+        else:
+            old_state, old_tags = current
+        if state != old_state:
+            if old_state is not None:
+                _discard(self._by_state, old_state, key)
+            _add(self._by_state, state, key)
+        for tag in old_tags - new_tags:
+            _discard(self._by_tag, tag, key)
+        for tag in new_tags - old_tags:
+            _add(self._by_tag, tag, key)
+        self._units[key] = (state, new_tags)
+
+    def remove(self, hostname: str, unit: str) -> None:
+        key = (hostname, unit)
+        current = self._units.pop(key, None)
+        if current is None:
+            return
+
+        state, tags = current
+        _discard(self._by_host, hostname, key)
+        _discard(self._by_state, state, key)
+        for tag in tags:
+            _discard(self._by_tag, tag, key)
+
+    def units(self, hostname: str) -> set[str]:
+        """Returns the names of the indexed units of `hostname`."""
+
+        return {unit for _, unit in self._by_host.get(hostname, ())}
+
+    def state(self, hostname: str, unit: str) -> str | None:
+        """Returns the state of the unit, or `None` if it is not indexed."""
+
+        current = self._units.get((hostname, unit))
+        return current[0] if current is not None else None
+
+    def tags(self, hostname: str, unit: str) -> frozenset[str] | None:
+        """Returns the tags of the unit, or `None` if it is not indexed."""
+
+        current = self._units.get((hostname, unit))
+        return current[1] if current is not None else None
+
+    def _intersect(self, *selections: set[UnitKey] | None) -> Iterable[UnitKey]:
+        filtered = sorted((s for s in selections if s is not None), key=len)
+        if not filtered:
+            return self._units
+        return filtered[0].intersection(*filtered[1:])
+
+    def query(
+        self,
+        hostnames: Iterable[str] | None = None,
+        tags: Iterable[str] | None = None,
+        states: Iterable[str] | None = None,
+    ) -> UnitQueryResult:
+        """Returns the units running on any of `hostnames`, having any of `tags` and
+        being in any of `states`. Empty or missing filters match all units.
+
+        The counts per tag and state are faceted, i.e. they ignore the filter of their
+        own dimension, such that they tell how many units a change of that filter
+        would add.
+        """
+
+        by_host = _select(self._by_host, hostnames)
+        by_tag = _select(self._by_tag, tags)
+        by_state = _select(self._by_state, states)
+
+        tag_counts: dict[str, int] = {}
+        for key in self._intersect(by_host, by_state):
+            for tag in self._units[key][1]:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        state_counts: dict[str, int] = {}
+        for key in self._intersect(by_host, by_tag):
+            state = self._units[key][0]
+            state_counts[state] = state_counts.get(state, 0) + 1
+
+        return {
+            "units": sorted(self._intersect(by_host, by_tag, by_state)),
+            "tag_counts": tag_counts,
+            "state_counts": state_counts,
+        }
@@ -0,0 +1,131 @@
+"""
+Tracking of unit actions that run in the background.
+
+Actions are enqueued with `systemctl --user --no-block <action> <unit>`, which returns
+as soon as systemd accepted the job. The job is then watched with
+`systemctl --user list-jobs`, which lists the pending jobs of the unit, e.g.
+
+    1234 web.service start running
+
+Once the unit has no pending job anymore, its state tells whether the action succeeded.
+"""
+
+import enum
+import shlex
+import time
+import uuid
+from collections.abc import Iterable
+
+import pydase
+
+from orchestrator.metrics import UNIT_ACTION_SECONDS, metrics
+from orchestrator.systemd_service_proxy import ManagerAction
+
+UNIT_JOB_TIMEOUT = 900.0
+"""Time in seconds after which a job that did not finish is considered failed."""
+MAX_UNIT_JOBS = 20
+"""Number of jobs kept per host, finished jobs are dropped first."""
+
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class UnitJobError(Exception):
+    """Raised if a job could not be followed until it finished."""
+
+
+class UnitJob(pydase.DataService):
+    """An action on a unit that runs in the background.
+
+    The job is queued until systemd accepted it and running until the unit has no
+    pending job anymore.
+    """
+
+    def __init__(self, hostname: str, unit: str, action: ManagerAction) -> None:
+        super().__init__()
+        self._id = uuid.uuid4().hex[:12]
+        self._hostname = hostname
+        self._unit = unit
+        self._action = action
+        self._status = JobStatus.QUEUED
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+        self._output = ""
+        self._created_at = time.monotonic()
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def hostname(self) -> str:
+        return self._hostname
+
+    @property
+    def unit(self) -> str:
+        return self._unit
+
+    @property
+    def action(self) -> ManagerAction:
+        return self._action
+
+    @property
+    def status(self) -> JobStatus:
+        return self._status
+
+    @property
+    def started_at(self) -> float | None:
+        """Unix timestamp of when systemd accepted the job."""
+        return self._started_at
+
+    @property
+    def finished_at(self) -> float | None:
+        return self._finished_at
+
+    @property
+    def output(self) -> str:
+        """Output of systemctl, or the reason the job failed."""
+        return self._output
+
+    @property
+    def finished(self) -> bool:
+        return self._status in (JobStatus.DONE, JobStatus.FAILED)
+
+    def _set_running(self, output: str) -> None:
+        self._status = JobStatus.RUNNING
+        self._started_at = time.time()
+        self._output = output
+
+    def _finish(self, success: bool, output: str | None = None) -> None:
+        self._status = JobStatus.DONE if success else JobStatus.FAILED
+        self._finished_at = time.time()
+        if output:
+            self._output = output
+        metrics.observe(
+            UNIT_ACTION_SECONDS,
+            time.monotonic() - self._created_at,
+            host=self._hostname,
+            action=self._action.value,
+        )
+
+
+def build_list_jobs_command(unit: str) -> str:
+    return f"systemctl --user list-jobs --no-legend --plain {shlex.quote(unit)}.service"
+
+
+def has_pending_job(lines: Iterable[str], unit: str) -> bool:
+    """Whether the output of `build_list_jobs_command` lists a job of `unit`."""
+
+    return any(f"{unit}.service" in line.split() for line in lines)
+
+
+def action_succeeded(action: ManagerAction, active_state: str) -> bool:
+    """Whether a unit in `active_state` is where `action` should have brought it."""
+
+    if action == ManagerAction.STOP:
+        return active_state in ("inactive", "failed")
+    return active_state == "active"
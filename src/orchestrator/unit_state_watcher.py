@@ -0,0 +1,133 @@
+import json
+import logging
+import re
+import threading
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+UNIT_STATE_WATCH_COMMAND = (
+    "busctl --user monitor --json=short --match="
+    "\"type='signal',sender='org.freedesktop.systemd1',"
+    "interface='org.freedesktop.DBus.Properties',member='PropertiesChanged',"
+    "arg0='org.freedesktop.systemd1.Unit'\""
+)
+"""Streams the systemd unit property changes as one JSON message per line."""
+
+_UNIT_OBJECT_PATH_PREFIX = "/org/freedesktop/systemd1/unit/"
+_ESCAPED_CHARACTER_PATTERN = re.compile(r"_([0-9a-f]{2})")
+
+
+class UnitStateEvent(NamedTuple):
+    unit: str
+    active_state: str
+    sub_state: str | None
+
+
+def unescape_unit_object_path(object_path: str) -> str | None:
+    """Returns the unit name of a systemd unit D-Bus object path.
+
+    systemd escapes every character of the unit name that is not alphanumeric as
+    `_xx`, where `xx` is the hexadecimal character code, e.g.
+    `/org/freedesktop/systemd1/unit/container_2dweb_2eservice` is
+    `container-web.service`.
+    """
+
+    if not object_path.startswith(_UNIT_OBJECT_PATH_PREFIX):
+        return None
+
+    return _ESCAPED_CHARACTER_PATTERN.sub(
+        lambda match: chr(int(match.group(1), 16)),
+        object_path[len(_UNIT_OBJECT_PATH_PREFIX) :],
+    )
+
+
+def parse_unit_state_event(line: str) -> UnitStateEvent | None:
+    """Parses a line of `UNIT_STATE_WATCH_COMMAND` output.
+
+    Returns None for lines that are no ActiveState change of a service unit.
+    """
+
+    try:
+        message: dict[str, Any] = json.loads(line)
+        interface, changed_properties, _ = message["payload"]["data"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if (
+        message.get("member") != "PropertiesChanged"
+        or interface != "org.freedesktop.systemd1.Unit"
+        or "ActiveState" not in changed_properties
+    ):
+        return None
+
+    unit = unescape_unit_object_path(message.get("path", ""))
+    if unit is None or not unit.endswith(".service"):
+        return None
+
+    sub_state = changed_properties.get("SubState")
+    return UnitStateEvent(
+        unit=unit[:-8],
+        active_state=changed_properties["ActiveState"]["data"],
+        sub_state=sub_state["data"] if sub_state is not None else None,
+    )
+
+
+class UnitStateWatcher:
+    """Follows the state changes of the systemd units on a host.
+
+    The watcher runs `command` in a long-lived SSH channel and calls `callback` for
+    each parsed `UnitStateEvent`. As reading from the channel is blocking, this is done
+    in a daemon thread, so `callback` is called from that thread.
+    """
+
+    def __init__(
+        self,
+        ssh_client: paramiko.SSHClient,
+        callback: Callable[[UnitStateEvent], None],
+        command: str = UNIT_STATE_WATCH_COMMAND,
+    ) -> None:
+        self._ssh_client = ssh_client
+        self._callback = callback
+        self._command = command
+        self._channel: paramiko.Channel | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Opens the watcher channel. Raises on SSH errors."""
+
+        _, stdout, _ = self._ssh_client.exec_command(self._command)
+        self._channel = stdout.channel
+        self._thread = threading.Thread(
+            target=self._read_events,
+            args=(stdout,),
+            name="unit-state-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._channel is not None:
+            self._channel.close()
+
+    def _read_events(self, stdout: paramiko.ChannelFile) -> None:
+        try:
+            for line in stdout:
+                event = parse_unit_state_event(line)
+                if event is not None:
+                    self._callback(event)
+        except Exception as e:
+            logger.error("Unit state watcher stopped: %s", e)
+
+        if self._channel is not None and self._channel.exit_status_ready():
+            logger.warning(
+                "Unit state watcher exited with status %s.",
+                self._channel.recv_exit_status(),
+            )
@@ -0,0 +1,144 @@
+"""
+Persistence of the last known units of all hosts.
+
+The units are kept in a single JSON file of the form
+
+    {"version": 1, "hosts": {"<hostname>": [<last seen>, [[<unit>, <state>,
+        <description>, [<tag>, ...]], ...]], ...}}
+
+which is restored on startup, such that the units are shown right away (as stale)
+instead of after every host has been reached. The encoded units of each host are
+cached, so saving only encodes the hosts that changed since the last save. The file is
+replaced atomically, i.e. it is never left half written.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class StoredUnit(NamedTuple):
+    unit: str
+    state: str
+    description: str
+    tags: list[str]
+
+
+class StoredHost(NamedTuple):
+    last_seen: float
+    """Unix timestamp of the last successful refresh of the host."""
+    units: list[StoredUnit]
+
+
+class UnitStore:
+    """The last known units of all hosts, saved to `path`.
+
+    `update`, `touch` and `remove` are cheap and meant to be called from the event
+    loop, while `save` encodes and writes the file and is meant to run in a worker
+    thread.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._last_seen: dict[str, float] = {}
+        self._pending: dict[str, list[Any] | None] = {}
+        """Units changed since the last save (`None` for removed hosts)."""
+        self._encoded: dict[str, str] = {}
+        """Encoded units of each host as of the last save."""
+        self._dirty = False
+
+    @property
+    def dirty(self) -> bool:
+        """Whether units changed since the last save."""
+
+        return self._dirty
+
+    def load(self) -> dict[str, StoredHost]:
+        """Reads the units saved by a previous run. Returns no hosts if the file does
+        not exist or cannot be read."""
+
+        try:
+            data = json.loads(self._path.read_bytes())
+            if data["version"] != FORMAT_VERSION:
+                raise ValueError(f"unsupported version {data['version']!r}")
+            stored_hosts = {
+                hostname: StoredHost(last_seen, [StoredUnit(*row) for row in rows])
+                for hostname, (last_seen, rows) in data["hosts"].items()
+            }
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring unit state file %s: %s", self._path, e)
+            return {}
+
+        with self._lock:
+            for hostname, (last_seen, rows) in data["hosts"].items():
+                # hosts updated in the meantime are more recent
+                if hostname in self._pending or hostname in self._encoded:
+                    continue
+                self._last_seen[hostname] = last_seen
+                # encoded on the next save, unless the host is updated before
+                self._pending[hostname] = rows
+        return stored_hosts
+
+    def update(self, hostname: str, units: list[StoredUnit]) -> None:
+        with self._lock:
+            self._pending[hostname] = units
+            self._dirty = True
+
+    def touch(self, hostname: str, last_seen: float) -> None:
+        """Sets the last seen time of the host. This alone does not make the store
+        dirty, the time is saved along with the next change."""
+
+        with self._lock:
+            self._last_seen[hostname] = last_seen
+
+    def remove(self, hostname: str) -> None:
+        with self._lock:
+            self._last_seen.pop(hostname, None)
+            self._pending[hostname] = None
+            self._dirty = True
+
+    def save(self) -> None:
+        """Writes the units of all hosts to the file. Blocks and raises `OSError` if
+        the file cannot be written."""
+
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                last_seen = dict(self._last_seen)
+                self._dirty = False
+
+            for hostname, units in pending.items():
+                if units is None:
+                    self._encoded.pop(hostname, None)
+                else:
+                    self._encoded[hostname] = json.dumps(units, separators=(",", ":"))
+            content = ",".join(
+                f"{json.dumps(hostname)}:[{last_seen.get(hostname, 0.0)!r},{units}]"
+                for hostname, units in self._encoded.items()
+            )
+
+            try:
+                self._write(f'{{"version":{FORMAT_VERSION},"hosts":{{{content}}}}}')
+            except OSError:
+                self._dirty = True
+                raise
+
+    def _write(self, content: str) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self._path.with_name(f".{self._path.name}.tmp")
+        with temporary_path.open("w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self._path)
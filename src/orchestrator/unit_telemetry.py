@@ -0,0 +1,157 @@
+"""
+Resource telemetry of the units of a host.
+
+The memory usage, CPU time and restart count of each unit are part of the unit listing
+(see `orchestrator.unit_records`), so every scan of a host also samples all of its
+units without any additional remote call. The CPU usage is turned into a rate (in CPU
+cores) from the difference to the previous sample.
+
+The most recent samples of each unit are kept in a fixed-size ring buffer, backed by
+one `array` per quantity instead of a list of objects, such that keeping the history of
+tens of thousands of units stays cheap and sparklines can be served from memory.
+"""
+
+import math
+import threading
+from array import array
+from collections.abc import Iterable
+from typing import TypedDict
+
+from orchestrator.unit_records import SystemdRecord
+
+TELEMETRY_SAMPLES = 60
+"""Default number of samples kept per unit."""
+
+
+class TelemetrySeries(TypedDict):
+    """Samples in chronological order (`None` where a value is unknown)."""
+
+    time: list[float]
+    """Unix timestamps of the scans the samples were taken from."""
+    memory_bytes: list[float | None]
+    cpu_rate: list[float | None]
+    """CPU time consumed per second since the previous sample, i.e. busy cores."""
+    restarts: list[float | None]
+
+
+class UnitTelemetry(TypedDict):
+    main_pid: int | None
+    active_enter_timestamp: str
+    samples: TelemetrySeries
+
+
+def _to_float(value: int | None) -> float:
+    return float(value) if value is not None else math.nan
+
+
+def _to_list(values: Iterable[float]) -> list[float | None]:
+    return [None if math.isnan(value) else value for value in values]
+
+
+class _SampleRing:
+    """The last `size` samples of a unit."""
+
+    __slots__ = (
+        "_cpu_rates",
+        "_last_cpu_usage",
+        "_last_time",
+        "_length",
+        "_memory",
+        "_next",
+        "_restarts",
+        "_times",
+        "active_enter_timestamp",
+        "main_pid",
+    )
+
+    def __init__(self, size: int) -> None:
+        self._times = array("d", [0.0]) * size
+        self._memory = array("d", [math.nan]) * size
+        self._cpu_rates = array("d", [math.nan]) * size
+        self._restarts = array("d", [math.nan]) * size
+        self._next = 0
+        self._length = 0
+        self._last_time = math.nan
+        self._last_cpu_usage = math.nan
+        self.main_pid: int | None = None
+        self.active_enter_timestamp = ""
+
+    def append(self, sample_time: float, record: SystemdRecord) -> None:
+        cpu_usage = _to_float(record["cpu_usage_nsec"])
+        elapsed = sample_time - self._last_time
+        # NaN if a value is unknown, and the usage drops when the unit restarts
+        cpu_rate = math.nan
+        if elapsed > 0:
+            cpu_rate = (cpu_usage - self._last_cpu_usage) / 1e9 / elapsed
+            if not cpu_rate >= 0:
+                cpu_rate = math.nan
+
+        index = self._next
+        self._times[index] = sample_time
+        self._memory[index] = _to_float(record["memory_bytes"])
+        self._cpu_rates[index] = cpu_rate
+        self._restarts[index] = _to_float(record["restarts"])
+        self._next = (index + 1) % len(self._times)
+        self._length = min(self._length + 1, len(self._times))
+        self._last_time = sample_time
+        self._last_cpu_usage = cpu_usage
+        self.main_pid = record["main_pid"]
+        self.active_enter_timestamp = record["active_enter_timestamp"]
+
+    def _ordered(self, values: "array[float]") -> "array[float]":
+        start = (self._next - self._length) % len(values)
+        if start + self._length <= len(values):
+            return values[start : start + self._length]
+        return values[start:] + values[: self._next]
+
+    def series(self) -> TelemetrySeries:
+        return {
+            "time": self._ordered(self._times).tolist(),
+            "memory_bytes": _to_list(self._ordered(self._memory)),
+            "cpu_rate": _to_list(self._ordered(self._cpu_rates)),
+            "restarts": _to_list(self._ordered(self._restarts)),
+        }
+
+
+class TelemetryBuffer:
+    """The recent samples of the units of a host.
+
+    Like `UnitSnapshot`, this is no pydase component: it is written by the worker
+    threads scanning the host and read by the web server.
+    """
+
+    def __init__(self, size: int = TELEMETRY_SAMPLES) -> None:
+        self._size = size
+        self._rings: dict[str, _SampleRing] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, sample_time: float, records: list[SystemdRecord], complete: bool = True
+    ) -> None:
+        """Appends a sample of each unit. If `records` is `complete` (i.e. the result
+        of a full scan), units missing from it are dropped."""
+
+        with self._lock:
+            if complete:
+                units = {record["unit"] for record in records}
+                for unit in self._rings.keys() - units:
+                    del self._rings[unit]
+            for record in records:
+                ring = self._rings.get(record["unit"])
+                if ring is None:
+                    ring = self._rings[record["unit"]] = _SampleRing(self._size)
+                ring.append(sample_time, record)
+
+    def get(self, unit: str) -> UnitTelemetry | None:
+        """Returns the latest process information and the recent samples of `unit`, or
+        `None` if it has not been sampled."""
+
+        with self._lock:
+            ring = self._rings.get(unit)
+            if ring is None:
+                return None
+            return {
+                "main_pid": ring.main_pid,
+                "active_enter_timestamp": ring.active_enter_timestamp,
+                "samples": ring.series(),
+            }
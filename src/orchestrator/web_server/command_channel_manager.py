@@ -1,13 +1,25 @@
 import asyncio
+import codecs
 import enum
 import logging
 from collections.abc import Callable, Coroutine
-from typing import Any
+from typing import Any, ClassVar, Protocol
 
 import paramiko
 
+from orchestrator.metrics import PTY_BYTES, PTY_INPUT_BYTES, TERMINAL_SESSIONS, metrics
+from orchestrator.rate_limit import TokenBucket
+from orchestrator.web_server.input_pipeline import InputPipeline
+from orchestrator.web_server.output_pipeline import OutputPipeline
+
 logger = logging.getLogger(__name__)
 
+RECV_BUFFER_SIZE = 65536
+MAX_READ_SIZE = 256 * 1024
+"""Maximum number of bytes read from a channel per wake-up of the reader."""
+DEFAULT_CHANNEL_ID = "default"
+"""Channel id of the terminal session of clients that do not pass a channel id."""
+
 
 class CommandChannelEvent(enum.Enum):
     PTY_OUTPUT = "pty-output"
@@ -26,6 +38,8 @@ class CommandChannel:
         ],
         terminal_rows: int,
         terminal_cols: int,
+        compress_output: bool = False,
+        input_rate_limit: TokenBucket | None = None,
     ) -> None:
         self.ssh_client = ssh_client
         self.command = command
@@ -37,13 +51,20 @@ class CommandChannel:
             width=self.terminal_cols, height=self.terminal_rows
         )
         self.cmd_task: asyncio.Task[None] | None = None
+        self._output_pipeline = OutputPipeline(
+            lambda payload: self.callback(CommandChannelEvent.PTY_OUTPUT, payload),
+            compress=compress_output,
+        )
+        self._input_pipeline = InputPipeline(
+            self._send_available, rate_limit=input_rate_limit
+        )
         asyncio.create_task(self._async_execute_command())
 
     async def _async_execute_command(self) -> None:
         logger.debug("[Channel %s] Starting command.", self.channel.remote_chanid)
         # empty initial buffer
         await asyncio.sleep(0.1)
-        self.channel.recv(4096).decode(errors="ignore")
+        self._recv_available()
 
         if not self.channel.closed:  # Channel might have been closed already
             # Send the command to the shell session
@@ -55,39 +76,99 @@ class CommandChannel:
             self.cmd_task = asyncio.create_task(self._read_and_forward_ssh_output())
 
     async def _read_and_forward_ssh_output(self) -> None:
+        """Forwards the channel output as soon as it is received.
+
+        The file descriptor of the channel becomes readable whenever paramiko received
+        data (or the channel was closed), which wakes up this task through the event
+        loop. All available data is read at once and decoded incrementally, such that
+        multi-byte characters split across reads are not garbled.
+
+        The output is passed to the `OutputPipeline`. While its buffer is full, the
+        channel is not read, which makes the SSH flow control throttle the remote.
+        """
+
         reason = ""
         logger.debug(
             "[Channel %s] Reading and forwarding ssh output.",
             self.channel.remote_chanid,
         )
+        loop = asyncio.get_running_loop()
+        data_ready = asyncio.Event()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        loop.add_reader(self.channel.fileno(), data_ready.set)
+        flush_output = True
         try:
             while True:
-                await asyncio.sleep(0.1)
-                # Check if there's output to read and forward it
-                if self.channel.recv_ready():
-                    output = self.channel.recv(4096).decode(errors="ignore")
-                    # Send the output back to the client
-
-                    await self.callback(
-                        CommandChannelEvent.PTY_OUTPUT, {"output": output}
-                    )
+                await data_ready.wait()
+                data_ready.clear()
 
+                data = self._recv_available()
+                if data:
+                    metrics.inc(PTY_BYTES, len(data))
                 # Check if the command on the remote has finished
-                if self.channel.exit_status_ready():
+                finished = not data and (
+                    self.channel.exit_status_ready()
+                    or self.channel.closed
+                    or self.channel.eof_received
+                )
+
+                # Send the output back to the client
+                self._output_pipeline.write(
+                    decoder.decode(data, final=finished), len(data)
+                )
+
+                if finished:
                     break
+
+                if self._output_pipeline.full:
+                    loop.remove_reader(self.channel.fileno())
+                    await self._output_pipeline.wait_writable()
+                    loop.add_reader(self.channel.fileno(), data_ready.set)
         except asyncio.CancelledError:
             reason = "Task was cancelled."
+            flush_output = False
         except Exception as e:
             reason = f"An error occured: {e}"
+        finally:
+            loop.remove_reader(self.channel.fileno())
+
+        stats = await self._output_pipeline.close(flush=flush_output)
+        logger.debug(
+            "[Channel %s] Command finished (%s).", self.channel.remote_chanid, stats
+        )
+        await self.callback(
+            CommandChannelEvent.COMMAND_FINISHED, {"reason": reason, "stats": stats}
+        )
 
-        logger.debug("[Channel %s] Command finished.", self.channel.remote_chanid)
-        await self.callback(CommandChannelEvent.COMMAND_FINISHED, {"reason": reason})
+    def _recv_available(self) -> bytes:
+        """Reads the data that was received on the channel (up to `MAX_READ_SIZE`
+        bytes) without blocking."""
+
+        chunks: list[bytes] = []
+        n_bytes = 0
+        while n_bytes < MAX_READ_SIZE and self.channel.recv_ready():
+            chunks.append(self.channel.recv(RECV_BUFFER_SIZE))
+            n_bytes += len(chunks[-1])
+        return b"".join(chunks)
+
+    def _send_available(self, data: bytes) -> int:
+        """Sends as much of `data` as the channel takes without blocking. Returns the
+        number of bytes sent."""
+
+        if self.channel.closed:
+            raise OSError("Channel is closed")
+        if not self.channel.send_ready():
+            return 0
+        n_bytes = self.channel.send(data)
+        metrics.inc(PTY_INPUT_BYTES, n_bytes)
+        return n_bytes
 
     async def send_input_to_channel(self, input_data: dict[str, str]) -> None:
-        """Used to pass keyboard presses to the terminal (e.g. h,j,k,l for scrolling)"""
-        if self.channel and not self.channel.closed and self.channel.send_ready():
-            # Send input to the SSH session
-            self.channel.sendall(input_data["input"].encode())
+        """Used to pass keyboard presses to the terminal (e.g. h,j,k,l for scrolling).
+
+        The input is coalesced with the following keypresses by the `InputPipeline`.
+        """
+        self._input_pipeline.write(input_data["input"])
 
     async def resize_channel_pty(
         self, rows: int | None = None, cols: int | None = None
@@ -117,55 +198,180 @@ class CommandChannel:
     async def close(self) -> None:
         logger.debug("[Channel %s] Close requested.", self.channel.remote_chanid)
         await self._cancel_running_task()
+        await self._output_pipeline.close(flush=False)
+        input_stats = await self._input_pipeline.close()
+        logger.debug("[Channel %s] Input: %s", self.channel.remote_chanid, input_stats)
         await self._close_channel()
 
 
+class TerminalSession(Protocol):
+    """Interface of the terminal sessions held by `CommandChannelManager`."""
+
+    async def send_input_to_channel(self, input_data: dict[str, str]) -> None:
+        ...
+
+    async def resize_channel_pty(
+        self, rows: int | None = None, cols: int | None = None
+    ) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
 class CommandChannelManager:
-    def __init__(
+    """Holds the terminal sessions (see `TerminalSession`) of a single socket.io
+    client.
+
+    The sessions are addressed by a channel id chosen by the client. The events of a
+    session are passed to `callback` with its `channel_id` added to the payload. A
+    session is closed as soon as its command finished, or when a new session with the
+    same channel id is opened.
+
+    The number of open sessions is limited to `max_channels` per client and to
+    `max_total_channels` over all clients. The input of all sessions of the client is
+    limited to `max_input_rate` bytes per second, if set. Sessions being opened when
+    the client disconnects (see `close`) are not opened at all.
+    """
+
+    _total_channel_count: ClassVar[int] = 0
+    """Number of open sessions over all managers."""
+
+    def __init__(  # noqa: PLR0913
         self,
         callback: Callable[
             [CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]
         ],
+        compress_output: bool = False,
+        max_channels: int = 8,
+        max_total_channels: int = 64,
+        max_input_rate: float | None = None,
     ) -> None:
-        self.channel: CommandChannel | None = None
+        self.channels: dict[str, TerminalSession] = {}
         self.terminal_rows = 24
         self.terminal_cols = 80
         self.callback = callback
+        self.compress_output = compress_output
+        self.max_channels = max_channels
+        self.max_total_channels = max_total_channels
+        self._input_rate_limit = (
+            TokenBucket(max_input_rate) if max_input_rate is not None else None
+        )
+        self._closed = False
 
-    async def open_channel_with_command(
+    async def open_channel_with_command(  # noqa: PLR0913
         self,
         ssh_client: paramiko.SSHClient,
         command: str,
         command_args: str,
+        channel_id: str = DEFAULT_CHANNEL_ID,
+        rows: int | None = None,
+        cols: int | None = None,
     ) -> None:
-        if self.channel is not None:
-            await self.channel.close()
-
-        self.channel = CommandChannel(
-            ssh_client=ssh_client,
-            command=command,
-            command_args=command_args,
-            callback=self.callback,
-            terminal_rows=self.terminal_rows,
-            terminal_cols=self.terminal_cols,
+        await self.open_channel(
+            channel_id,
+            lambda callback: CommandChannel(
+                ssh_client=ssh_client,
+                command=command,
+                command_args=command_args,
+                callback=callback,
+                terminal_rows=rows if rows is not None else self.terminal_rows,
+                terminal_cols=cols if cols is not None else self.terminal_cols,
+                compress_output=self.compress_output,
+                input_rate_limit=self._input_rate_limit,
+            ),
         )
 
+    async def open_channel(
+        self,
+        channel_id: str,
+        create_channel: Callable[
+            [Callable[[CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]]],
+            TerminalSession,
+        ],
+    ) -> None:
+        """Opens the session returned by `create_channel`, which is passed the callback
+        the session has to report its events to."""
+
+        await self.close_channel(channel_id)
+        if self._closed:
+            # the client disconnected while the session was being opened
+            return
+
+        if len(self.channels) >= self.max_channels:
+            reason = f"Too many terminal sessions (at most {self.max_channels})."
+        elif CommandChannelManager._total_channel_count >= self.max_total_channels:
+            reason = "Too many terminal sessions open on the server."
+        else:
+            reason = ""
+        if reason:
+            logger.warning("Refused to open terminal session: %s", reason)
+            await self.callback(
+                CommandChannelEvent.COMMAND_FINISHED,
+                {"reason": reason, "stats": None, "channel_id": channel_id},
+            )
+            return
+
+        channel: TerminalSession | None = None
+
+        async def callback(event: CommandChannelEvent, payload: dict[str, Any]) -> None:
+            await self.callback(event, {**payload, "channel_id": channel_id})
+            if event == CommandChannelEvent.COMMAND_FINISHED and channel is not None:
+                self._release_finished_channel(channel_id, channel)
+
+        channel = create_channel(callback)
+        self.channels[channel_id] = channel
+        CommandChannelManager._total_channel_count += 1
+        metrics.set(TERMINAL_SESSIONS, CommandChannelManager._total_channel_count)
+
     async def resize_channel_pty(
-        self, rows: int | None = None, cols: int | None = None
+        self,
+        rows: int | None = None,
+        cols: int | None = None,
+        channel_id: str | None = None,
     ) -> None:
-        if rows is not None:
-            self.terminal_rows = rows
-        if cols is not None:
-            self.terminal_cols = cols
-        if self.channel is not None:
-            await self.channel.resize_channel_pty(rows, cols)
+        """Resizes the terminal of the given session. Without `channel_id`, the size
+        is used for new sessions and the session with the default id is resized."""
 
-    async def send_input_to_channel(self, input_data: dict[str, str]) -> None:
+        if channel_id is None:
+            if rows is not None:
+                self.terminal_rows = rows
+            if cols is not None:
+                self.terminal_cols = cols
+            channel_id = DEFAULT_CHANNEL_ID
+
+        channel = self.channels.get(channel_id)
+        if channel is not None:
+            await channel.resize_channel_pty(rows, cols)
+
+    async def send_input_to_channel(
+        self, input_data: dict[str, str], channel_id: str = DEFAULT_CHANNEL_ID
+    ) -> None:
         """Used to pass keyboard presses to the terminal (e.g. h,j,k,l for scrolling)"""
-        if self.channel is not None:
-            await self.channel.send_input_to_channel(input_data)
+        channel = self.channels.get(channel_id)
+        if channel is not None:
+            await channel.send_input_to_channel(input_data)
+
+    async def close_channel(self, channel_id: str) -> None:
+        channel = self.channels.pop(channel_id, None)
+        if channel is not None:
+            CommandChannelManager._total_channel_count -= 1
+            metrics.set(TERMINAL_SESSIONS, CommandChannelManager._total_channel_count)
+            await channel.close()
 
     async def close(self) -> None:
-        if self.channel is not None:
-            await self.channel.close()
-            self.channel = None
+        """Closes all sessions. No sessions are opened afterwards."""
+
+        self._closed = True
+        for channel_id in list(self.channels):
+            await self.close_channel(channel_id)
+
+    def _release_finished_channel(
+        self, channel_id: str, channel: TerminalSession
+    ) -> None:
+        # The channel might have been closed or replaced in the meantime
+        if self.channels.get(channel_id) is channel:
+            del self.channels[channel_id]
+            CommandChannelManager._total_channel_count -= 1
+            metrics.set(TERMINAL_SESSIONS, CommandChannelManager._total_channel_count)
+            asyncio.create_task(channel.close())
@@ -0,0 +1,127 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable
+from typing import TypedDict
+
+from orchestrator.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+FLUSH_WINDOW = 0.005
+"""Minimum time in seconds between two writes, during which input is coalesced."""
+MAX_WRITE_SIZE = 32 * 1024
+"""Maximum number of bytes passed to the channel in a single write."""
+MAX_BUFFER_SIZE = 256 * 1024
+"""Number of buffered bytes beyond which further input is dropped."""
+SEND_RETRY_INTERVAL = 0.01
+"""Time in seconds after which a write is retried while the channel cannot take
+more data."""
+
+
+class InputPipelineStats(TypedDict):
+    bytes_in: int
+    writes_out: int
+    dropped_bytes: int
+
+
+class InputPipeline:
+    """Coalesces the input of a terminal session into few writes.
+
+    Input passed to `write` is buffered and written to the channel with `send`, at most
+    one write every `FLUSH_WINDOW` seconds. A keystroke after an idle period is thus
+    still written right away, while a held key or a pasted script results in few
+    larger writes instead of one SSH packet per keypress.
+
+    `send` must not block: it returns the number of bytes the channel took, 0 while
+    its window is full (the write is then retried). The writes take their size in
+    tokens from `rate_limit`, which the sessions of a client share. Input that cannot
+    be written as fast as it arrives is buffered up to `MAX_BUFFER_SIZE` bytes and
+    dropped beyond, such that a runaway client cannot hog the SSH transport shared
+    with the other sessions on the host.
+    """
+
+    def __init__(
+        self, send: Callable[[bytes], int], rate_limit: TokenBucket | None = None
+    ) -> None:
+        self._send = send
+        self._rate_limit = rate_limit
+        self._buffer = bytearray()
+        self._last_write_time = 0.0
+        self._overflowing = False
+        self._data_available = asyncio.Event()
+        self._stats: InputPipelineStats = {
+            "bytes_in": 0,
+            "writes_out": 0,
+            "dropped_bytes": 0,
+        }
+        self._sender_task = asyncio.create_task(self._send_input())
+
+    @property
+    def stats(self) -> InputPipelineStats:
+        return self._stats.copy()
+
+    def write(self, data: str) -> None:
+        encoded = data.encode()
+        self._stats["bytes_in"] += len(encoded)
+        if len(self._buffer) + len(encoded) > MAX_BUFFER_SIZE:
+            if not self._overflowing:
+                logger.warning(
+                    "Dropping terminal input, more than %s bytes are pending.",
+                    MAX_BUFFER_SIZE,
+                )
+            self._overflowing = True
+            self._stats["dropped_bytes"] += len(encoded)
+            return
+
+        self._overflowing = False
+        self._buffer += encoded
+        self._data_available.set()
+
+    async def close(self) -> InputPipelineStats:
+        """Stops the pipeline, dropping the pending input. Returns the statistics of
+        the pipeline."""
+
+        self._sender_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._sender_task
+
+        self._stats["dropped_bytes"] += len(self._buffer)
+        self._buffer.clear()
+        return self.stats
+
+    async def _send_input(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._data_available.wait()
+
+            elapsed = loop.time() - self._last_write_time
+            if elapsed < FLUSH_WINDOW:
+                # give more input the chance to arrive
+                await asyncio.sleep(FLUSH_WINDOW - elapsed)
+
+            chunk = bytes(self._buffer[:MAX_WRITE_SIZE])
+            del self._buffer[:MAX_WRITE_SIZE]
+            if not self._buffer:
+                self._data_available.clear()
+
+            if self._rate_limit is not None:
+                await self._rate_limit.acquire(len(chunk))
+            self._last_write_time = loop.time()
+            await self._write(chunk)
+
+    async def _write(self, chunk: bytes) -> None:
+        try:
+            while chunk:
+                n_bytes = self._send(chunk)
+                if n_bytes:
+                    self._stats["writes_out"] += 1
+                    chunk = chunk[n_bytes:]
+                else:
+                    await asyncio.sleep(SEND_RETRY_INTERVAL)
+        except asyncio.CancelledError:
+            self._stats["dropped_bytes"] += len(chunk)
+            raise
+        except Exception as e:
+            logger.warning("Failed to send terminal input: %s", e)
+            self._stats["dropped_bytes"] += len(chunk)
@@ -0,0 +1,44 @@
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from pydase.data_service.data_service_observer import DataServiceObserver
+
+from orchestrator.metrics import metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """Serves the recorded metrics at `/metrics` in the Prometheus text format.
+
+    This is meant to be passed to `pydase.Server` as an additional server, which runs it
+    next to the web server of the service.
+    """
+
+    def __init__(
+        self,
+        data_service_observer: DataServiceObserver,
+        host: str,
+        port: int,
+        **kwargs: Any,
+    ) -> None:
+        self.host = host
+        self.port = port
+
+    async def serve(self) -> None:
+        app = FastAPI()
+
+        @app.get("/metrics")
+        def get_metrics() -> PlainTextResponse:
+            return PlainTextResponse(
+                metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE
+            )
+
+        server = uvicorn.Server(
+            uvicorn.Config(app, host=self.host, port=self.port, log_level="warning")
+        )
+        # pydase handles SIGINT and SIGTERM itself
+        server.install_signal_handlers = lambda: None  # type: ignore[method-assign]
+        await server.serve()
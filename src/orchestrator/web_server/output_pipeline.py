@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import logging
+import zlib
+from collections.abc import Callable, Coroutine
+from typing import Any, TypedDict
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAME_SIZE = 64 * 1024
+"""Maximum number of characters sent in a single frame."""
+MIN_FRAME_INTERVAL = 0.016
+"""Minimum time in seconds between two frames, unless a frame is full."""
+MAX_BUFFER_SIZE = 1024 * 1024
+"""Number of buffered characters at which the producer has to pause."""
+COMPRESSION_THRESHOLD = 16 * 1024
+"""Frames of at least this many characters are deflated, if compression is on."""
+
+
+class OutputPipelineStats(TypedDict):
+    bytes_in: int
+    frames_out: int
+    dropped_bytes: int
+    buffer_high_water_mark: int
+
+
+class OutputPipeline:
+    """Coalesces the output of a terminal session into frames.
+
+    Output passed to `write` is buffered and sent as frames of at most
+    `MAX_FRAME_SIZE` characters, at most one frame every `MIN_FRAME_INTERVAL` seconds
+    (full frames are sent right away). A single keystroke echo after an idle period is
+    thus still sent immediately, while busy output results in few large frames.
+
+    When the frames cannot be sent as fast as the output is produced, the buffer fills
+    up to `MAX_BUFFER_SIZE`. The producer is then expected to pause reading (see
+    `full` and `wait_writable`) until the buffer was drained.
+    """
+
+    def __init__(
+        self,
+        send_frame: Callable[[dict[str, Any]], Coroutine[Any, Any, Any]],
+        compress: bool = False,
+    ) -> None:
+        self._send_frame = send_frame
+        self._compress = compress
+        self._buffer: list[str] = []
+        self._buffer_size = 0
+        self._last_frame_time = 0.0
+        self._closing = False
+        self._data_available = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._stats: OutputPipelineStats = {
+            "bytes_in": 0,
+            "frames_out": 0,
+            "dropped_bytes": 0,
+            "buffer_high_water_mark": 0,
+        }
+        self._sender_task = asyncio.create_task(self._send_frames())
+
+    @property
+    def stats(self) -> OutputPipelineStats:
+        return self._stats.copy()
+
+    @property
+    def full(self) -> bool:
+        return self._buffer_size >= MAX_BUFFER_SIZE
+
+    def write(self, output: str, n_bytes: int) -> None:
+        """Buffers `output`, which was decoded from `n_bytes` bytes."""
+
+        self._stats["bytes_in"] += n_bytes
+        if not output:
+            return
+
+        self._buffer.append(output)
+        self._buffer_size += len(output)
+        self._stats["buffer_high_water_mark"] = max(
+            self._stats["buffer_high_water_mark"], self._buffer_size
+        )
+        self._data_available.set()
+        if self.full:
+            self._writable.clear()
+
+    async def wait_writable(self) -> None:
+        await self._writable.wait()
+
+    async def close(self, flush: bool = True) -> OutputPipelineStats:
+        """Stops the pipeline, sending the buffered output first if `flush` is True.
+        Returns the statistics of the pipeline."""
+
+        if flush:
+            self._closing = True
+            self._data_available.set()
+        else:
+            self._sender_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._sender_task
+
+        self._stats["dropped_bytes"] += len("".join(self._buffer).encode())
+        self._buffer.clear()
+        self._buffer_size = 0
+        self._writable.set()
+        return self.stats
+
+    async def _send_frames(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._data_available.wait()
+            if self._closing and self._buffer_size == 0:
+                return
+
+            elapsed = loop.time() - self._last_frame_time
+            if (
+                not self._closing
+                and self._buffer_size < MAX_FRAME_SIZE
+                and elapsed < MIN_FRAME_INTERVAL
+            ):
+                # give more output the chance to arrive
+                await asyncio.sleep(MIN_FRAME_INTERVAL - elapsed)
+
+            self._last_frame_time = loop.time()
+            await self._send_next_frame()
+
+    async def _send_next_frame(self) -> None:
+        output = "".join(self._buffer)
+        frame, rest = output[:MAX_FRAME_SIZE], output[MAX_FRAME_SIZE:]
+        self._buffer = [rest] if rest else []
+        self._buffer_size = len(rest)
+        if not rest and not self._closing:
+            self._data_available.clear()
+
+        try:
+            if self._compress and len(frame) >= COMPRESSION_THRESHOLD:
+                await self._send_frame(
+                    {"output": zlib.compress(frame.encode()), "compressed": True}
+                )
+            else:
+                await self._send_frame({"output": frame})
+            self._stats["frames_out"] += 1
+        except asyncio.CancelledError:
+            self._stats["dropped_bytes"] += len(frame.encode())
+            raise
+        except Exception as e:
+            logger.warning("Failed to send terminal output: %s", e)
+            self._stats["dropped_bytes"] += len(frame.encode())
+
+        if not self.full:
+            self._writable.set()
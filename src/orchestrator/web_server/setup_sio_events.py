@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import logging
 from typing import Any, TypedDict, cast
 
@@ -7,35 +9,144 @@ import pydase.server.web_server.sio_setup
 import socketio  # type: ignore
 from pydase.data_service.state_manager import StateManager
 
+from orchestrator.config import SystemdServiceOrchestratorConfig
+from orchestrator.journal import JOURNAL_CACHE_SIZE, JOURNAL_PAGE_SIZE, JournalPage
+from orchestrator.metrics import (
+    SOCKETIO_CLIENTS,
+    SOCKETIO_EMIT_SECONDS,
+    SOCKETIO_EMITS,
+    metrics,
+)
+from orchestrator.orchestrator import SystemdServiceOrchestrator
+from orchestrator.ssh_connection_pool import ConnectionRole
+from orchestrator.unit_index import UnitQueryResult
+from orchestrator.unit_telemetry import UnitTelemetry
 from orchestrator.web_server.command_channel_manager import (
+    DEFAULT_CHANNEL_ID,
     CommandChannelEvent,
     CommandChannelManager,
 )
+from orchestrator.web_server.shared_stream_registry import (
+    SharedStreamRegistry,
+    is_shareable_command,
+)
+from orchestrator.web_server.unit_subscriptions import (
+    UNFILTERED_ROOM,
+    UnitSubscription,
+    UnitSubscriptions,
+)
 
 logger = logging.getLogger(__name__)
 
 
-class StartCommand(TypedDict):
+class _TerminalSessionOptions(TypedDict, total=False):
+    channel_id: str
+    rows: int
+    cols: int
+
+
+class StartCommand(_TerminalSessionOptions):
     hostname: str
     username: str
     cmd: str
     cmd_args: str
 
 
-class ResizeChannelDict(TypedDict):
+class ResizeChannelDict(TypedDict, total=False):
     rows: int | None
     cols: int | None
+    channel_id: str
+
+
+class StopCommand(TypedDict):
+    channel_id: str
+
+
+class _JournalQueryOptions(TypedDict, total=False):
+    after_cursor: str
+    before_cursor: str
+    since: str
+    limit: int
+
+
+class JournalQuery(_JournalQueryOptions):
+    hostname: str
+    unit: str
+
+
+class UnitTelemetryQuery(TypedDict):
+    hostname: str
+    unit: str
+
+
+class UnitQuery(TypedDict, total=False):
+    hostnames: list[str]
+    tags: list[str]
+    states: list[str]
 
 
 pydase_setup_sio_events = pydase.server.web_server.sio_setup.setup_sio_events
 
 
-def setup_sio_events(sio: socketio.AsyncServer, state_manager: StateManager) -> None:  # noqa: C901
+def _count_emits(sio: socketio.AsyncServer) -> None:
+    """Records the number and duration of the emits of `sio`, including the state
+    notifications of pydase."""
+
+    emit = sio.emit
+
+    async def counted_emit(event: str, *args: Any, **kwargs: Any) -> Any:
+        metrics.inc(SOCKETIO_EMITS, event=event)
+        with metrics.time(SOCKETIO_EMIT_SECONDS, event=event):
+            return await emit(event, *args, **kwargs)
+
+    sio.emit = counted_emit
+
+
+def _filter_notifications(
+    sio: socketio.AsyncServer, subscriptions: UnitSubscriptions
+) -> None:
+    """Sends the state notifications of pydase to the clients without a subscription
+    and to the subscribed clients concerned by the change only."""
+
+    emit = sio.emit
+
+    async def filtered_emit(
+        event: str, data: Any = None, to: Any = None, room: Any = None, **kwargs: Any
+    ) -> Any:
+        if event != "notify" or to is not None or room is not None:
+            return await emit(event, data, to=to, room=room, **kwargs)
+
+        recipients = subscriptions.recipients(data["data"]["full_access_path"])
+        if recipients is None:
+            return await emit(event, data, **kwargs)
+        await emit(event, data, room=UNFILTERED_ROOM, **kwargs)
+        for sid in recipients:
+            await emit(event, data, to=sid, **kwargs)
+        return None
+
+    sio.emit = filtered_emit
+
+
+def setup_sio_events(sio: socketio.AsyncServer, state_manager: StateManager) -> None:  # noqa: C901, PLR0915
     pydase_setup_sio_events(sio, state_manager)
+    _count_emits(sio)
+    config = SystemdServiceOrchestratorConfig()
+    shared_streams = SharedStreamRegistry()
+    unit_index = cast(SystemdServiceOrchestrator, state_manager.service)._unit_index
+    subscriptions = UnitSubscriptions(unit_index)
+    _filter_notifications(sio, subscriptions)
+    client_count = 0
+    # The managers are looked up on every keypress, which is cheaper than entering the
+    # socket.io session (which copies and saves it back).
+    command_channel_managers: dict[str, CommandChannelManager] = {}
 
     @sio.event  # type: ignore
     async def connect(sid: str, environ: Any) -> None:
+        nonlocal client_count
         logging.debug("Client [%s] connected", click.style(str(sid), fg="cyan"))
+        client_count += 1
+        metrics.set(SOCKETIO_CLIENTS, client_count)
+        await sio.enter_room(sid, UNFILTERED_ROOM)  # type: ignore
 
         async def callback(action: CommandChannelEvent, payload: dict[str, Any]) -> Any:
             if action == CommandChannelEvent.PTY_OUTPUT:
@@ -55,9 +166,14 @@ def setup_sio_events(sio: socketio.AsyncServer, state_manager: StateManager) ->
                     to=sid,
                 )
 
-        command_channel_manager = CommandChannelManager(callback=callback)
-        async with sio.session(sid) as session:  # type: ignore
-            session["command_channel_manager"] = command_channel_manager
+        command_channel_manager = CommandChannelManager(
+            callback=callback,
+            compress_output=config.compress_terminal_output,
+            max_channels=config.max_terminal_sessions_per_client,
+            max_total_channels=config.max_terminal_sessions,
+            max_input_rate=config.max_terminal_input_rate,
+        )
+        command_channel_managers[sid] = command_channel_manager
 
     @sio.event  # type: ignore
     async def start_command(sid: str, data: StartCommand) -> None:
@@ -66,65 +182,174 @@ def setup_sio_events(sio: socketio.AsyncServer, state_manager: StateManager) ->
             click.style(str(sid), fg="cyan"),
             data,
         )
-        async with sio.session(sid) as session:  # type: ignore
-            if "command_channel_manager" in session:
-                command_channel_manager = cast(
-                    CommandChannelManager, session["command_channel_manager"]
-                )
-                service_host = next(
-                    host
-                    for host in state_manager.service.service_hosts
-                    if host.hostname == data["hostname"]
-                )
+        command_channel_manager = command_channel_managers.get(sid)
+        if command_channel_manager is None:
+            return
 
-                sio.start_background_task(  # type: ignore
-                    command_channel_manager.open_channel_with_command,
-                    service_host._ssh_client,
-                    data["cmd"],
-                    data["cmd_args"],
-                )
+        service_host = state_manager.service.service_hosts[data["hostname"]]
+        # Terminal sessions use their own SSH connection, such that heavy
+        # output does not delay the status polling.
+        ssh_client = await asyncio.get_running_loop().run_in_executor(
+            None,
+            service_host._connection_pool.get_client,
+            ConnectionRole.TERMINAL,
+        )
+
+        channel_id = data.get("channel_id", DEFAULT_CHANNEL_ID)
+        rows = data.get("rows", command_channel_manager.terminal_rows)
+        cols = data.get("cols", command_channel_manager.terminal_cols)
+
+        if config.share_log_streams and is_shareable_command(
+            data["cmd"], data["cmd_args"]
+        ):
+            # Clients following the same logs share a single remote session
+            key = (data["hostname"], data["cmd"], data["cmd_args"])
+            sio.start_background_task(  # type: ignore
+                command_channel_manager.open_channel,
+                channel_id,
+                lambda callback: shared_streams.subscribe(
+                    key,
+                    ssh_client,
+                    callback,
+                    rows,
+                    cols,
+                    command_channel_manager.compress_output,
+                ),
+            )
+            return
+
+        sio.start_background_task(  # type: ignore
+            command_channel_manager.open_channel_with_command,
+            ssh_client,
+            data["cmd"],
+            data["cmd_args"],
+            channel_id,
+            rows,
+            cols,
+        )
 
     @sio.event  # type: ignore
-    async def disconnect(sid: str) -> None:
-        logging.debug("Client [%s] disconnected", click.style(str(sid), fg="cyan"))
+    async def stop_command(sid: str, data: StopCommand) -> None:
+        logger.debug(
+            "Client [%s] - stop_command: %s", click.style(str(sid), fg="cyan"), data
+        )
+        command_channel_manager = command_channel_managers.get(sid)
+        if command_channel_manager is not None:
+            await command_channel_manager.close_channel(data["channel_id"])
 
-        # If you stored any information in the Socket.IO session, you can remove it.
-        async with sio.session(sid) as session:  # type: ignore
-            if "command_channel_manager" in session:
-                command_channel_manager = cast(
-                    CommandChannelManager, session["command_channel_manager"]
-                )
+    @sio.event  # type: ignore
+    async def journal_query(
+        sid: str, data: JournalQuery
+    ) -> JournalPage | dict[str, str]:
+        """Returns a page of the journal of a unit, see `ServiceHost._query_journal`."""
+
+        logger.debug(
+            "Client [%s] - journal_query: %s", click.style(str(sid), fg="cyan"), data
+        )
+        service_host = state_manager.service.service_hosts[data["hostname"]]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    service_host._query_journal,
+                    data["unit"],
+                    after_cursor=data.get("after_cursor"),
+                    before_cursor=data.get("before_cursor"),
+                    since=data.get("since"),
+                    limit=min(data.get("limit", JOURNAL_PAGE_SIZE), JOURNAL_CACHE_SIZE),
+                ),
+            )
+        except Exception as e:
+            logger.error(
+                "Querying the journal of %a on %a failed: %s",
+                data["unit"],
+                data["hostname"],
+                e,
+            )
+            return {"error": str(e)}
+
+    @sio.event  # type: ignore
+    async def subscribe(sid: str, data: UnitSubscription) -> list[Any]:
+        """Restricts the state notifications of the client to the given units,
+        hostnames and/or tags (an empty subscription selects no units, see
+        `orchestrator.web_server.unit_subscriptions`) and returns the current
+        serialized state of the subscribed service proxies."""
+
+        logger.debug(
+            "Client [%s] - subscribe: %s", click.style(str(sid), fg="cyan"), data
+        )
+        subscriptions.subscribe(sid, data)
+        await sio.leave_room(sid, UNFILTERED_ROOM)  # type: ignore
+
+        cache = state_manager._data_service_cache
+        return [
+            cache.get_value_dict_from_cache(path)
+            for path in subscriptions.matching_paths(sid)
+        ]
 
-                # Close file descriptor and end the subprocess
-                await command_channel_manager.close()
+    @sio.event  # type: ignore
+    async def unsubscribe(sid: str) -> None:
+        """Restores the notifications of the client about all state changes."""
+
+        logger.debug("Client [%s] - unsubscribe", click.style(str(sid), fg="cyan"))
+        subscriptions.unsubscribe(sid)
+        await sio.enter_room(sid, UNFILTERED_ROOM)  # type: ignore
 
-                # Remove the terminal from the session
-                del session["command_channel_manager"]
-                await sio.save_session(sid, session)  # type: ignore
+    @sio.event  # type: ignore
+    async def query_units(sid: str, data: UnitQuery) -> UnitQueryResult:
+        """Returns the units matching the given hostnames, tags and states, see
+        `UnitIndex.query`."""
+
+        return unit_index.query(
+            hostnames=data.get("hostnames"),
+            tags=data.get("tags"),
+            states=data.get("states"),
+        )
+
+    @sio.event  # type: ignore
+    async def unit_telemetry(
+        sid: str, data: UnitTelemetryQuery
+    ) -> UnitTelemetry | None:
+        """Returns the recent resource samples of a unit, see
+        `orchestrator.unit_telemetry`."""
+
+        service_host = state_manager.service.service_hosts[data["hostname"]]
+        return await asyncio.get_running_loop().run_in_executor(
+            None, service_host._get_unit_telemetry, data["unit"]
+        )
+
+    @sio.event  # type: ignore
+    async def disconnect(sid: str) -> None:
+        nonlocal client_count
+        logging.debug("Client [%s] disconnected", click.style(str(sid), fg="cyan"))
+        client_count -= 1
+        metrics.set(SOCKETIO_CLIENTS, client_count)
+        subscriptions.unsubscribe(sid)
+
+        command_channel_manager = command_channel_managers.pop(sid, None)
+        if command_channel_manager is not None:
+            # Close file descriptor and end the subprocess
+            await command_channel_manager.close()
 
     @sio.event  # type: ignore
     async def pty_input(sid: str, data: dict[str, str]) -> None:
         logger.debug(
             "Client [%s]- pty_input: %s", click.style(str(sid), fg="cyan"), data
         )
-        async with sio.session(sid) as session:  # type: ignore
-            if "command_channel_manager" in session:
-                command_channel_manager = cast(
-                    CommandChannelManager, session["command_channel_manager"]
-                )
-                await command_channel_manager.send_input_to_channel(data)
+        command_channel_manager = command_channel_managers.get(sid)
+        if command_channel_manager is not None:
+            await command_channel_manager.send_input_to_channel(
+                data, data.get("channel_id", DEFAULT_CHANNEL_ID)
+            )
 
     @sio.event  # type: ignore
     async def resize(sid: str, data: ResizeChannelDict):
         logger.debug("Client [%s] - resize: %s", click.style(str(sid), fg="cyan"), data)
-        async with sio.session(sid) as session:  # type: ignore
-            if "command_channel_manager" in session:
-                command_channel_manager = cast(
-                    CommandChannelManager, session["command_channel_manager"]
-                )
-                await command_channel_manager.resize_channel_pty(
-                    data["rows"], data["cols"]
-                )
+        command_channel_manager = command_channel_managers.get(sid)
+        if command_channel_manager is not None:
+            await command_channel_manager.resize_channel_pty(
+                data.get("rows"), data.get("cols"), data.get("channel_id")
+            )
 
 
 def main() -> None:
@@ -0,0 +1,219 @@
+import asyncio
+import collections
+import logging
+import shlex
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import paramiko
+
+from orchestrator.metrics import SHARED_STREAMS, metrics
+from orchestrator.web_server.command_channel_manager import (
+    CommandChannel,
+    CommandChannelEvent,
+)
+from orchestrator.web_server.output_pipeline import OutputPipeline
+
+logger = logging.getLogger(__name__)
+
+SCROLLBACK_SIZE = 256 * 1024
+"""Number of characters of recent output replayed to clients joining a stream."""
+
+SharedStreamKey = tuple[str, str, str]
+"""Hostname, command and command arguments of a shared stream."""
+
+
+def is_shareable_command(command: str, command_args: str) -> bool:
+    """Whether the command only follows logs, such that its output can be shared
+    between all clients running it. Arguments that cannot be parsed (e.g. with
+    unbalanced quotes) are not shared and left to the shell."""
+
+    try:
+        args = shlex.split(command_args)
+    except ValueError:
+        return False
+    follows = "-f" in args or "--follow" in args
+    if command == "journalctl":
+        return follows
+    if command == "podman":
+        return follows and args[:1] == ["logs"]
+    return False
+
+
+class SharedStreamSubscription:
+    """The view of a single client on a `SharedStream`.
+
+    Offers the same interface as `CommandChannel`, such that it can be managed by
+    `CommandChannelManager` alongside regular terminal sessions. Shared streams are
+    read-only, so input and resizing the terminal are ignored.
+    """
+
+    def __init__(
+        self,
+        stream: "SharedStream",
+        callback: Callable[
+            [CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]
+        ],
+        compress_output: bool = False,
+    ) -> None:
+        self.stream = stream
+        self.callback = callback
+        self._finished = False
+        self._output_pipeline = OutputPipeline(
+            lambda payload: self.callback(CommandChannelEvent.PTY_OUTPUT, payload),
+            compress=compress_output,
+        )
+
+    def _write(self, output: str) -> None:
+        self._output_pipeline.write(output, len(output.encode()))
+
+    async def _finish(self, reason: str) -> None:
+        self._finished = True
+        stats = await self._output_pipeline.close(flush=True)
+        await self.callback(
+            CommandChannelEvent.COMMAND_FINISHED, {"reason": reason, "stats": stats}
+        )
+
+    async def send_input_to_channel(self, input_data: dict[str, str]) -> None:
+        pass
+
+    async def resize_channel_pty(
+        self, rows: int | None = None, cols: int | None = None
+    ) -> None:
+        pass
+
+    async def close(self) -> None:
+        await self.stream.unsubscribe(self)
+        await self._output_pipeline.close(flush=False)
+        if not self._finished:
+            self._finished = True
+            await self.callback(CommandChannelEvent.CLOSED, {})
+
+
+class SharedStream:
+    """Runs a command in a single terminal session on the remote and broadcasts its
+    output to all subscriptions.
+
+    The most recent `SCROLLBACK_SIZE` characters of output are kept, such that new
+    subscribers see the same history as the ones that were there from the start. The
+    remote session is closed when the last subscriber left.
+
+    The output is read only as fast as the slowest subscriber can take it (see
+    `OutputPipeline`), which bounds the memory used per subscriber.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        key: SharedStreamKey,
+        ssh_client: paramiko.SSHClient,
+        terminal_rows: int,
+        terminal_cols: int,
+        on_finished: Callable[["SharedStream"], None],
+    ) -> None:
+        self.key = key
+        self._on_finished = on_finished
+        self._subscriptions: set[SharedStreamSubscription] = set()
+        self._scrollback: collections.deque[str] = collections.deque()
+        self._scrollback_size = 0
+        _, command, command_args = key
+        self._channel = CommandChannel(
+            ssh_client=ssh_client,
+            command=command,
+            command_args=command_args,
+            callback=self._handle_event,
+            terminal_rows=terminal_rows,
+            terminal_cols=terminal_cols,
+        )
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(
+        self,
+        callback: Callable[
+            [CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]
+        ],
+        compress_output: bool = False,
+    ) -> SharedStreamSubscription:
+        subscription = SharedStreamSubscription(self, callback, compress_output)
+        subscription._write("".join(self._scrollback))
+        self._subscriptions.add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: SharedStreamSubscription) -> None:
+        self._subscriptions.discard(subscription)
+        if not self._subscriptions:
+            logger.debug("Closing shared stream %s without subscribers.", self.key)
+            self._on_finished(self)
+            await self._channel.close()
+
+    async def _handle_event(
+        self, event: CommandChannelEvent, payload: dict[str, Any]
+    ) -> None:
+        subscriptions = list(self._subscriptions)
+        if event == CommandChannelEvent.PTY_OUTPUT:
+            self._add_to_scrollback(payload["output"])
+            for subscription in subscriptions:
+                subscription._write(payload["output"])
+            # pauses the remote session until every subscriber can take more output
+            await asyncio.gather(
+                *(s._output_pipeline.wait_writable() for s in subscriptions)
+            )
+        elif event == CommandChannelEvent.COMMAND_FINISHED:
+            self._on_finished(self)
+            for subscription in subscriptions:
+                await subscription._finish(payload["reason"])
+        elif event == CommandChannelEvent.CLOSED:
+            for subscription in subscriptions:
+                await subscription.callback(event, payload)
+
+    def _add_to_scrollback(self, output: str) -> None:
+        self._scrollback.append(output)
+        self._scrollback_size += len(output)
+        excess = self._scrollback_size - SCROLLBACK_SIZE
+        while self._scrollback and excess >= len(self._scrollback[0]):
+            excess -= len(self._scrollback.popleft())
+        if excess > 0:
+            self._scrollback[0] = self._scrollback[0][excess:]
+        self._scrollback_size = min(self._scrollback_size, SCROLLBACK_SIZE)
+
+
+class SharedStreamRegistry:
+    """Keeps track of the shared streams of all clients, such that a command that is
+    already running on a host is joined instead of being started again."""
+
+    def __init__(self) -> None:
+        self._streams: dict[SharedStreamKey, SharedStream] = {}
+
+    @property
+    def streams(self) -> dict[SharedStreamKey, SharedStream]:
+        return self._streams.copy()
+
+    def subscribe(  # noqa: PLR0913
+        self,
+        key: SharedStreamKey,
+        ssh_client: paramiko.SSHClient,
+        callback: Callable[
+            [CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]
+        ],
+        terminal_rows: int,
+        terminal_cols: int,
+        compress_output: bool = False,
+    ) -> SharedStreamSubscription:
+        """Subscribes to the stream of `key`, starting it if it is not running."""
+
+        stream = self._streams.get(key)
+        if stream is None:
+            logger.debug("Starting shared stream %s.", key)
+            stream = SharedStream(
+                key, ssh_client, terminal_rows, terminal_cols, self._remove
+            )
+            self._streams[key] = stream
+            metrics.set(SHARED_STREAMS, len(self._streams))
+        return stream.subscribe(callback, compress_output)
+
+    def _remove(self, stream: SharedStream) -> None:
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+            metrics.set(SHARED_STREAMS, len(self._streams))
@@ -0,0 +1,127 @@
+"""
+Per-client subscriptions to a subset of the units of the service hosts.
+
+By default, clients are notified about every state change of the orchestrator. Once a
+client subscribed, it is only notified about the changes below
+`service_proxies["<unit>"]` of the units it selected: the units listed in the
+subscription (e.g. the rows the client displays) and the units matching its hostnames
+and tags. An empty subscription selects no units.
+
+The other changes below `service_hosts["<hostname>"]` (e.g. the readiness of a host,
+units appearing or changing their tags) are sent to all subscribers of the host, such
+that clients learn about units entering or leaving their selection. Changes outside of
+`service_hosts` are sent to all clients.
+"""
+
+import re
+from typing import TypedDict
+
+from orchestrator.unit_index import UnitIndex, UnitKey
+
+UNFILTERED_ROOM = "unfiltered-notifications"
+"""The socket.io room of the clients without a subscription."""
+
+_HOST_PATH_PATTERN = re.compile(
+    r'^service_hosts\["(?P<hostname>[^"]*)"\]'
+    r'(?:\.service_proxies\["(?P<unit>[^"]*)"\](?P<attribute>\.tags$|$)?)?'
+)
+
+
+class UnitSubscription(TypedDict, total=False):
+    hostnames: list[str]
+    """Selects all units of these hosts (restricted to `tags`, if given)."""
+    tags: list[str]
+    """Selects all units having any of these tags (restricted to `hostnames`, if
+    given)."""
+    units: list[UnitKey]
+    """Selects these units, given by hostname and unit name."""
+
+
+class _Filter:
+    __slots__ = ("hostnames", "tags", "units")
+
+    def __init__(self, subscription: UnitSubscription) -> None:
+        self.hostnames = frozenset(subscription.get("hostnames") or ())
+        self.tags = frozenset(subscription.get("tags") or ())
+        self.units = frozenset(
+            (hostname, unit) for hostname, unit in subscription.get("units") or ()
+        )
+
+    def matches_host(self, hostname: str) -> bool:
+        return not self.hostnames or hostname in self.hostnames
+
+    def matches_unit(self, hostname: str, unit: str, tags: frozenset[str]) -> bool:
+        if (hostname, unit) in self.units:
+            return True
+        if not self.hostnames and not self.tags:
+            return False
+        return self.matches_host(hostname) and (
+            not self.tags or not self.tags.isdisjoint(tags)
+        )
+
+
+class UnitSubscriptions:
+    """The subscriptions of the connected clients, by session id."""
+
+    def __init__(self, unit_index: UnitIndex) -> None:
+        self._unit_index = unit_index
+        self._filters: dict[str, _Filter] = {}
+
+    def subscribe(self, sid: str, subscription: UnitSubscription) -> None:
+        """Replaces the subscription of the client `sid`."""
+
+        self._filters[sid] = _Filter(subscription)
+
+    def unsubscribe(self, sid: str) -> None:
+        self._filters.pop(sid, None)
+
+    def matching_paths(self, sid: str) -> list[str]:
+        """Returns the access paths of the service proxies `sid` is subscribed to."""
+
+        unit_filter = self._filters.get(sid)
+        if unit_filter is None:
+            return []
+        units = {
+            key for key in unit_filter.units if self._unit_index.tags(*key) is not None
+        }
+        if unit_filter.hostnames or unit_filter.tags:
+            units.update(
+                self._unit_index.query(
+                    hostnames=unit_filter.hostnames, tags=unit_filter.tags
+                )["units"]
+            )
+        return [
+            f'service_hosts["{hostname}"].service_proxies["{unit}"]'
+            for hostname, unit in sorted(units)
+        ]
+
+    def recipients(self, full_access_path: str) -> list[str] | None:
+        """Returns the subscribed clients to notify about a change at
+        `full_access_path`, or `None` if all clients are to be notified.
+
+        The clients without a subscription (see `UNFILTERED_ROOM`) are always notified.
+        """
+
+        if not self._filters:
+            return None
+        match = _HOST_PATH_PATTERN.match(full_access_path)
+        if match is None:
+            return None
+
+        hostname, unit = match["hostname"], match["unit"]
+        tags = None
+        # Added units and changed tags are sent to all subscribers of the host, such
+        # that clients can tell whether the unit entered or left their selection.
+        if unit is not None and match["attribute"] is None:
+            tags = self._unit_index.tags(hostname, unit)
+        if tags is None:
+            return [
+                sid
+                for sid, unit_filter in self._filters.items()
+                if unit_filter.matches_host(hostname)
+            ]
+        return [
+            sid
+            for sid, unit_filter in self._filters.items()
+            if unit_filter.matches_unit(hostname, unit, tags)
+        ]
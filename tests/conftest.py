@@ -0,0 +1,11 @@
+from collections.abc import Iterator
+
+import pytest
+
+from benchmarks.fake_systemd_host import FakeSystemdHost
+
+
+@pytest.fixture
+def fake_host() -> Iterator[FakeSystemdHost]:
+    with FakeSystemdHost(n_units=5) as host:
+        yield host
@@ -0,0 +1,159 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from orchestrator.web_server.command_channel_manager import (
+    CommandChannelEvent,
+    CommandChannelManager,
+)
+
+Callback = Callable[[CommandChannelEvent, dict[str, Any]], Coroutine[Any, Any, Any]]
+
+
+class FakeSession:
+    def __init__(self, callback: Callback, close_delay: float = 0.0) -> None:
+        self.callback = callback
+        self.close_delay = close_delay
+        self.closed = False
+
+    async def send_input_to_channel(self, input_data: dict[str, str]) -> None:
+        pass
+
+    async def resize_channel_pty(
+        self, rows: int | None = None, cols: int | None = None
+    ) -> None:
+        pass
+
+    async def close(self) -> None:
+        await asyncio.sleep(self.close_delay)
+        self.closed = True
+
+
+class Client:
+    def __init__(self, **options: Any) -> None:
+        self.events: list[tuple[CommandChannelEvent, dict[str, Any]]] = []
+        self.sessions: list[FakeSession] = []
+        self.manager = CommandChannelManager(self.callback, **options)
+
+    async def callback(
+        self, event: CommandChannelEvent, payload: dict[str, Any]
+    ) -> None:
+        self.events.append((event, payload))
+
+    async def open(self, channel_id: str, close_delay: float = 0.0) -> None:
+        def create_session(callback: Callback) -> FakeSession:
+            session = FakeSession(callback, close_delay)
+            self.sessions.append(session)
+            return session
+
+        await self.manager.open_channel(channel_id, create_session)
+
+    @property
+    def refusals(self) -> list[str]:
+        return [
+            payload["reason"]
+            for event, payload in self.events
+            if event == CommandChannelEvent.COMMAND_FINISHED
+            and payload["stats"] is None
+        ]
+
+
+def total_channel_count() -> int:
+    return CommandChannelManager._total_channel_count
+
+
+def test_sessions_per_client_are_limited() -> None:
+    start_count = total_channel_count()
+
+    async def run() -> None:
+        client = Client(max_channels=2)
+        await client.open("a")
+        await client.open("b")
+        await client.open("c")
+        assert set(client.manager.channels) == {"a", "b"}
+        assert client.refusals == ["Too many terminal sessions (at most 2)."]
+        assert total_channel_count() == start_count + 2
+
+        # reopening a channel id replaces its session
+        await client.open("a")
+        assert client.sessions[0].closed
+        assert len(client.manager.channels) == 2
+        assert total_channel_count() == start_count + 2
+
+        await client.manager.close()
+
+    asyncio.run(run())
+    assert total_channel_count() == start_count
+
+
+def test_sessions_over_all_clients_are_limited() -> None:
+    start_count = total_channel_count()
+
+    async def run() -> None:
+        client = Client(max_total_channels=start_count + 2)
+        other_client = Client(max_total_channels=start_count + 2)
+        await client.open("a")
+        await other_client.open("a")
+        await other_client.open("b")
+        assert other_client.refusals == [
+            "Too many terminal sessions open on the server."
+        ]
+
+        await client.manager.close_channel("a")
+        await other_client.open("b")
+        assert set(other_client.manager.channels) == {"a", "b"}
+
+        await client.manager.close()
+        await other_client.manager.close()
+
+    asyncio.run(run())
+    assert total_channel_count() == start_count
+
+
+def test_finished_sessions_are_released() -> None:
+    start_count = total_channel_count()
+
+    async def run() -> None:
+        client = Client()
+        await client.open("a")
+        session = client.sessions[0]
+
+        # e.g. the command failed
+        await session.callback(
+            CommandChannelEvent.COMMAND_FINISHED, {"reason": "error", "stats": {}}
+        )
+        assert client.manager.channels == {}
+        assert total_channel_count() == start_count
+        assert client.events[-1][1]["channel_id"] == "a"
+        await asyncio.sleep(0.01)
+        assert session.closed
+
+        # the session reports its end once more when it is closed
+        await session.callback(
+            CommandChannelEvent.COMMAND_FINISHED, {"reason": "", "stats": {}}
+        )
+        assert total_channel_count() == start_count
+
+    asyncio.run(run())
+
+
+def test_no_sessions_are_opened_after_the_client_disconnected() -> None:
+    start_count = total_channel_count()
+
+    async def run() -> None:
+        client = Client()
+        await client.open("a", close_delay=0.05)
+        # the old session of the channel id is still being closed on disconnect
+        opening = asyncio.create_task(client.open("a"))
+        await asyncio.sleep(0.01)
+        await client.manager.close()
+        await opening
+
+        # e.g. the SSH client of the session was connected after the disconnect
+        await client.open("b")
+
+        assert client.manager.channels == {}
+        assert len(client.sessions) == 1
+
+    asyncio.run(run())
+    assert total_channel_count() == start_count
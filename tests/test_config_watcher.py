@@ -0,0 +1,134 @@
+import asyncio
+from pathlib import Path
+
+import confz
+from orchestrator.config import ServiceHostConfig, SystemdServiceOrchestratorConfig
+from orchestrator.config_watcher import (
+    ConfigWatcher,
+    HostConfigChanges,
+    diff_host_configs,
+)
+from orchestrator.poll_scheduler import PollOutcome
+from orchestrator.service_host import HostReadiness
+from orchestrator.systemd_service_proxy import ServiceState
+
+from benchmarks.bench_scenarios import connected, create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+from tests.utils import wait_until
+
+
+def host_config(hostname: str, **settings: object) -> ServiceHostConfig:
+    settings = {"username": "test", "password": "-", **settings}
+    return ServiceHostConfig(hostname=hostname, **settings)
+
+
+def test_hosts_are_compared_by_hostname() -> None:
+    current = {
+        "a": host_config("a"),
+        "b": host_config("b"),
+        "c": host_config("c"),
+        "d": host_config("d"),
+    }
+    new = {
+        "a": host_config("a"),
+        # only the credentials changed
+        "b": host_config("b", password="new"),
+        "d": host_config("d", port=2222),
+        "e": host_config("e"),
+    }
+
+    changes = diff_host_configs(current, new)
+
+    assert changes.added == [new["e"]]
+    assert changes.removed == ["c"]
+    assert changes.changed == [new["b"], new["d"]]
+    assert diff_host_configs(new, new) == HostConfigChanges([], [], [])
+
+
+def test_changes_of_the_config_file_are_reported(tmp_path: Path) -> None:
+    path = tmp_path / "config.yaml"
+    path.write_text("service_hosts:\n- {hostname: a, username: test, password: '-'}\n")
+    with SystemdServiceOrchestratorConfig.change_config_sources(
+        confz.FileSource(file=path)
+    ):
+        watcher = ConfigWatcher(path, SystemdServiceOrchestratorConfig())
+    assert watcher.check() is None
+
+    path.write_text("service_hosts:\n- {hostname: b, username: test, password: '-'}\n")
+    assert watcher.check() == HostConfigChanges([host_config("b")], ["a"], [])
+    assert watcher.check() is None
+
+    # invalid files are ignored, the next valid one is compared to the last valid one
+    path.write_text("service_hosts:\n- {hostname: c}\n")
+    assert watcher.check() is None
+    path.write_text("service_hosts: []\n")
+    assert watcher.check() == HostConfigChanges([], ["b"], [])
+
+
+def test_only_changed_hosts_are_touched() -> None:
+    with (
+        FakeSystemdHost(n_units=5) as moved_host,
+        FakeSystemdHost(n_units=5, host="127.0.0.2") as removed_host,
+        FakeSystemdHost(n_units=5, host="127.0.0.3") as kept_host,
+        FakeSystemdHost(n_units=5, host="127.0.0.4") as added_host,
+    ):
+        # the first and the last host are polled by the first worker, the removed one
+        # by the second worker
+        service = create_orchestrator(
+            [moved_host, removed_host, kept_host], poll_worker_processes=2
+        )
+        first_shard, second_shard = service._poll_shards._shards
+        hosts = dict(service.service_hosts)
+        kept_pool = hosts[kept_host.host]._connection_pool
+
+        async def run() -> None:
+            async with connected(service):
+                service._apply_host_config_changes(
+                    HostConfigChanges(
+                        added=[host_config(added_host.host, port=added_host.port)],
+                        removed=[removed_host.host],
+                        changed=[
+                            host_config(
+                                moved_host.host, port=moved_host.port, username="new"
+                            )
+                        ],
+                    )
+                )
+                assert set(service.service_hosts) == {
+                    moved_host.host,
+                    kept_host.host,
+                    added_host.host,
+                }
+                assert not hosts[removed_host.host].connected
+                assert service._unit_index.units(removed_host.host) == set()
+                assert service.service_hosts[kept_host.host] is hosts[kept_host.host]
+                assert hosts[kept_host.host]._connection_pool is kept_pool
+
+                # the changed host moved to the worker the removed host left
+                moved = service.service_hosts[moved_host.host]
+                assert moved is hosts[moved_host.host]
+                assert moved._poll_shard is second_shard
+                assert service._poll_shards.get(moved_host.host) is second_shard
+                assert moved_host.host not in first_shard.hostnames
+                assert service._poll_shards.get(added_host.host) is first_shard
+
+                await wait_until(lambda: moved.connected)
+                moved_host.set_state(unit_name(0), "failed", "failed")
+                assert await service._poll_host(moved) == PollOutcome.CHANGED
+                assert moved.service_proxies[unit_name(0)].state == ServiceState.FAILED
+
+                added = service.service_hosts[added_host.host]
+                await wait_until(lambda: added.readiness == HostReadiness.READY)
+                assert set(added.service_proxies) == set(added_host.units)
+
+        try:
+            asyncio.run(asyncio.wait_for(run(), 20.0))
+        finally:
+            for host in hosts.values():
+                host._connection_pool.close()
+            for host in service.service_hosts.values():
+                host._connection_pool.close()
+            for shard in service._poll_shards._shards:
+                shard._process.terminate()
+            service._executor.shutdown()
+            service._action_executor.shutdown()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+from orchestrator.rate_limit import TokenBucket
+from orchestrator.web_server.input_pipeline import (
+    MAX_BUFFER_SIZE,
+    MAX_WRITE_SIZE,
+    InputPipeline,
+)
+
+
+class FakeChannel:
+    def __init__(self, window: int | None = None) -> None:
+        self.window = window
+        """Number of bytes taken per write (all if None)."""
+        self.writes: list[bytes] = []
+        self.send_ready = True
+
+    def send(self, data: bytes) -> int:
+        if not self.send_ready:
+            return 0
+        chunk = data[: self.window] if self.window is not None else data
+        self.writes.append(chunk)
+        return len(chunk)
+
+    @property
+    def received(self) -> bytes:
+        return b"".join(self.writes)
+
+
+def test_keystrokes_are_coalesced() -> None:
+    async def run() -> None:
+        channel = FakeChannel()
+        pipeline = InputPipeline(channel.send)
+
+        # the first keystroke after an idle period is written right away
+        pipeline.write("l")
+        await asyncio.sleep(0.001)
+        assert channel.writes == [b"l"]
+
+        for key in "ssh":
+            pipeline.write(key)
+        await asyncio.sleep(0.02)
+        stats = await pipeline.close()
+
+        assert channel.writes == [b"l", b"ssh"]
+        assert stats == {"bytes_in": 4, "writes_out": 2, "dropped_bytes": 0}
+
+    asyncio.run(run())
+
+
+def test_writes_are_retried_until_the_channel_takes_them() -> None:
+    async def run() -> None:
+        channel = FakeChannel(window=MAX_WRITE_SIZE // 2)
+        channel.send_ready = False
+        pipeline = InputPipeline(channel.send)
+
+        data = "x" * (MAX_WRITE_SIZE + 1)
+        pipeline.write(data)
+        await asyncio.sleep(0.02)
+        assert channel.writes == []
+
+        channel.send_ready = True
+        await asyncio.sleep(0.05)
+        stats = await pipeline.close()
+
+        assert channel.received == data.encode()
+        # a full chunk takes two partial writes, the last byte one more
+        assert stats["writes_out"] == 3
+
+    asyncio.run(run())
+
+
+def test_input_beyond_the_buffer_is_dropped() -> None:
+    async def run() -> None:
+        channel = FakeChannel()
+        channel.send_ready = False
+        pipeline = InputPipeline(channel.send)
+
+        pipeline.write("x" * MAX_BUFFER_SIZE)
+        pipeline.write("y")
+        stats = await pipeline.close()
+
+        assert stats["bytes_in"] == MAX_BUFFER_SIZE + 1
+        assert stats["dropped_bytes"] == MAX_BUFFER_SIZE + 1
+        assert channel.writes == []
+
+    asyncio.run(run())
+
+
+def test_input_is_rate_limited() -> None:
+    async def run() -> float:
+        channel = FakeChannel()
+        pipeline = InputPipeline(channel.send, rate_limit=TokenBucket(rate=1000.0))
+
+        pipeline.write("x" * 1200)
+        await asyncio.sleep(0.01)
+        assert len(channel.received) == 1200
+
+        start = time.perf_counter()
+        pipeline.write("y" * 100)
+        while len(channel.received) < 1300:
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        await pipeline.close()
+        return elapsed
+
+    # the first write takes more tokens than the burst of 1000 bytes, thus the second
+    # one waits until 200 + 100 bytes are refilled
+    assert 0.25 <= asyncio.run(run()) < 1.0
+
+
+def test_failed_writes_are_counted_as_dropped() -> None:
+    async def run() -> None:
+        def fail(data: bytes) -> int:
+            raise OSError("Channel is closed")
+
+        pipeline = InputPipeline(fail)
+        pipeline.write("lost")
+        await asyncio.sleep(0.01)
+        stats = await pipeline.close()
+
+        assert stats == {"bytes_in": 4, "writes_out": 0, "dropped_bytes": 4}
+
+    asyncio.run(run())
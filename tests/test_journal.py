@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from orchestrator.journal import JournalCache, JournalRecord
+
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+from tests.test_service_host import create_host
+
+
+def records(start: int, stop: int) -> list[JournalRecord]:
+    return [
+        {
+            "cursor": f"c{index}",
+            "timestamp": float(index),
+            "priority": 6,
+            "identifier": "test",
+            "pid": None,
+            "message": f"message {index}",
+        }
+        for index in range(start, stop)
+    ]
+
+
+def cursors(page: dict | None) -> list[str]:
+    assert page is not None
+    return [record["cursor"] for record in page["records"]]
+
+
+def test_cache_appends_newer_entries() -> None:
+    cache = JournalCache(max_size=5)
+    cache.replace(records(0, 3), has_start=True)
+
+    assert cache.append(records(3, 5), after="c2")
+    assert cursors(cache.latest(10)) == ["c0", "c1", "c2", "c3", "c4"]
+    assert not cache.latest(10)["has_more"]
+
+    # the oldest entries are dropped beyond the maximum size
+    assert cache.append(records(5, 7), after="c4")
+    assert cache.oldest_cursor == "c2"
+    assert cache.newest_cursor == "c6"
+    assert cache.latest(10)["has_more"]
+
+
+def test_cache_drops_entries_fetched_before_a_concurrent_update() -> None:
+    cache = JournalCache()
+    cache.replace(records(0, 3), has_start=True)
+
+    # another query appended the same entries in the meantime
+    assert cache.append(records(3, 5), after="c2")
+    assert not cache.append(records(3, 5), after="c2")
+    assert cursors(cache.latest(10)) == ["c0", "c1", "c2", "c3", "c4"]
+
+    assert not cache.prepend(records(0, 2), before="c5", has_start=True)
+
+
+def test_cache_prepends_older_entries_while_there_is_room() -> None:
+    cache = JournalCache(max_size=6)
+    cache.replace(records(4, 8), has_start=False)
+    assert cache.before("c5", 2) is None
+
+    assert cache.prepend(records(2, 4), before="c4", has_start=False)
+    assert cursors(cache.before("c5", 2)) == ["c3", "c4"]
+    assert not cache.prepend(records(0, 2), before="c2", has_start=True)
+    assert cache.oldest_cursor == "c2"
+
+
+def test_cache_pages_around_a_cursor() -> None:
+    cache = JournalCache()
+    cache.replace(records(0, 10), has_start=True)
+
+    page = cache.after("c6", 2)
+    assert cursors(page) == ["c7", "c8"]
+    assert page is not None and page["has_more"]
+    assert cache.after("unknown", 2) is None
+
+    page = cache.before("c3", 5)
+    assert cursors(page) == ["c0", "c1", "c2"]
+    assert page is not None and not page["has_more"]
+
+
+def test_query_journal_updates_the_cache_incrementally() -> None:
+    with FakeSystemdHost(n_units=1, journal_entries=300) as fake_host:
+        host = create_host(fake_host)
+        unit = unit_name(0)
+        try:
+            page = host._query_journal(unit, limit=100)
+            assert len(page["records"]) == 100
+            assert page["records"][-1]["message"].startswith("Log message number 299")
+
+            fake_host.journal_entries = 310
+            with ThreadPoolExecutor(4) as executor:
+                pages = list(
+                    executor.map(
+                        lambda _: host._query_journal(unit, limit=20), range(4)
+                    )
+                )
+            for page in pages:
+                assert [record["timestamp"] for record in page["records"]] == sorted(
+                    record["timestamp"] for record in page["records"]
+                )
+            latest = host._query_journal(unit, limit=20)
+            assert latest["records"][-1]["message"].startswith("Log message number 309")
+            assert len({record["cursor"] for record in latest["records"]}) == 20
+
+            older = host._query_journal(
+                unit, before_cursor=latest["records"][0]["cursor"], limit=100
+            )
+            assert older["records"][-1]["message"].startswith("Log message number 289")
+        finally:
+            host._connection_pool.close()
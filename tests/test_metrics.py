@@ -0,0 +1,64 @@
+from typing import Any
+
+import pytest
+from orchestrator.metrics import MetricsRegistry, MetricsService, _update_dict
+from pydase.data_service.data_service_observer import DataServiceObserver
+from pydase.data_service.state_manager import StateManager
+
+
+class RecordingDict(dict[str, Any]):
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.assigned: list[str] = []
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.assigned.append(key)
+        super().__setitem__(key, value)
+
+
+def test_label_values_are_escaped() -> None:
+    registry = MetricsRegistry()
+    registry.inc("orchestrator_parse_failures_total", parser='a"b\\c\nd')
+
+    assert (
+        'orchestrator_parse_failures_total{parser="a\\"b\\\\c\\nd"} 1.0'
+        in registry.render_prometheus().splitlines()
+    )
+
+
+def test_update_dict_assigns_changed_keys_only() -> None:
+    target = RecordingDict({"a": 1.0, "b": 2.0, "removed": 3.0})
+    _update_dict(target, {"a": 1.0, "b": 5.0, "added": 0.0})
+
+    assert target == {"a": 1.0, "b": 5.0, "added": 0.0}
+    assert target.assigned == ["b", "added"]
+
+
+def test_update_dict_recurses_into_nested_dicts() -> None:
+    nested = RecordingDict({"count": 1, "mean": 0.5})
+    target = RecordingDict({"latency": nested})
+    _update_dict(target, {"latency": {"count": 2, "mean": 0.5}})
+
+    assert target.assigned == []
+    assert nested.assigned == ["count"]
+    assert target == {"latency": {"count": 2, "mean": 0.5}}
+
+
+def test_metrics_service_updates_in_place(caplog: pytest.LogCaptureFixture) -> None:
+    service = MetricsService()
+    DataServiceObserver(StateManager(service))
+
+    # new series replace the summary
+    service._update_summary("counters", {"x": 1.0})
+    service._update_summary("counters", {"x": 1.0, "z": 0.0})
+    service._update_summary("latencies", {"y": {"count": 1, "p50": 0.1}})
+    counters = service.counters
+    latencies = service.latencies
+    service._update_summary("counters", {"x": 2.0, "z": 0.0})
+    service._update_summary("latencies", {"y": {"count": 2, "p50": 0.1}})
+
+    assert service.counters is counters
+    assert service.latencies is latencies
+    assert service.counters == {"x": 2.0, "z": 0.0}
+    assert service.latencies == {"y": {"count": 2, "p50": 0.1}}
+    assert not [record for record in caplog.records if record.levelname == "WARNING"]
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from orchestrator.poll_scheduler import PollOutcome
+from orchestrator.service_host import HostReadiness
+from orchestrator.systemd_service_proxy import ServiceState
+
+from benchmarks.bench_scenarios import connected, create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+
+
+def test_autostart_connects_and_scans_the_hosts(fake_host: FakeSystemdHost) -> None:
+    service = create_orchestrator([fake_host])
+    host = service.service_hosts[fake_host.host]
+
+    async def run() -> None:
+        # like pydase.Server, which does not start the tasks of the hosts by itself
+        async with connected(service):
+            assert host.readiness == HostReadiness.READY
+            assert set(host.service_proxies) == set(fake_host.units)
+
+    try:
+        asyncio.run(asyncio.wait_for(run(), 5.0))
+    finally:
+        host._connection_pool.close()
+        service._executor.shutdown()
+
+
+def test_polls_do_not_reuse_expired_snapshots(fake_host: FakeSystemdHost) -> None:
+    service = create_orchestrator([fake_host], min_poll_interval=10.0, snapshot_ttl=0.0)
+    host = service.service_hosts[fake_host.host]
+
+    async def run() -> None:
+        async with connected(service):
+            fake_host.set_state(unit_name(0), "failed", "failed")
+            assert await service._poll_host(host) == PollOutcome.CHANGED
+            assert host.service_proxies[unit_name(0)].state == ServiceState.FAILED
+
+    try:
+        asyncio.run(asyncio.wait_for(run(), 5.0))
+    finally:
+        host._connection_pool.close()
+        service._executor.shutdown()
+
+
+def test_a_hung_host_does_not_delay_the_others() -> None:
+    with (
+        FakeSystemdHost(n_units=5, host="127.0.0.2") as slow_host,
+        FakeSystemdHost(n_units=5) as host,
+    ):
+        service = create_orchestrator(
+            [slow_host, host], min_poll_interval=0.01, snapshot_ttl=0.0
+        )
+        finished: dict[str, tuple[PollOutcome, float]] = {}
+        record = service._poll_scheduler.record
+
+        def record_outcome(hostname: str, outcome: PollOutcome) -> None:
+            finished[hostname] = (outcome, time.monotonic() - start)
+            record(hostname, outcome)
+
+        service._poll_scheduler.record = record_outcome  # type: ignore[method-assign]
+
+        async def run() -> None:
+            nonlocal start
+            async with connected(service):
+                slow_host.latency = 2.0
+                service._host_update_timeout = 0.5
+                service.update_wait_time = None
+                start = time.monotonic()
+                await service.update_hosts()
+
+        start = time.monotonic()
+        try:
+            asyncio.run(asyncio.wait_for(run(), 5.0))
+        finally:
+            for service_host in service.service_hosts.values():
+                service_host._connection_pool.close()
+            service._executor.shutdown()
+
+    outcome, elapsed = finished[host.host]
+    assert outcome != PollOutcome.FAILED
+    assert elapsed < 0.5
+    outcome, elapsed = finished[slow_host.host]
+    assert outcome == PollOutcome.FAILED
+    assert 0.5 <= elapsed < 2.0
@@ -0,0 +1,126 @@
+import asyncio
+import zlib
+from typing import Any
+
+from orchestrator.web_server.output_pipeline import (
+    COMPRESSION_THRESHOLD,
+    MAX_BUFFER_SIZE,
+    MAX_FRAME_SIZE,
+    OutputPipeline,
+)
+
+
+class FrameRecorder:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.frames: list[dict[str, Any]] = []
+
+    async def __call__(self, frame: dict[str, Any]) -> None:
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    @property
+    def output(self) -> str:
+        return "".join(frame["output"] for frame in self.frames)
+
+
+def test_busy_output_is_coalesced_into_frames() -> None:
+    async def run() -> None:
+        recorder = FrameRecorder()
+        pipeline = OutputPipeline(recorder)
+
+        # the first output after an idle period is sent right away
+        pipeline.write("$ ", 2)
+        await asyncio.sleep(0.005)
+        assert recorder.output == "$ "
+
+        for i in range(100):
+            pipeline.write(f"line {i}\n", 7)
+        stats = await pipeline.close()
+
+        assert recorder.output == "$ " + "".join(f"line {i}\n" for i in range(100))
+        assert len(recorder.frames) == 2
+        assert stats["frames_out"] == 2
+        assert stats["bytes_in"] == 702
+        assert stats["dropped_bytes"] == 0
+
+    asyncio.run(run())
+
+
+def test_frames_are_limited_in_size() -> None:
+    async def run() -> None:
+        recorder = FrameRecorder()
+        pipeline = OutputPipeline(recorder)
+        pipeline.write("x" * (2 * MAX_FRAME_SIZE + 1), 2 * MAX_FRAME_SIZE + 1)
+        await pipeline.close()
+
+        assert [len(frame["output"]) for frame in recorder.frames] == [
+            MAX_FRAME_SIZE,
+            MAX_FRAME_SIZE,
+            1,
+        ]
+
+    asyncio.run(run())
+
+
+def test_producer_is_paused_while_the_buffer_is_full() -> None:
+    async def run() -> None:
+        recorder = FrameRecorder(delay=0.01)
+        pipeline = OutputPipeline(recorder)
+        pipeline.write("x" * MAX_BUFFER_SIZE, MAX_BUFFER_SIZE)
+        assert pipeline.full
+
+        await asyncio.wait_for(pipeline.wait_writable(), 1.0)
+        assert not pipeline.full
+        stats = await pipeline.close()
+        assert stats["buffer_high_water_mark"] == MAX_BUFFER_SIZE
+        assert len(recorder.output) == MAX_BUFFER_SIZE
+
+    asyncio.run(run())
+
+
+def test_large_frames_are_compressed() -> None:
+    async def run() -> None:
+        recorder = FrameRecorder()
+        pipeline = OutputPipeline(recorder, compress=True)
+        pipeline.write("a", 1)
+        await asyncio.sleep(0.005)
+        pipeline.write("b" * COMPRESSION_THRESHOLD, COMPRESSION_THRESHOLD)
+        await pipeline.close()
+
+        small, large = recorder.frames
+        assert small == {"output": "a"}
+        assert large["compressed"]
+        assert zlib.decompress(large["output"]).decode() == "b" * COMPRESSION_THRESHOLD
+
+    asyncio.run(run())
+
+
+def test_close_without_flush_drops_the_buffered_output() -> None:
+    async def run() -> None:
+        recorder = FrameRecorder()
+        pipeline = OutputPipeline(recorder)
+        pipeline.write("sent", 4)
+        await asyncio.sleep(0.005)
+        pipeline.write("dropped", 7)
+        stats = await pipeline.close(flush=False)
+
+        assert recorder.output == "sent"
+        assert stats["dropped_bytes"] == 7
+
+    asyncio.run(run())
+
+
+def test_failed_frames_are_counted_as_dropped() -> None:
+    async def run() -> None:
+        async def fail(frame: dict[str, Any]) -> None:
+            raise ConnectionError("client gone")
+
+        pipeline = OutputPipeline(fail)
+        pipeline.write("lost", 4)
+        stats = await pipeline.close()
+
+        assert stats["frames_out"] == 0
+        assert stats["dropped_bytes"] == 4
+
+    asyncio.run(run())
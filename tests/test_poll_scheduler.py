@@ -0,0 +1,97 @@
+import asyncio
+import math
+
+import pytest
+from orchestrator.orchestrator import SystemdServiceOrchestrator
+from orchestrator.poll_scheduler import (
+    INTERVAL_GROWTH,
+    PollOutcome,
+    PollScheduler,
+)
+
+from benchmarks.bench_scenarios import create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost
+
+
+def create_scheduler() -> PollScheduler:
+    scheduler = PollScheduler(min_interval=1.0, max_interval=3.0, max_backoff=4.0)
+    scheduler.jitter = 0.0
+    return scheduler
+
+
+def test_intervals_grow_while_nothing_changes() -> None:
+    scheduler = create_scheduler()
+    scheduler.add("host")
+
+    scheduler.record("host", PollOutcome.UNCHANGED)
+    assert scheduler.interval("host") == INTERVAL_GROWTH
+    for _ in range(5):
+        scheduler.record("host", PollOutcome.UNCHANGED)
+    assert scheduler.interval("host") == scheduler.max_interval
+
+    scheduler.record("host", PollOutcome.CHANGED)
+    assert scheduler.interval("host") == scheduler.min_interval
+
+
+def test_failed_polls_back_off() -> None:
+    scheduler = create_scheduler()
+    scheduler.add("host")
+
+    delays = []
+    for _ in range(4):
+        scheduler.start("host")
+        scheduler.record("host", PollOutcome.FAILED)
+        _, delay = scheduler.next_due()
+        delays.append(round(delay))
+    assert delays == [2, 4, 4, 4]
+
+
+def test_next_due_skips_hosts_being_polled() -> None:
+    scheduler = create_scheduler()
+    scheduler.add("a")
+    scheduler.add("b")
+    scheduler.record("b", PollOutcome.UNCHANGED)
+
+    hostname, delay = scheduler.next_due()
+    assert hostname == "a"
+    assert 0.0 < delay <= 1.0
+
+    scheduler.start("a")
+    assert scheduler.next_due()[0] == "b"
+    scheduler.start("b")
+    assert scheduler.next_due() == (None, math.inf)
+
+    scheduler.remove("a")
+    scheduler.record("a", PollOutcome.CHANGED)
+    assert scheduler.next_due() == (None, math.inf)
+
+
+def test_expedite_polls_at_the_shortest_interval() -> None:
+    scheduler = create_scheduler()
+    scheduler.add("host")
+    for _ in range(5):
+        scheduler.record("host", PollOutcome.UNCHANGED)
+    assert scheduler.next_due()[1] > scheduler.min_interval
+
+    scheduler.expedite("host")
+    assert scheduler.interval("host") == scheduler.min_interval
+    assert scheduler.next_due()[1] <= scheduler.min_interval
+
+
+def test_update_host_records_failures(
+    fake_host: FakeSystemdHost, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    service = create_orchestrator([fake_host])
+    host = service.service_hosts[fake_host.host]
+
+    async def fail(self: SystemdServiceOrchestrator, _: object) -> PollOutcome:
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(SystemdServiceOrchestrator, "_poll_host", fail)
+    try:
+        service._poll_scheduler.start(host.hostname)
+        asyncio.run(service._update_host(host))
+        assert service._poll_scheduler.next_due()[0] == host.hostname
+    finally:
+        host._connection_pool.close()
+        service._executor.shutdown()
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from orchestrator.poll_shards import PollShard, PollWorkerError, ShardHostConfig
+from orchestrator.service_host import ServiceHost
+from orchestrator.ssh_connection_pool import ConnectionRole
+from pydantic import SecretStr
+
+from benchmarks.fake_systemd_host import FakeSystemdHost
+
+OPTIONS = {
+    "command_timeout": 5.0,
+    "keepalive_interval": 30,
+    "telemetry_samples": 10,
+    "max_concurrent_polls": 2,
+}
+
+
+def shard_host_config(fake_host: FakeSystemdHost) -> ShardHostConfig:
+    return {
+        "hostname": fake_host.host,
+        "port": fake_host.port,
+        "username": "test",
+        "password": SecretStr("-"),
+        "key_path": None,
+    }
+
+
+def test_dead_workers_are_restarted(fake_host: FakeSystemdHost) -> None:
+    shard = PollShard("poll-worker-test", [], OPTIONS)  # type: ignore[arg-type]
+    shard.add_host(shard_host_config(fake_host))
+    delta = shard.poll(fake_host.host, 0.0, True)
+    assert delta["records"] is not None
+    assert len(delta["records"]) == len(fake_host.units)
+
+    shard._process.kill()
+    with pytest.raises(PollWorkerError):
+        shard.poll(fake_host.host, 0.0, False)
+
+    deadline = time.monotonic() + 10.0
+    while shard.restart_count == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert shard.restart_count == 1
+    # the restarted worker polls the hosts of the shard, which it has not seen yet
+    delta = shard.poll(fake_host.host, 0.0, False)
+    assert delta["records"] is not None
+    assert len(delta["records"]) == len(fake_host.units)
+    shard._process.terminate()
+
+
+def test_sharded_hosts_have_no_polling_connection(fake_host: FakeSystemdHost) -> None:
+    shard = PollShard("poll-worker-test", [], OPTIONS)  # type: ignore[arg-type]
+    host = ServiceHost(
+        hostname=fake_host.host,
+        username="test",
+        password=SecretStr("-"),
+        port=fake_host.port,
+        poll_shard=shard,
+    )
+    try:
+        host._connection_pool.connect()
+        assert host._connection_pool.connected
+        assert ConnectionRole.POLLING not in host._connection_pool._clients
+    finally:
+        host._connection_pool.close()
+        shard._process.terminate()
+
+
+def test_refreshes_of_sharded_hosts_leave_the_telemetry_to_the_worker(
+    fake_host: FakeSystemdHost,
+) -> None:
+    shard = PollShard("poll-worker-test", [], OPTIONS)  # type: ignore[arg-type]
+    shard.add_host(shard_host_config(fake_host))
+    host = ServiceHost(
+        hostname=fake_host.host,
+        username="test",
+        password=SecretStr("-"),
+        port=fake_host.port,
+        poll_shard=shard,
+    )
+    unit = fake_host.units[0]
+    try:
+        host._connection_pool.connect()
+        records = host._get_unit_snapshot(0.0)
+        assert len(records) == len(fake_host.units)
+
+        fake_host.set_state(unit, "failed", "failed")
+        assert host._refresh_unit_records([unit])[0]["active_state"] == "failed"
+        assert host._telemetry.get(unit) is None
+        assert host._get_unit_snapshot(60.0) == records
+        telemetry = host._get_unit_telemetry(unit)
+        assert telemetry is not None
+        assert len(telemetry["samples"]["time"]) == 1
+    finally:
+        host._connection_pool.close()
+        shard._process.terminate()
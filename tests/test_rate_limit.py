@@ -0,0 +1,16 @@
+import asyncio
+import time
+
+from orchestrator.rate_limit import TokenBucket
+
+
+def test_token_bucket_limits_the_rate() -> None:
+    async def run() -> float:
+        bucket = TokenBucket(rate=100.0, burst=5.0)
+        start = time.perf_counter()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    # the burst is free, the other 10 tokens take 0.1 s to refill
+    assert 0.08 <= asyncio.run(run()) < 0.5
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from orchestrator.rollouts import (
+    RolloutBudget,
+    RolloutStepStatus,
+    parse_unit_dependencies,
+    plan_rollout,
+)
+from orchestrator.systemd_service_proxy import ManagerAction
+
+from benchmarks.bench_scenarios import create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost
+
+A, B, C, D = ("h", "a"), ("h", "b"), ("h", "c"), ("other", "d")
+
+
+def test_units_come_after_their_dependencies() -> None:
+    plan = plan_rollout([A, B, C, D], {B: [A], C: [A, B], D: [("h", "unknown")]})
+
+    assert plan.waves == [[A, D], [B], [C]]
+    assert plan.dependencies == {A: set(), B: {A}, C: {A, B}, D: set()}
+
+
+def test_reverse_plans_run_dependents_first() -> None:
+    plan = plan_rollout([A, B, C], {B: [A], C: [B]}, reverse=True)
+
+    assert plan.waves == [[C], [B], [A]]
+    assert plan.dependencies[A] == {B}
+
+
+def test_cyclic_dependencies_are_rejected() -> None:
+    with pytest.raises(ValueError, match="h/a, h/b"):
+        plan_rollout([A, B, C], {A: [B], B: [A], C: [C]})
+
+
+def test_parse_unit_dependencies() -> None:
+    lines = [
+        "Id=web.service",
+        "After=db.service network.target",
+        "Requires=cache.service",
+        "",
+        "Id=other.target",
+        "After=web.service",
+    ]
+    assert parse_unit_dependencies(lines) == {"web": {"db", "cache"}}
+
+
+def test_budget_bounds_the_parallel_units() -> None:
+    async def run() -> int:
+        budget = RolloutBudget(max_parallel=3, max_unavailable=1)
+        running = 0
+        max_running = 0
+
+        async def step() -> None:
+            nonlocal running, max_running
+            assert await budget.acquire()
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            await budget.release(ready=True)
+
+        await asyncio.gather(*(step() for _ in range(10)))
+        return max_running
+
+    # units being acted upon do not count against max_unavailable
+    assert asyncio.run(run()) == 3
+
+
+def test_budget_is_exhausted_by_failed_units() -> None:
+    async def run() -> None:
+        budget = RolloutBudget(max_parallel=2, max_unavailable=2)
+        assert await budget.acquire()
+        assert await budget.acquire()
+        await budget.release(ready=False)
+        assert not budget.exhausted
+        assert await budget.acquire()
+        await budget.release(ready=False)
+        assert budget.exhausted
+        assert not await budget.acquire()
+        await budget.release(ready=True)
+
+    asyncio.run(run())
+
+
+def test_rollouts_that_cannot_be_planned_fail_all_units(
+    fake_host: FakeSystemdHost,
+) -> None:
+    service = create_orchestrator(
+        [fake_host], rollout_dependencies={"h/a": ["h/b"], "h/b": ["h/a"]}
+    )
+    try:
+        results = asyncio.run(
+            service._rollout(
+                ManagerAction.RESTART, [A, B], RolloutBudget(1, 1), readiness_timeout=1
+            )
+        )
+    finally:
+        service._executor.shutdown()
+
+    assert [result["status"] for result in results] == [
+        RolloutStepStatus.FAILED.value
+    ] * 2
+    assert "cyclic" in results[0]["message"]
+    assert service.rollout_results == results
+    assert not service._rollout_running
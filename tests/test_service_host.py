@@ -0,0 +1,159 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from orchestrator.service_host import HostReadiness, ServiceHost
+from orchestrator.systemd_service_proxy import ServiceState
+from orchestrator.unit_records import SystemdRecord
+from orchestrator.unit_state_watcher import UnitStateEvent
+from pydantic import SecretStr
+from pydase.observer_pattern.observable import Observable
+from pydase.observer_pattern.observer import Observer
+
+from benchmarks.fake_systemd_host import FakeSystemdHost
+from tests.utils import wait_until
+
+
+def create_host(fake_host: FakeSystemdHost) -> ServiceHost:
+    return ServiceHost(
+        hostname=fake_host.host,
+        username="test",
+        password=SecretStr("-"),
+        port=fake_host.port,
+    )
+
+
+def create_record(unit: str, active_state: str = "active") -> SystemdRecord:
+    return {
+        "unit": unit,
+        "load_state": "loaded",
+        "active_state": active_state,
+        "sub_state": "running",
+        "description": unit,
+        "tags": ["test"],
+        "hostname": "host",
+        "main_pid": None,
+        "restarts": None,
+        "memory_bytes": None,
+        "cpu_usage_nsec": None,
+        "active_enter_timestamp": "",
+    }
+
+
+class RecordingObserver(Observer):
+    def __init__(self, observable: Observable) -> None:
+        super().__init__(observable)
+        self.changes: list[str] = []
+
+    def on_change(self, full_access_path: str, value: Any) -> None:
+        self.changes.append(full_access_path)
+
+
+def test_connect_wakes_up_the_connection_task(fake_host: FakeSystemdHost) -> None:
+    host = create_host(fake_host)
+
+    async def run() -> None:
+        task = asyncio.create_task(host._handle_connection())
+        try:
+            await wait_until(lambda: host.readiness == HostReadiness.READY)
+            assert set(host.service_proxies) == set(fake_host.units)
+
+            host._connection_pool.close()
+            assert not host.connected
+
+            # connecting from the event loop (e.g. by the reconnect overlay of the
+            # frontend) does not block, the task reconnects
+            start = time.perf_counter()
+            host.connect()
+            assert time.perf_counter() - start < 0.01
+            await wait_until(lambda: host.connected, timeout=2.0)
+        finally:
+            task.cancel()
+            host._connection_pool.close()
+
+    asyncio.run(run())
+
+
+def test_unchanged_units_keep_their_proxies(fake_host: FakeSystemdHost) -> None:
+    host = create_host(fake_host)
+    host._apply_systemd_service_records([create_record("a"), create_record("b")])
+    service_proxies = host.service_proxies
+    proxy_a = service_proxies["a"]
+    observer = RecordingObserver(host)
+
+    assert not host._apply_systemd_service_records(
+        [create_record("a"), create_record("b")]
+    )
+    assert host.service_proxies is service_proxies
+    assert host.service_proxies["a"] is proxy_a
+    assert [c for c in observer.changes if "service_proxies" in c] == []
+
+    # a changed state only notifies about the changed unit
+    assert host._apply_systemd_service_records(
+        [create_record("a", "failed"), create_record("b")]
+    )
+    assert host.service_proxies is service_proxies
+    assert host.service_proxies["a"] is proxy_a
+    assert {c.split(".")[0] for c in observer.changes if "service_proxies" in c} == {
+        'service_proxies["a"]'
+    }
+
+
+def test_proxies_are_only_replaced_when_units_change(
+    fake_host: FakeSystemdHost,
+) -> None:
+    host = create_host(fake_host)
+    host._apply_systemd_service_records([create_record("a"), create_record("b")])
+    service_proxies = host.service_proxies
+    proxy_a = service_proxies["a"]
+
+    assert host._apply_systemd_service_records([create_record("a")])
+    assert host.service_proxies is not service_proxies
+    assert list(host.service_proxies) == ["a"]
+    # the remaining units keep their proxies
+    assert host.service_proxies["a"] is proxy_a
+
+    service_proxies = host.service_proxies
+    assert host._apply_systemd_service_records([create_record("a"), create_record("c")])
+    assert host.service_proxies is not service_proxies
+    assert list(host.service_proxies) == ["a", "c"]
+    assert host.service_proxies["a"] is proxy_a
+
+
+def test_concurrent_scans_are_shared(fake_host: FakeSystemdHost) -> None:
+    host = create_host(fake_host)
+    host._connection_pool.connect()
+    fake_host.latency = 0.2
+    try:
+        scan_count = fake_host.command_count
+        with ThreadPoolExecutor(4) as executor:
+            snapshots = list(
+                executor.map(lambda _: host._get_unit_snapshot(max_age=5.0), range(4))
+            )
+        assert fake_host.command_count == scan_count + 1
+        assert all(records is snapshots[0] for records in snapshots)
+
+        # reused within the TTL, scanned again when outdated
+        assert host._get_unit_snapshot(max_age=5.0) is snapshots[0]
+        assert fake_host.command_count == scan_count + 1
+        assert host._get_unit_snapshot(max_age=0.0) is not snapshots[0]
+        assert fake_host.command_count == scan_count + 2
+    finally:
+        host._connection_pool.close()
+
+
+def test_pushed_states_outdate_the_snapshot(fake_host: FakeSystemdHost) -> None:
+    host = create_host(fake_host)
+    host._connection_pool.connect()
+    try:
+        host._apply_systemd_service_records(host._get_unit_snapshot())
+        unit = fake_host.units[0]
+        fake_host.set_state(unit, "failed", "failed")
+        host._apply_unit_state_event(UnitStateEvent(unit, "failed", "failed"))
+
+        # a refresh within the TTL does not revert the pushed state
+        host._apply_systemd_service_records(host._get_unit_snapshot())
+        assert host.service_proxies[unit].state == ServiceState.FAILED
+    finally:
+        host._connection_pool.close()
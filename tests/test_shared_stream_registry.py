@@ -0,0 +1,16 @@
+from orchestrator.web_server.shared_stream_registry import is_shareable_command
+
+
+def test_followed_logs_are_shareable() -> None:
+    assert is_shareable_command("journalctl", "--user -f -u web")
+    assert is_shareable_command("podman", "logs --follow web")
+
+
+def test_other_commands_are_not_shareable() -> None:
+    assert not is_shareable_command("journalctl", "--user -u web")
+    assert not is_shareable_command("podman", "exec -f web")
+    assert not is_shareable_command("bash", "-f")
+
+
+def test_unbalanced_quotes_are_not_shareable() -> None:
+    assert not is_shareable_command("journalctl", "-f -u 'web")
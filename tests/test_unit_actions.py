@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from orchestrator.poll_scheduler import PollOutcome
+from orchestrator.systemd_service_proxy import ManagerAction
+from orchestrator.unit_actions import parse_unit_action_errors
+
+from benchmarks.bench_scenarios import connected, create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+from tests.utils import wait_until
+
+
+def test_errors_are_mapped_to_the_failed_units() -> None:
+    stderr = (
+        "Failed to restart web-2.service: Unit web-2.service not found.\n"
+        "Job for web.service failed because the control process exited with error "
+        "code.\n"
+    )
+
+    errors = parse_unit_action_errors(1, stderr, ["web", "web-2", "db"])
+
+    assert errors == {
+        "web": "Job for web.service failed because the control process exited with "
+        "error code.",
+        "web-2": "Failed to restart web-2.service: Unit web-2.service not found.",
+    }
+
+
+def test_errors_without_units_apply_to_all_units() -> None:
+    assert parse_unit_action_errors(0, "", ["web"]) == {}
+    assert parse_unit_action_errors(
+        1, "Failed to connect to bus: No medium found\n", ["web", "db"]
+    ) == {
+        "web": "Failed to connect to bus: No medium found",
+        "db": "Failed to connect to bus: No medium found",
+    }
+    assert parse_unit_action_errors(5, "", ["web"]) == {
+        "web": "systemctl exited with status 5"
+    }
+
+
+def test_bulk_action_results_per_unit() -> None:
+    failing_unit = unit_name(1)
+    with FakeSystemdHost(n_units=3, failing_units={failing_unit}) as fake_host:
+        service = create_orchestrator([fake_host])
+
+        async def run() -> None:
+            async with connected(service):
+                # the unit disappears before the action
+                fake_host._states.pop(unit_name(2))
+                results = await service._bulk_action(
+                    ManagerAction.RESTART, hostname=fake_host.host
+                )
+
+                assert service.bulk_action_results == results
+                by_unit = {result["unit"]: result for result in results}
+                assert set(by_unit) == {unit_name(i) for i in range(3)}
+                assert by_unit[unit_name(0)]["success"]
+                assert by_unit[unit_name(0)]["message"] == ""
+                assert by_unit[unit_name(0)]["state"] == "active"
+                assert not by_unit[failing_unit]["success"]
+                assert "exited with error code" in by_unit[failing_unit]["message"]
+                assert by_unit[failing_unit]["state"] == "failed"
+                assert "not found" in by_unit[unit_name(2)]["message"]
+                # a single systemctl call runs the action on all units of the host
+                assert len({result["host_duration"] for result in results}) == 1
+
+        try:
+            asyncio.run(asyncio.wait_for(run(), 5.0))
+        finally:
+            service.service_hosts[fake_host.host]._connection_pool.close()
+            service._executor.shutdown()
+            service._action_executor.shutdown()
+
+
+def test_bulk_actions_do_not_hold_up_the_polls() -> None:
+    with FakeSystemdHost(n_units=3, job_duration=2.0) as fake_host:
+        # a single polling thread, which a bulk action would otherwise occupy
+        service = create_orchestrator(
+            [fake_host],
+            max_concurrent_host_updates=1,
+            host_update_timeout=1.0,
+            min_poll_interval=0.01,
+            snapshot_ttl=0.0,
+        )
+        host = service.service_hosts[fake_host.host]
+        outcomes: list[PollOutcome] = []
+        record = service._poll_scheduler.record
+
+        def record_outcome(hostname: str, outcome: PollOutcome) -> None:
+            outcomes.append(outcome)
+            record(hostname, outcome)
+
+        service._poll_scheduler.record = record_outcome  # type: ignore[method-assign]
+
+        async def run() -> None:
+            async with connected(service):
+                bulk_action = asyncio.create_task(
+                    service._bulk_action(ManagerAction.RESTART, tag="bench")
+                )
+                await wait_until(lambda: len(fake_host._jobs) == 3)
+                start = time.perf_counter()
+                await service._update_host(host)
+                assert time.perf_counter() - start < 1.0
+                assert outcomes == [PollOutcome.CHANGED]
+
+                # the action outlasts the timeout of the polls
+                results = await bulk_action
+                assert all(result["success"] for result in results)
+
+        try:
+            asyncio.run(asyncio.wait_for(run(), 10.0))
+        finally:
+            host._connection_pool.close()
+            service._executor.shutdown()
+            service._action_executor.shutdown()
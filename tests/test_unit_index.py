@@ -0,0 +1,56 @@
+from orchestrator.unit_index import UnitIndex
+
+
+def create_index() -> UnitIndex:
+    unit_index = UnitIndex()
+    unit_index.update("a", "web", "active", ["frontend", "prod"])
+    unit_index.update("a", "db", "failed", ["backend", "prod"])
+    unit_index.update("b", "web", "active", ["frontend"])
+    unit_index.update("b", "worker", "inactive", [])
+    return unit_index
+
+
+def test_query_without_filters_returns_all_units_sorted() -> None:
+    result = create_index().query()
+
+    assert result["units"] == [("a", "db"), ("a", "web"), ("b", "web"), ("b", "worker")]
+    assert result["tag_counts"] == {"frontend": 2, "backend": 1, "prod": 2}
+    assert result["state_counts"] == {"active": 2, "failed": 1, "inactive": 1}
+
+
+def test_query_combines_the_filters() -> None:
+    unit_index = create_index()
+
+    assert unit_index.query(tags=["frontend", "backend"])["units"] == [
+        ("a", "db"),
+        ("a", "web"),
+        ("b", "web"),
+    ]
+    assert unit_index.query(hostnames=["a"], states=["active"])["units"] == [
+        ("a", "web")
+    ]
+    assert unit_index.query(hostnames=["c"])["units"] == []
+    assert unit_index.query(tags=["unknown"])["units"] == []
+
+
+def test_query_counts_are_faceted() -> None:
+    result = create_index().query(tags=["frontend"], states=["active"])
+
+    # the counts ignore the filter of their own dimension
+    assert result["tag_counts"] == {"frontend": 2, "prod": 1}
+    assert result["state_counts"] == {"active": 2}
+
+
+def test_updates_and_removals_are_indexed() -> None:
+    unit_index = create_index()
+    unit_index.update("a", "web", "failed", ["frontend"])
+    unit_index.remove("b", "worker")
+    unit_index.remove("b", "unknown")
+
+    assert unit_index.query(states=["failed"])["units"] == [("a", "db"), ("a", "web")]
+    assert unit_index.query(tags=["prod"])["units"] == [("a", "db")]
+    assert unit_index.query(states=["inactive"])["units"] == []
+    assert unit_index.tags("a", "web") == frozenset({"frontend"})
+    assert unit_index.state("b", "worker") is None
+    assert unit_index.units("b") == {"web"}
+    assert len(unit_index) == 3
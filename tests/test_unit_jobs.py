@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+from orchestrator.service_host import ServiceHost
+from orchestrator.systemd_service_proxy import ManagerAction, ServiceState
+from orchestrator.unit_jobs import (
+    JobStatus,
+    UnitJob,
+    UnitJobError,
+    action_succeeded,
+    has_pending_job,
+)
+from pydantic import SecretStr
+
+from benchmarks.fake_systemd_host import FakeSystemdHost, unit_name
+from tests.utils import wait_until
+
+
+def create_host(fake_host: FakeSystemdHost) -> ServiceHost:
+    host = ServiceHost(
+        hostname=fake_host.host,
+        username="test",
+        password=SecretStr("-"),
+        port=fake_host.port,
+    )
+    host._connection_pool.connect()
+    return host
+
+
+@pytest.mark.parametrize(
+    ("active_state", "started", "stopped"),
+    [
+        ("active", True, False),
+        ("inactive", False, True),
+        ("failed", False, True),
+        ("activating", False, False),
+        ("deactivating", False, False),
+        ("reloading", False, False),
+    ],
+)
+def test_action_succeeded(active_state: str, started: bool, stopped: bool) -> None:
+    assert action_succeeded(ManagerAction.START, active_state) == started
+    assert action_succeeded(ManagerAction.RESTART, active_state) == started
+    assert action_succeeded(ManagerAction.STOP, active_state) == stopped
+
+
+def test_pending_jobs_are_found_by_unit() -> None:
+    lines = ["1234 web.service start running\n", "1235 db.service stop waiting\n"]
+
+    assert has_pending_job(lines, "web")
+    assert has_pending_job(lines, "db")
+    assert not has_pending_job(lines, "we")
+    assert not has_pending_job([], "web")
+
+
+def test_job_status_changes() -> None:
+    job = UnitJob("host", "web", ManagerAction.START)
+    assert job.status == JobStatus.QUEUED
+    assert not job.finished
+
+    job._set_running("accepted")
+    assert job.status == JobStatus.RUNNING
+    assert job.started_at is not None
+    assert not job.finished
+
+    # the output of systemctl is kept if there is no other
+    job._finish(success=True)
+    assert job.status == JobStatus.DONE
+    assert job.output == "accepted"
+    assert job.finished_at is not None
+    assert job.finished
+
+    job = UnitJob("host", "web", ManagerAction.START)
+    job._finish(success=False, output="Unit web.service not found.")
+    assert job.status == JobStatus.FAILED
+    assert job.output == "Unit web.service not found."
+    assert job.started_at is None
+    assert job.finished
+
+
+def test_jobs_run_until_systemd_finished_them() -> None:
+    with FakeSystemdHost(n_units=2, job_duration=0.5) as fake_host:
+        host = create_host(fake_host)
+        unit = unit_name(0)
+
+        async def run() -> None:
+            host._apply_systemd_service_records(host._get_unit_snapshot())
+            job = host.unit_jobs[host._start_unit_job(ManagerAction.RESTART, unit)]
+            assert job.status == JobStatus.QUEUED
+
+            await wait_until(lambda: job.status == JobStatus.RUNNING)
+            # the proxy follows the unit while the job runs
+            proxy = host.service_proxies[unit]
+            await wait_until(lambda: proxy.state == ServiceState.ACTIVATING)
+            assert not job.finished
+            await wait_until(lambda: job.finished)
+
+            assert job.status == JobStatus.DONE
+            assert job.output == "Unit is active (running)."
+            assert host.service_proxies[unit].state == ServiceState.ACTIVE
+
+        try:
+            asyncio.run(run())
+        finally:
+            host._connection_pool.close()
+
+
+def test_jobs_fail_with_their_units() -> None:
+    failing_unit = unit_name(0)
+    with FakeSystemdHost(n_units=2, failing_units={failing_unit}) as fake_host:
+        host = create_host(fake_host)
+
+        async def run() -> None:
+            host._apply_systemd_service_records(host._get_unit_snapshot())
+            job_id = host._start_unit_job(ManagerAction.START, failing_unit)
+            # the unit is unknown to systemd, thus the job is not accepted
+            unknown_job_id = host._start_unit_job(ManagerAction.START, "missing")
+            job = host.unit_jobs[job_id]
+            unknown_job = host.unit_jobs[unknown_job_id]
+            await wait_until(lambda: job.finished and unknown_job.finished)
+
+            assert job.status == JobStatus.FAILED
+            assert job.output == "Unit is failed (failed)."
+            assert unknown_job.status == JobStatus.FAILED
+            assert unknown_job.started_at is None
+            assert "Unit missing.service not found." in unknown_job.output
+
+        try:
+            asyncio.run(run())
+        finally:
+            host._connection_pool.close()
+
+
+def test_no_other_action_runs_while_a_job_is_pending() -> None:
+    with FakeSystemdHost(n_units=2, job_duration=0.5) as fake_host:
+        host = create_host(fake_host)
+        unit = unit_name(0)
+
+        async def run() -> None:
+            host._apply_systemd_service_records(host._get_unit_snapshot())
+            job_id = host._start_unit_job(ManagerAction.RESTART, unit)
+            assert host._start_unit_job(ManagerAction.STOP, unit) == job_id
+
+            job = host.unit_jobs[job_id]
+            await wait_until(lambda: job.status == JobStatus.RUNNING)
+            assert host._start_unit_job(ManagerAction.STOP, unit) == job_id
+            # other units are not held up
+            other_job_id = host._start_unit_job(ManagerAction.STOP, unit_name(1))
+            assert other_job_id != job_id
+            await wait_until(lambda: host.unit_jobs[other_job_id].finished)
+
+            await wait_until(lambda: job.finished)
+            assert job.status == JobStatus.DONE
+            assert len(host.unit_jobs) == 2
+
+            # the unit is free again once the job finished
+            stop_job_id = host._start_unit_job(ManagerAction.STOP, unit)
+            assert stop_job_id != job_id
+            stop_job = host.unit_jobs[stop_job_id]
+            await wait_until(lambda: stop_job.finished)
+            assert stop_job.status == JobStatus.DONE
+            assert host.service_proxies[unit].state == ServiceState.INACTIVE
+
+        try:
+            asyncio.run(run())
+        finally:
+            host._connection_pool.close()
+
+
+def test_jobs_that_do_not_finish_in_time_fail() -> None:
+    with FakeSystemdHost(n_units=1, job_duration=2.0) as fake_host:
+        host = create_host(fake_host)
+        unit = unit_name(0)
+
+        async def run() -> None:
+            assert host._enqueue_unit_action(ManagerAction.RESTART, unit)[0] == 0
+            with pytest.raises(UnitJobError, match="Timed out"):
+                await host._await_unit_job(ManagerAction.RESTART, unit, timeout=0.1)
+
+            await asyncio.sleep(2.0)
+            fake_host._states.pop(unit)
+            with pytest.raises(UnitJobError, match="disappeared"):
+                await host._await_unit_job(ManagerAction.RESTART, unit, timeout=1.0)
+
+        try:
+            asyncio.run(run())
+        finally:
+            host._connection_pool.close()
@@ -0,0 +1,119 @@
+from orchestrator.unit_records import (
+    build_show_units_command,
+    create_systemd_record,
+    parse_systemd_records,
+)
+
+
+def unit_block(unit: str, active_state: str = "active", **properties: str) -> str:
+    lines = {
+        "Id": f"{unit}.service",
+        "LoadState": "loaded",
+        "ActiveState": active_state,
+        "SubState": "running",
+        "Description": f"The {unit} Tags [web, frontend]",
+        **properties,
+    }
+    return "".join(f"{key}={value}\n" for key, value in lines.items())
+
+
+def test_parse_systemd_records() -> None:
+    output = "\n".join(
+        [
+            unit_block("web", MainPID="1234", NRestarts="2", MemoryCurrent="52428800"),
+            unit_block("db", "inactive", MainPID="0"),
+        ]
+    )
+
+    records = list(parse_systemd_records(output.splitlines(keepends=True), "host"))
+
+    assert [record["unit"] for record in records] == ["web", "db"]
+    web, db = records
+    assert web["hostname"] == "host"
+    assert web["description"] == "The web"
+    assert web["tags"] == ["web", "frontend"]
+    assert web["main_pid"] == 1234
+    assert web["restarts"] == 2
+    assert web["memory_bytes"] == 52428800
+    assert db["active_state"] == "inactive"
+    assert db["main_pid"] is None
+
+
+def test_unset_counters_are_none() -> None:
+    record = create_systemd_record(
+        {
+            **dict(line.split("=", 1) for line in unit_block("web").splitlines()),
+            "MemoryCurrent": "[not set]",
+            "CPUUsageNSec": str(2**64 - 1),
+        },
+        "host",
+    )
+
+    assert record is not None
+    assert record["memory_bytes"] is None
+    assert record["cpu_usage_nsec"] is None
+    assert record["restarts"] is None
+
+
+def test_untagged_and_incomplete_units_are_skipped() -> None:
+    output = "\n".join(
+        [
+            unit_block("web"),
+            unit_block("untagged", Description="Not managed"),
+            "Id=incomplete.service\nLoadState=loaded\n",
+            unit_block("socket").replace(".service", ".socket"),
+        ]
+    )
+
+    records = parse_systemd_records(output.splitlines(keepends=True), "host")
+
+    assert [record["unit"] for record in records] == ["web"]
+
+
+def test_all_systemd_active_states_are_parsed() -> None:
+    states = ["reloading", "maintenance", "refreshing", "activating", "failed"]
+    output = "\n".join(unit_block(f"unit-{state}", state) for state in states)
+
+    records = parse_systemd_records(output.splitlines(keepends=True), "host")
+
+    assert [record["active_state"] for record in records] == states
+
+
+def test_unknown_active_states_are_skipped() -> None:
+    output = "\n".join([unit_block("web", "not-a-state"), unit_block("db")])
+
+    records = parse_systemd_records(output.splitlines(keepends=True), "host")
+
+    assert [record["unit"] for record in records] == ["db"]
+
+
+def test_blocks_with_other_properties_are_parsed() -> None:
+    output = "\n".join(
+        [
+            unit_block("web", NRestarts="1"),
+            # e.g. an older systemd without NRestarts, or another property order
+            unit_block("db"),
+            "Description=The cache Tags [db]\nId=cache.service\nLoadState=loaded\n"
+            "ActiveState=failed\nSubState=failed\n",
+            unit_block("api", NRestarts="3"),
+        ]
+    )
+
+    for lines in (
+        output.splitlines(keepends=True),
+        output.replace("\n", "\r\n").splitlines(keepends=True),
+        # without the final newline
+        output.rstrip("\n").splitlines(keepends=True),
+    ):
+        records = list(parse_systemd_records(lines, "host"))
+
+        assert [record["unit"] for record in records] == ["web", "db", "cache", "api"]
+        assert [record["restarts"] for record in records] == [1, None, None, 3]
+        assert records[2]["active_state"] == "failed"
+        assert records[3]["active_enter_timestamp"] == ""
+
+
+def test_build_show_units_command_quotes_the_units() -> None:
+    assert build_show_units_command(["web", "a b"]).endswith(
+        " web.service 'a b.service'"
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+from collections.abc import Iterator
+
+from orchestrator.orchestrator import SystemdServiceOrchestrator
+from orchestrator.poll_scheduler import PollOutcome
+from orchestrator.service_host import ServiceHost
+from orchestrator.systemd_service_proxy import ServiceState
+from orchestrator.unit_state_watcher import (
+    UnitStateEvent,
+    UnitStateWatcher,
+    parse_unit_state_event,
+    unescape_unit_object_path,
+)
+
+from benchmarks.bench_scenarios import create_orchestrator
+from benchmarks.fake_systemd_host import FakeSystemdHost
+from tests.utils import wait_until
+
+
+@contextlib.contextmanager
+def push_orchestrator(
+    fake_host: FakeSystemdHost,
+) -> Iterator[tuple[SystemdServiceOrchestrator, ServiceHost]]:
+    service = create_orchestrator([fake_host], push_updates=True)
+    host = service.service_hosts[fake_host.host]
+    try:
+        yield service, host
+    finally:
+        host._stop_unit_state_watcher()
+        host._connection_pool.close()
+        service._executor.shutdown()
+
+
+async def connect(host: ServiceHost) -> None:
+    await asyncio.get_running_loop().run_in_executor(
+        None, host._connection_pool.connect
+    )
+    host._connected = True
+
+
+def test_unescape_unit_object_path() -> None:
+    assert (
+        unescape_unit_object_path(
+            "/org/freedesktop/systemd1/unit/container_2dweb_2eservice"
+        )
+        == "container-web.service"
+    )
+    assert unescape_unit_object_path("/org/freedesktop/systemd1/job/42") is None
+
+
+def test_parse_unit_state_event_ignores_other_messages() -> None:
+    assert parse_unit_state_event("not json") is None
+    assert parse_unit_state_event('{"member": "PropertiesChanged"}') is None
+
+
+def test_watcher_reports_state_changes(fake_host: FakeSystemdHost) -> None:
+    events: list[UnitStateEvent] = []
+    client = fake_host.connect_client()
+    watcher = UnitStateWatcher(client, events.append)
+
+    async def run() -> None:
+        watcher.start()
+        await wait_until(lambda: fake_host.monitor_count == 1)
+        unit = fake_host.units[0]
+        fake_host.set_state(unit, "deactivating", "stop")
+        fake_host.set_state(unit, "inactive", "dead")
+        await wait_until(lambda: len(events) == 2)
+
+        assert events == [
+            UnitStateEvent(unit, "deactivating", "stop"),
+            UnitStateEvent(unit, "inactive", "dead"),
+        ]
+        assert watcher.running
+
+        watcher.stop()
+        await wait_until(lambda: not watcher.running)
+
+    try:
+        asyncio.run(run())
+    finally:
+        client.close()
+
+
+def test_pushed_states_update_the_service_proxies(fake_host: FakeSystemdHost) -> None:
+    async def run() -> None:
+        with push_orchestrator(fake_host) as (service, host):
+            await connect(host)
+            # the first poll starts the watcher and scans the host
+            assert await service._poll_host(host) == PollOutcome.CHANGED
+            assert host._is_watching_unit_states()
+            await wait_until(lambda: fake_host.monitor_count == 1)
+
+            unit = fake_host.units[0]
+            fake_host.set_state(unit, "failed", "failed")
+            await wait_until(
+                lambda: host.service_proxies[unit].state == ServiceState.FAILED
+            )
+            assert service._unit_index.state(fake_host.host, unit) == "failed"
+
+            # hosts following their unit states are only swept occasionally
+            scan_count = fake_host.command_count
+            assert await service._poll_host(host) == PollOutcome.UNCHANGED
+            assert fake_host.command_count == scan_count
+
+    asyncio.run(run())
+
+
+def test_unknown_pushed_states_are_ignored(fake_host: FakeSystemdHost) -> None:
+    async def run() -> None:
+        with push_orchestrator(fake_host) as (service, host):
+            await connect(host)
+            await service._poll_host(host)
+            await wait_until(lambda: fake_host.monitor_count == 1)
+
+            first_unit, second_unit = fake_host.units[:2]
+            fake_host.set_state(first_unit, "not-a-state", "unknown")
+            fake_host.set_state(second_unit, "inactive", "dead")
+            # the events are applied in order
+            await wait_until(
+                lambda: host.service_proxies[second_unit].state == ServiceState.INACTIVE
+            )
+            assert host.service_proxies[first_unit].state == ServiceState.ACTIVE
+            assert host._is_watching_unit_states()
+
+    asyncio.run(run())
+
+
+def test_reconnect_restarts_the_watcher_and_sweeps(
+    fake_host: FakeSystemdHost,
+) -> None:
+    async def run() -> None:
+        with push_orchestrator(fake_host) as (service, host):
+            await connect(host)
+            await service._poll_host(host)
+            await wait_until(lambda: fake_host.monitor_count == 1)
+            unit = fake_host.units[0]
+
+            # the connection drops, which ends the watcher
+            host._connection_pool.close()
+            await wait_until(lambda: not host._is_watching_unit_states())
+            assert await service._poll_host(host) == PollOutcome.FAILED
+
+            # changes while the host is not watched are not pushed
+            await wait_until(lambda: fake_host.monitor_count == 0)
+            fake_host.set_state(unit, "failed", "failed")
+
+            # after reconnecting, the watcher is restarted and the host swept right
+            # away, which picks up the missed change
+            await connect(host)
+            assert await service._poll_host(host) == PollOutcome.CHANGED
+            assert host.service_proxies[unit].state == ServiceState.FAILED
+            assert host._is_watching_unit_states()
+
+            await wait_until(lambda: fake_host.monitor_count == 1)
+            fake_host.set_state(unit, "active", "running")
+            await wait_until(
+                lambda: host.service_proxies[unit].state == ServiceState.ACTIVE
+            )
+
+    asyncio.run(run())
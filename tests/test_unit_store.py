@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from orchestrator.service_host import HostReadiness
+from orchestrator.systemd_service_proxy import ServiceState
+from orchestrator.unit_store import StoredHost, StoredUnit, UnitStore
+
+from benchmarks.fake_systemd_host import FakeSystemdHost
+from tests.test_service_host import create_host
+
+WEB = StoredUnit("web", "active", "Web server", ["frontend"])
+DB = StoredUnit("db", "failed", "Database", [])
+
+
+def test_saved_units_are_loaded(tmp_path: Path) -> None:
+    store = UnitStore(tmp_path / "units.json")
+    store.update("a", [WEB, DB])
+    store.touch("a", 1700000000.5)
+    store.update("b", [])
+    assert store.dirty
+    store.save()
+    assert not store.dirty
+
+    assert UnitStore(tmp_path / "units.json").load() == {
+        "a": StoredHost(1700000000.5, [WEB, DB]),
+        "b": StoredHost(0.0, []),
+    }
+
+
+def test_changed_and_removed_hosts_are_saved(tmp_path: Path) -> None:
+    path = tmp_path / "units.json"
+    store = UnitStore(path)
+    store.update("a", [WEB])
+    store.update("b", [DB])
+    store.save()
+
+    store.update("a", [WEB, DB])
+    store.remove("b")
+    store.save()
+
+    assert UnitStore(path).load() == {"a": StoredHost(0.0, [WEB, DB])}
+
+
+def test_loaded_hosts_are_saved_again(tmp_path: Path) -> None:
+    path = tmp_path / "units.json"
+    store = UnitStore(path)
+    store.update("a", [WEB])
+    store.update("b", [DB])
+    store.save()
+
+    restarted_store = UnitStore(path)
+    # hosts updated before the file is loaded keep their units
+    restarted_store.update("b", [])
+    restarted_store.load()
+    restarted_store.save()
+
+    assert UnitStore(path).load() == {
+        "a": StoredHost(0.0, [WEB]),
+        "b": StoredHost(0.0, []),
+    }
+
+
+def test_unreadable_files_are_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "units.json"
+    assert UnitStore(path).load() == {}
+
+    path.write_text("{not json")
+    assert UnitStore(path).load() == {}
+
+    path.write_text(json.dumps({"version": 0, "hosts": {}}))
+    assert UnitStore(path).load() == {}
+
+
+def test_units_in_unknown_states_are_not_restored(fake_host: FakeSystemdHost) -> None:
+    host = create_host(fake_host)
+    host._restore_units(
+        StoredHost(1700000000.0, [WEB, StoredUnit("other", "not-a-state", "", [])])
+    )
+
+    assert list(host.service_proxies) == ["web"]
+    assert host.service_proxies["web"].state == ServiceState.ACTIVE
+    assert host.readiness == HostReadiness.STALE
@@ -0,0 +1,63 @@
+from orchestrator.unit_index import UnitIndex
+from orchestrator.web_server.unit_subscriptions import UnitSubscriptions
+
+
+def proxy_path(hostname: str, unit: str, attribute: str = "") -> str:
+    return f'service_hosts["{hostname}"].service_proxies["{unit}"]{attribute}'
+
+
+def create_subscriptions() -> UnitSubscriptions:
+    unit_index = UnitIndex()
+    unit_index.update("a", "web", "active", ["frontend"])
+    unit_index.update("a", "db", "active", ["backend"])
+    unit_index.update("b", "web", "failed", ["frontend"])
+    return UnitSubscriptions(unit_index)
+
+
+def test_all_clients_are_notified_without_subscriptions() -> None:
+    subscriptions = create_subscriptions()
+    assert subscriptions.recipients(proxy_path("a", "web", ".state")) is None
+
+
+def test_empty_subscriptions_select_no_units() -> None:
+    subscriptions = create_subscriptions()
+    subscriptions.subscribe("client", {})
+
+    assert subscriptions.matching_paths("client") == []
+    assert subscriptions.recipients(proxy_path("a", "web", ".state")) == []
+    # the clients still learn about the hosts and about new units
+    assert subscriptions.recipients('service_hosts["a"].readiness') == ["client"]
+    assert subscriptions.recipients(proxy_path("a", "new")) == ["client"]
+    assert subscriptions.recipients("update_wait_time") is None
+
+
+def test_subscriptions_select_listed_units() -> None:
+    subscriptions = create_subscriptions()
+    subscriptions.subscribe("client", {"units": [("a", "web"), ("a", "gone")]})
+
+    assert subscriptions.matching_paths("client") == [proxy_path("a", "web")]
+    assert subscriptions.recipients(proxy_path("a", "web", ".state")) == ["client"]
+    assert subscriptions.recipients(proxy_path("b", "web", ".state")) == []
+
+
+def test_subscriptions_select_units_by_hostname_and_tag() -> None:
+    subscriptions = create_subscriptions()
+    subscriptions.subscribe("frontend", {"tags": ["frontend"]})
+    subscriptions.subscribe("host-b", {"hostnames": ["b"]})
+
+    assert subscriptions.matching_paths("frontend") == [
+        proxy_path("a", "web"),
+        proxy_path("b", "web"),
+    ]
+    assert subscriptions.recipients(proxy_path("a", "db", ".state")) == []
+    assert subscriptions.recipients(proxy_path("b", "web", ".state")) == [
+        "frontend",
+        "host-b",
+    ]
+    # changed tags are sent to all subscribers of the host
+    assert subscriptions.recipients(proxy_path("a", "db", ".tags")) == ["frontend"]
+    assert subscriptions.recipients('service_hosts["a"].readiness') == ["frontend"]
+
+    subscriptions.unsubscribe("frontend")
+    subscriptions.unsubscribe("host-b")
+    assert subscriptions.recipients(proxy_path("a", "db", ".state")) is None
@@ -0,0 +1,95 @@
+import confz
+import pydantic
+import pytest
+from orchestrator.config import SystemdServiceOrchestratorConfig
+from orchestrator.unit_records import SystemdRecord
+from orchestrator.unit_telemetry import TelemetryBuffer
+
+
+def create_record(
+    unit: str,
+    memory_bytes: int | None = 1024,
+    cpu_usage_nsec: int | None = 0,
+    restarts: int | None = 0,
+) -> SystemdRecord:
+    return {
+        "unit": unit,
+        "load_state": "loaded",
+        "active_state": "active",
+        "sub_state": "running",
+        "description": unit,
+        "tags": ["test"],
+        "hostname": "host",
+        "main_pid": 1234,
+        "restarts": restarts,
+        "memory_bytes": memory_bytes,
+        "cpu_usage_nsec": cpu_usage_nsec,
+        "active_enter_timestamp": "Mon 2024-01-01 12:00:00 UTC",
+    }
+
+
+def test_the_oldest_samples_are_overwritten() -> None:
+    telemetry = TelemetryBuffer(size=3)
+    for i in range(5):
+        telemetry.record(100.0 + i, [create_record("web", memory_bytes=i)])
+
+    unit_telemetry = telemetry.get("web")
+    assert unit_telemetry is not None
+    assert unit_telemetry["samples"]["time"] == [102.0, 103.0, 104.0]
+    assert unit_telemetry["samples"]["memory_bytes"] == [2.0, 3.0, 4.0]
+    assert unit_telemetry["main_pid"] == 1234
+
+
+def test_cpu_rate_between_samples() -> None:
+    telemetry = TelemetryBuffer()
+    cpu_usages = [0, 2 * 10**9, 3 * 10**9, 10**9]
+    for i, cpu_usage in enumerate(cpu_usages):
+        telemetry.record(
+            100.0 + 2 * i, [create_record("web", cpu_usage_nsec=cpu_usage)]
+        )
+    # a sample taken at the same time as the previous one has no rate
+    telemetry.record(106.0, [create_record("web", cpu_usage_nsec=2 * 10**9)])
+
+    unit_telemetry = telemetry.get("web")
+    assert unit_telemetry is not None
+    # the first sample has no predecessor, and the usage drops when the unit restarts
+    assert unit_telemetry["samples"]["cpu_rate"] == [None, 1.0, 0.5, None, None]
+
+
+def test_unknown_values_are_none() -> None:
+    telemetry = TelemetryBuffer()
+    telemetry.record(100.0, [create_record("web")])
+    telemetry.record(
+        101.0,
+        [create_record("web", memory_bytes=None, cpu_usage_nsec=None, restarts=None)],
+    )
+    telemetry.record(102.0, [create_record("web", cpu_usage_nsec=10**9)])
+
+    unit_telemetry = telemetry.get("web")
+    assert unit_telemetry is not None
+    assert unit_telemetry["samples"] == {
+        "time": [100.0, 101.0, 102.0],
+        "memory_bytes": [1024.0, None, 1024.0],
+        "cpu_rate": [None, None, None],
+        "restarts": [0.0, None, 0.0],
+    }
+
+
+def test_units_missing_from_a_full_scan_are_dropped() -> None:
+    telemetry = TelemetryBuffer()
+    telemetry.record(100.0, [create_record("web"), create_record("db")])
+    telemetry.record(101.0, [create_record("web")], complete=False)
+    assert telemetry.get("db") is not None
+
+    telemetry.record(102.0, [create_record("web")])
+    assert telemetry.get("db") is None
+    assert telemetry.get("unknown") is None
+
+
+def test_at_least_one_sample_is_kept() -> None:
+    source = confz.DataSource(data={"service_hosts": [], "telemetry_samples": 0})
+    with (
+        SystemdServiceOrchestratorConfig.change_config_sources(source),
+        pytest.raises(pydantic.ValidationError),
+    ):
+        SystemdServiceOrchestratorConfig()
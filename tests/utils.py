@@ -0,0 +1,13 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    """Waits until `condition` is true, failing the test after `timeout` seconds."""
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the condition.")
+        await asyncio.sleep(0.01)